@@ -8,12 +8,18 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
-from .error_diagnosis import get_primary_code_errors, get_typology_based_code_error
+from .error_diagnosis import get_primary_code_errors, get_code_distance, get_typology_based_code_error
 from .ast_visualizer import visualize_custom_ast_from_code, visualize_plain_ast_from_code
+from .reference_set import ReferenceSet
+from .batch_grading import GradingError, grade_batch
 
 __all__ = [
     "get_primary_code_errors",
+    "get_code_distance",
     "get_typology_based_code_error",
+    "ReferenceSet",
+    "grade_batch",
+    "GradingError",
     "visualize_custom_ast_from_code",
     "visualize_plain_ast_from_code"
 ]
@@ -8,6 +8,110 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
+import threading
+from copy import copy
+from hashlib import blake2b
+from numpy import array, int32, unique
+
+
+class LabelTable:
+    """
+    A symbol table that interns node labels into small integer ids.
+
+    The Zhang-Shasha kernel compares labels on every cell of its tables. Comparing two
+    integers is much cheaper than comparing two strings such as "Call: avancer", so every
+    label is mapped once to an id and the trees expose arrays of these ids. Both trees of a
+    comparison must intern their labels in the same table, since equal labels must get equal
+    ids.
+
+    There is no process-wide table: it would keep every constant and string literal of every
+    submission ever graded. Each tree built on its own gets its own table, a `ReferenceSet`
+    interns the labels of its correct codes in a table of its own, and a submission compared
+    with them is interned in an overlay of that table (`LabelTable(base)`), which is dropped
+    with the submission at the end of the call. An overlay gives the labels of its base the
+    ids they have there and only stores the labels the base does not have.
+
+    Attributes:
+        labels (list): The interned labels, indexed by their id (the labels of the base first).
+        base (LabelTable or None): The table this one is an overlay of.
+    """
+
+    def __init__(self, base=None):
+        """
+        Initialize an empty label table, or an overlay of another table.
+
+        Args:
+            base (LabelTable, optional): The table to overlay. Its labels keep their ids here;
+                                         the labels interned in the base after the overlay is
+                                         created are not seen by the overlay. Defaults to None.
+        """
+        self.base = base
+        self.labels = list(base.labels) if base is not None else []
+        self._base_size = len(self.labels)
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def find(self, label):
+        """
+        Return the id of a label, or None if it was not interned.
+
+        Args:
+            label (str): The label to look up.
+
+        Returns:
+            int or None: The id of the label.
+        """
+        label_id = self._ids.get(label)
+        if label_id is None and self.base is not None:
+            label_id = self.base.find(label)
+            if label_id is not None and label_id >= self._base_size:
+                label_id = None
+        return label_id
+
+    def intern(self, label):
+        """
+        Return the id of a label, assigning the next free id the first time it is seen.
+
+        Args:
+            label (str): The label to intern.
+
+        Returns:
+            int: The id of the label.
+        """
+        label_id = self.find(label)
+        if label_id is None:
+            with self._lock:
+                label_id = self.find(label)
+                if label_id is None:
+                    label_id = len(self.labels)
+                    self.labels.append(label)
+                    self._ids[label] = label_id
+        return label_id
+
+    def covers(self, other):
+        """
+        Tell whether every id of another table stands for the same label in this table.
+
+        This is the case for the table itself, and for an overlay of the table created when
+        the table had all its current labels (or an overlay of such an overlay).
+
+        Args:
+            other (LabelTable): The other table.
+
+        Returns:
+            bool: True if label ids of `other` can be compared with label ids of this table.
+        """
+        if self is other:
+            return True
+        return self.base is not None and len(other) <= self._base_size and self.base.covers(other)
+
+    def __len__(self):
+        return len(self.labels)
+
+
+# Marks the end of the children of a node during the post-order traversal of `AnnotatedTree`.
+_NO_CHILD = object()
+
 
 class AnnotatedTree:
     """
@@ -19,6 +123,7 @@ class AnnotatedTree:
     - Post-order node IDs.
     - The Leftmost Leaf Descendant (LMD) of each node.
     - Keyroots, which are nodes that represent roots of subproblems in the Zhang-Shasha algorithm.
+    - Interned integer label ids, so that labels are compared as integers by the distance kernel.
 
     Attributes:
         get_children (callable): A function that, given a node, returns a list of its children.
@@ -26,21 +131,40 @@ class AnnotatedTree:
         nodes (list): A list of nodes in the tree in post-order.
         ids (list): A list of integer IDs corresponding to each node, assigned in post-order.
         lmds (list): A list of leftmost leaf descendant indices (LMDs) for each node.
+        lmds_array (numpy.ndarray): The same LMDs as an int32 array, for array-based kernels.
         keyroots (list): A list of keyroot indices used in the tree edit distance computation.
-        nodes_path (list): A list of paths (lists of labels) for each node from the root.
+        parents (list): The post-order ID of the parent of each node (-1 for the root).
+        nodes_path (list): A list of paths (lists of labels) for each node from the root, by post-order ID.
+        nodes_context (list): The " > "-joined form of each path in `nodes_path`, by post-order ID.
+        label_table (LabelTable): The symbol table used to intern the node labels (see `relabeled`).
+        label_ids (numpy.ndarray): The interned label id of each node, as an int32 array in post-order.
+        subtree_hashes (list): A bottom-up structural hash of the subtree rooted at each node, by post-order ID.
+        preorder_label_ids (list): The interned label ids of the nodes in pre-order.
 
     The AnnotatedTree is designed to work hand-in-hand with the Zhang-Shasha distance algorithm. The trees
     are processed so that each node has a unique post-order ID and an associated LMD, allowing for efficient
     dynamic programming computation of the edit distance.
     """
 
-    def __init__(self, root, get_children):
+    def __init__(self, root, get_children, label_table=None, get_label=None):
         """
         Initialize the AnnotatedTree with the given root and get_children function.
 
         Args:
             root (Node): The root node of the tree.
             get_children (callable): A function or method that takes a node and returns a list of its children.
+            label_table (LabelTable, optional): The symbol table used to intern labels. Trees that are
+                                                compared together must share it. Defaults to None,
+                                                in which case the tree gets a table of its own.
+            get_label (callable, optional): A function that, given a node, returns the label interned
+                                            for it. Defaults to None, in which case `node.label` is used.
+        """
+        self._reset(root, get_children, label_table, get_label)
+        self._build(root)
+
+    def _reset(self, root, get_children, label_table, get_label):
+        """
+        Set every attribute of an empty annotated tree.
         """
         self.get_children = get_children
         self.root = root
@@ -48,68 +172,113 @@ class AnnotatedTree:
         self.ids = []
         self.lmds = []
         self.keyroots = []
-        self.nodes_path = []  # Store the path from the root to each node
-        self._build(root)
+        self.parents = []
+        self._nodes_path = None  # Paths from the root, built on first use by `_compute_paths`
+        self._nodes_context = None
+        self.label_table = label_table if label_table is not None else LabelTable()
+        self.get_label = get_label
+        self.label_ids = []
+        self._subtree_hashes = None  # Built on first use by `_compute_subtree_hashes`
+        self._preorder_label_ids = None
+        self._mirror = None  # Built on first use by `mirrored`
+        self._origin = None  # The tree a relabeled tree reads its paths and hashes from
 
-    def _build(self, node):
+    @classmethod
+    def from_post_order(cls, root, get_children, nodes, lmds, parents, labels, label_table=None):
         """
-        Build the annotated tree data structures by performing a post-order traversal from the given node.
+        Annotate a tree from its nodes already listed in post-order, without traversing it.
+
+        `convert_ast_to_custom_node.ast_to_annotated_tree` records these lists while it builds
+        the tree; they must be exactly those a traversal from `root` would compute.
 
-        This method initializes counters and mappings, then delegates to the recursive `_compute_post_order`
-        method to populate the `nodes`, `ids`, and `lmds`. Finally, it computes the keyroots based on the LMD
-        information.
+        Args:
+            root (Node): The root node of the tree.
+            get_children (callable): A function or method that takes a node and returns a list of its children.
+            nodes (list): The nodes in post-order.
+            lmds (list): The LMD of each node, by post-order ID.
+            parents (list): The post-order ID of the parent of each node (-1 for the root).
+            labels (list): The label of each node, by post-order ID.
+            label_table (LabelTable, optional): The symbol table used to intern labels. Defaults to
+                                                None, in which case the tree gets a table of its own.
+
+        Returns:
+            AnnotatedTree: The annotated tree.
         """
-        self._id_counter = 0
-        self._lmd_mapping = {}
-        self._compute_post_order(node)
-        self.keyroots = self._compute_keyroots()
+        tree = cls.__new__(cls)
+        tree._reset(root, get_children, label_table, None)
+        tree.nodes = nodes
+        tree.ids = list(range(len(nodes)))
+        tree.lmds = lmds
+        tree.parents = parents
+        intern = tree.label_table.intern
+        tree.label_ids = array([intern(label) for label in labels], dtype=int32)
+        tree.lmds_array = array(lmds, dtype=int32)
+        tree.keyroots = tree._compute_keyroots()
+        return tree
 
-    def _compute_post_order(self, node):
+    def __len__(self):
+        """
+        Return the number of nodes of the tree.
         """
-        Recursively compute post-order traversal to assign IDs, determine LMDs, and record paths.
+        return len(self.nodes)
 
-        During the traversal:
-          - Each node is assigned a post-order ID.
-          - The leftmost leaf descendant (LMD) of each node is determined.
-          - The path from the root to the node is recorded.
-          - Results are appended to class-level lists: `nodes`, `ids`, and `lmds`.
+    def label(self, node_id):
+        """
+        Return the label of a node, by post-order ID.
 
         Args:
-            node (Node): The current node being processed.
+            node_id (int): The post-order ID of the node.
 
         Returns:
-            int: The LMD index of the current node.
+            str: The label of the node.
         """
-        # Retrieve children of the current node
-        children = self.get_children(node)
-        lmd = None
-
-        # Post-order: first process children
-        for child in children:
-            child_lmd = self._compute_post_order(child)
-            if lmd is None:
-                # The LMD of the first child encountered will be the LMD of this node
-                lmd = child_lmd
-
-        # Assign post-order ID to the current node
-        node_id = self._id_counter
-        self._id_counter += 1
-        self.nodes.append(node)
+        return self.nodes[node_id].label
 
-        # Store the path from the root to this node
-        path = node.get_path()
-        self.nodes_path.append(path)
+    def _build(self, node):
+        """
+        Build the annotated tree data structures by performing a post-order traversal from the given node.
 
-        self.ids.append(node_id)
+        The traversal keeps its own stack of the nodes being visited, with the iterator over their
+        remaining children and the post-order IDs of the children already visited, so that deep
+        trees cannot exceed the recursion limit. When all the children of a node are visited:
+          - The node is assigned the next post-order ID.
+          - Its leftmost leaf descendant (LMD) is the LMD of its first child, or itself for a leaf.
+          - The node is recorded as the parent of its children in `parents`.
+          - The node label is interned into `label_ids`.
+        Finally, the keyroots are computed from the LMD information.
+        """
+        get_children = self.get_children
+        get_label = self.get_label
+        intern = self.label_table.intern
+        nodes = self.nodes
+        lmds = self.lmds
+        parents = self.parents
+        label_ids = self.label_ids
 
-        # If no children, this is a leaf node; its LMD is itself
-        if lmd is None:
-            lmd = node_id
+        stack = [(node, iter(get_children(node)), [])]
+        while stack:
+            current, children, child_ids = stack[-1]
+            child = next(children, _NO_CHILD)
+            if child is not _NO_CHILD:
+                stack.append((child, iter(get_children(child)), []))
+                continue
+            stack.pop()
 
-        self.lmds.append(lmd)
-        self._lmd_mapping[node_id] = lmd
+            node_id = len(nodes)
+            nodes.append(current)
+            parents.append(-1)
+            for child_id in child_ids:
+                parents[child_id] = node_id
+            label = current.label if get_label is None else get_label(current)
+            label_ids.append(intern(label))
+            lmds.append(lmds[child_ids[0]] if child_ids else node_id)
+            if stack:
+                stack[-1][2].append(node_id)
 
-        return lmd
+        self.ids = list(range(len(nodes)))
+        self.keyroots = self._compute_keyroots()
+        self.label_ids = array(self.label_ids, dtype=int32)
+        self.lmds_array = array(self.lmds, dtype=int32)
 
     def _compute_keyroots(self):
         """
@@ -132,6 +301,168 @@ class AnnotatedTree:
         keyroots = sorted(lmd_to_index.values())
         return keyroots
 
+    @property
+    def nodes_path(self):
+        """
+        list: The path from the root to each node, by post-order ID (see `Node.get_path`).
+        """
+        if self._nodes_path is None:
+            self._compute_paths()
+        return self._nodes_path
+
+    @property
+    def nodes_context(self):
+        """
+        list: The " > "-joined path of each node, by post-order ID.
+        """
+        if self._nodes_context is None:
+            self._compute_paths()
+        return self._nodes_context
+
+    def _compute_paths(self):
+        """
+        Compute the path and the context string of every node in a single top-down pass.
+
+        A parent always has a larger post-order ID than its descendants, so walking the IDs
+        downwards visits each parent before its children and each path is built by extending
+        the path of the parent, instead of climbing back to the root for every node as
+        `Node.get_path` does. Only the root of the tree calls `get_path`, which keeps the
+        labels of its own ancestors when the tree is a subtree of a larger one.
+
+        The paths are only computed when they are first needed, so that computing a bare
+        distance never pays for them. A relabeled tree takes those of its origin.
+        """
+        if self._origin is not None:
+            self._nodes_path = self._origin.nodes_path
+            self._nodes_context = self._origin.nodes_context
+            return
+        size = len(self.nodes)
+        paths = [None] * size
+        contexts = [None] * size
+        for node_id in range(size - 1, -1, -1):
+            node = self.nodes[node_id]
+            parent_id = self.parents[node_id]
+            if parent_id == -1:
+                path = node.get_path()
+            else:
+                label = f"{node.label}[{node.index}]" if node.parent else node.label
+                path = paths[parent_id] + [label]
+            paths[node_id] = path
+            contexts[node_id] = " > ".join(map(str, path))
+        self._nodes_path = paths
+        self._nodes_context = contexts
+
+    @property
+    def subtree_hashes(self):
+        """
+        list: The structural hash of the subtree rooted at each node, by post-order ID.
+        """
+        if self._subtree_hashes is None:
+            self._compute_subtree_hashes()
+        return self._subtree_hashes
+
+    def _compute_subtree_hashes(self):
+        """
+        Compute a Merkle hash of every subtree in a single bottom-up pass.
+
+        The hash of a node digests its interned label and the hashes of its children in order,
+        so two subtrees have the same hash exactly when they have the same shape and the same
+        labels (up to BLAKE2b collisions). Children always have smaller post-order IDs than
+        their parent, so walking the IDs upwards hashes every child before its parent. The
+        hashes digest the labels themselves, so a relabeled tree takes those of its origin.
+        """
+        if self._origin is not None:
+            self._subtree_hashes = self._origin.subtree_hashes
+            return
+        size = len(self.nodes)
+        children = [[] for _ in range(size)]
+        for node_id, parent_id in enumerate(self.parents):
+            if parent_id != -1:
+                children[parent_id].append(node_id)
+
+        labels = self.label_table.labels
+        hashes = [None] * size
+        for node_id, label_id in enumerate(self.label_ids.tolist()):
+            label = str(labels[label_id]).encode()
+            digest = blake2b(len(label).to_bytes(4, "little") + label, digest_size=16)
+            for child_id in children[node_id]:
+                digest.update(hashes[child_id])
+            hashes[node_id] = digest.digest()
+        self._subtree_hashes = hashes
+
+    @property
+    def preorder_label_ids(self):
+        """
+        list: The interned label ids of the nodes in pre-order.
+        """
+        if self._preorder_label_ids is None:
+            children = [[] for _ in self.nodes]
+            for node_id, parent_id in enumerate(self.parents):
+                if parent_id != -1:
+                    children[parent_id].append(node_id)
+
+            label_ids = self.label_ids.tolist()
+            preorder = []
+            stack = [len(self.nodes) - 1]
+            while stack:
+                node_id = stack.pop()
+                preorder.append(label_ids[node_id])
+                stack.extend(reversed(children[node_id]))
+            self._preorder_label_ids = preorder
+        return self._preorder_label_ids
+
+    def mirrored(self):
+        """
+        Annotate the mirror image of the tree, whose children are visited from right to left.
+
+        The nodes are the same objects, so their labels, interned label ids and paths (which
+        rely on the original child indices) are unchanged; only the post-order ids, the LMDs and
+        the keyroots follow the mirrored order, which turns left paths into right paths. The
+        mirror image is built once and kept, and its own mirror image is this tree.
+
+        Returns:
+            AnnotatedTree: The annotated mirror image of the tree.
+        """
+        if self._mirror is None:
+            if self._origin is not None:
+                mirror = self._origin.mirrored().relabeled(self.label_table)
+            else:
+                get_children = self.get_children
+                mirror = AnnotatedTree(self.root, lambda node: list(reversed(get_children(node))),
+                                       self.label_table, self.get_label)
+            mirror._mirror = self
+            self._mirror = mirror
+        return self._mirror
+
+    def relabeled(self, label_table):
+        """
+        Return the same tree with its labels interned in another label table.
+
+        The returned tree shares the nodes and the structure of this tree, and reads its paths,
+        contexts, subtree hashes and mirror image from it: only the label ids are new. Cached
+        trees each have a table of their own, and they are relabeled into the table of the
+        comparison they take part in (see `LabelTable`).
+
+        Args:
+            label_table (LabelTable): The table to intern the labels in.
+
+        Returns:
+            AnnotatedTree: The relabeled tree, or this tree if its label ids are already valid
+                           in `label_table`.
+        """
+        if label_table.covers(self.label_table):
+            return self
+        tree = copy(self)
+        tree.label_table = label_table
+        distinct, inverse = unique(self.label_ids, return_inverse=True)
+        labels = self.label_table.labels
+        tree.label_ids = array([label_table.intern(labels[label_id]) for label_id in distinct.tolist()],
+                               int32)[inverse]
+        tree._preorder_label_ids = None
+        tree._mirror = None
+        tree._origin = self._origin if self._origin is not None else self
+        return tree
+
     def print_tree_structure(self, name):
         """
         Print a human-readable representation of the tree structure.
@@ -166,7 +497,7 @@ class AnnotatedTree:
         """
         print(f"--- {name} Tree Structure ---")
         for idx, node in enumerate(self.nodes):
-            path = node.get_path()
+            path = self.nodes_path[idx]
             label = node.label
             children_labels = [child.label for child in node.children]
             print(f"Node {idx}: Path: {path} | Label: '{label}' | Children Order: {children_labels}")
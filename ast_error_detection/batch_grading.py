@@ -0,0 +1,158 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Grade many submissions of the same exercise in parallel worker processes.
+
+The correct codes are parsed and annotated once, in the calling process, and their trees are
+copied into shared memory as flat trees (see `flat_tree`). Each worker attaches them when it
+starts, instead of parsing the correct codes again: only the names of the blocks cross the
+process boundary, and the only per-worker work is interning the labels. The submissions are
+then sent in chunks, which keeps the per-task overhead of the pool small next to the cost of
+grading a submission.
+"""
+
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from .error_diagnosis import get_typology_based_code_error
+from .reference_set import ReferenceSet
+
+# The ReferenceSet of the current worker process, attached once by `_init_worker`.
+_worker_references = None
+
+
+class GradingError:
+    """
+    The failure of a submission that could not be graded, in place of its result.
+
+    Exceptions do not always survive being pickled back from a worker process: one whose
+    constructor takes other arguments than its message cannot be unpickled, which breaks the
+    whole map. Only the type name, message and formatted traceback of the exception are kept,
+    as strings.
+
+    Attributes:
+        type_name (str): The name of the exception class, e.g. 'SyntaxError'.
+        message (str): The message of the exception, `str(exception)`.
+        traceback (str): The formatted traceback of the exception, from the process that graded it.
+    """
+
+    def __init__(self, type_name, message, traceback):
+        self.type_name = type_name
+        self.message = message
+        self.traceback = traceback
+
+    @classmethod
+    def from_exception(cls, error):
+        """
+        Record an exception caught while grading a submission.
+        """
+        return cls(type(error).__name__, str(error),
+                   "".join(traceback.format_exception(type(error), error, error.__traceback__)))
+
+    def __eq__(self, other):
+        if not isinstance(other, GradingError):
+            return NotImplemented
+        return (self.type_name, self.message, self.traceback) == (other.type_name, other.message, other.traceback)
+
+    def __repr__(self):
+        return f"GradingError({self.type_name!r}, {self.message!r})"
+
+
+def _init_worker(correct_code_list, names, fingerprint):
+    """
+    Attach the ReferenceSet of a worker process to the trees shared by `grade_batch`.
+    """
+    global _worker_references
+    _worker_references = ReferenceSet.attach(correct_code_list, names, fingerprint)
+
+
+def _grade_chunk(submissions):
+    """
+    Grade a chunk of submissions against the ReferenceSet of the worker process.
+    """
+    return _grade_all(submissions, _worker_references)
+
+
+def _grade_all(submissions, references):
+    """
+    Grade submissions one by one, keeping a `GradingError` as the result of a failing submission.
+    """
+    results = []
+    for submission in submissions:
+        try:
+            results.append(get_typology_based_code_error(submission, references))
+        except Exception as error:
+            results.append(GradingError.from_exception(error))
+    return results
+
+
+def grade_batch(submissions, references, workers=None, chunksize=None):
+    """
+    Grade every submission against the same correct codes with `get_typology_based_code_error`.
+
+    The submissions are split into chunks graded by a pool of `workers` processes. The correct
+    codes are parsed and annotated once, by the calling process, which shares their trees with
+    the workers through shared memory for as long as the pool runs; each worker attaches them
+    when it starts and keeps them for all the chunks it grades. With a single worker, the
+    submissions are graded in the calling process without starting a pool.
+
+    A submission that cannot be graded (a syntax error, for instance) does not stop the batch:
+    a `GradingError` recording the exception raised for it takes the place of its result.
+
+    Args:
+        submissions (list[str]): The code snippets to grade.
+        references (list[str] or ReferenceSet): The correct code snippets of the exercise.
+        workers (int, optional): The number of worker processes. Defaults to None, in which
+                                 case one worker per CPU is used.
+        chunksize (int, optional): The number of submissions sent to a worker at once. Defaults
+                                   to None, in which case each worker gets about four chunks.
+
+    Returns:
+        list: For each submission, in the same order, either the `[dist, tags]` result of
+              `get_typology_based_code_error` or the `GradingError` of the exception raised
+              while grading it.
+
+    Raises:
+        ValueError: If `workers` or `chunksize` is not a positive integer, or if one of the
+                    correct code snippets could not be converted into a tree.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"workers must be a positive integer, got {workers!r}.")
+    if chunksize is not None and chunksize < 1:
+        raise ValueError(f"chunksize must be a positive integer, got {chunksize!r}.")
+
+    # Building the set here reports invalid correct codes before any worker is started.
+    if not isinstance(references, ReferenceSet):
+        references = ReferenceSet(references)
+    submissions = list(submissions)
+    workers = min(workers, len(submissions))
+    if workers <= 1:
+        return _grade_all(submissions, references)
+
+    if chunksize is None:
+        chunksize = -(-len(submissions) // (workers * 4))
+    chunks = [submissions[start:start + chunksize] for start in range(0, len(submissions), chunksize)]
+
+    results = []
+    blocks = references.to_shared_memory()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(references.codes, [block.name for block in blocks],
+                                           references.fingerprint)) as executor:
+            for chunk_results in executor.map(_grade_chunk, chunks):
+                results.extend(chunk_results)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return results
@@ -9,27 +9,202 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 import ast
+from .annotated_tree import AnnotatedTree
 from .node import Node
+from .node_functions import anonymous_label
+
+# Mapping of AST comparison types to their string representation.
+_COMPARISON_OPS = {
+    ast.Gt: '>',
+    ast.Lt: '<',
+    ast.LtE: '<=',
+    ast.GtE: '>=',
+    ast.Eq: '==',
+    ast.NotEq: '!=',
+    ast.In: 'In',
+    ast.NotIn: 'Not in'
+}
+
+# Mapping of AST arithmetic operator types to their string representation.
+_OPERATION_OPS = {
+    ast.Mod: '%',
+    ast.Add: '+',
+    ast.Sub: '-',
+    ast.Mult: '*',
+    ast.Div: '/',
+    ast.FloorDiv: '//',
+    ast.Pow: '**',
+}
+
+
+class _TreeBuilder:
+    """
+    Build custom Node trees from AST nodes without recursion.
 
+    The conversion of each AST type is a handler of `_HANDLERS`. A handler that needs the
+    conversion of a sub-node yields that sub-node and receives the list of custom nodes it
+    converts to; `run` drives the handlers with an explicit stack instead of the call stack, so
+    that deeply nested code cannot raise a `RecursionError`. Handlers of leaves return their
+    nodes directly.
+
+    Every custom node is created by `node`, after all the nodes of its subtree, and the
+    handlers create the nodes of a subtree from left to right: nodes are therefore created in
+    the post-order of the final tree, which `_AnnotatingBuilder` relies on.
+    """
+
+    def node(self, label, children=None):
+        """
+        Create a custom node.
+
+        Args:
+            label (str): The label of the node.
+            children (list[Node], optional): Its children, all created before it.
+
+        Returns:
+            Node: The new node.
+        """
+        return Node(label, children=children)
+
+    def convert(self, ast_node):
+        """
+        Convert an AST node into the list of custom nodes it stands for.
+
+        Args:
+            ast_node (ast.AST): The AST node.
+
+        Returns:
+            list[Node]: The custom nodes (none, one or several).
+        """
+        return self.run(_convert(self, ast_node))
+
+    def run(self, step):
+        """
+        Drive a handler and all the handlers it defers to until it returns its nodes.
+
+        Args:
+            step (list or generator): What a handler returned for an AST node.
+
+        Returns:
+            list[Node]: The custom nodes of that AST node.
+        """
+        pending = []
+        result = None
+        while True:
+            if type(step) is list:
+                result = step
+            else:
+                try:
+                    child = step.send(result)
+                except StopIteration as stop:
+                    result = stop.value
+                else:
+                    pending.append(step)
+                    step = _convert(self, child)
+                    result = None
+                    continue
+            if not pending:
+                return result
+            step = pending.pop()
+
+
+class _AnnotatingBuilder(_TreeBuilder):
+    """
+    Build a custom Node tree and its Zhang-Shasha annotations in the same pass.
+
+    Since nodes are created in post-order, each new node gets the next post-order id, its LMD is
+    the LMD of its first child, and it is the parent of its children. The variables are
+    anonymized as their nodes are created: variable nodes are leaves, and leaves are created in
+    the same order as a pre-order traversal visits them, which is the order in which
+    `anonymize_variable_names` numbers the variables.
+    """
+
+    def __init__(self, label_table=None, anonymize=True):
+        self.label_table = label_table
+        self.anonymize = anonymize
+        self.name_map = {}
+        self.nodes = []
+        self.lmds = []
+        self.parents = []
+        self.labels = []
+        self._ids = {}
+
+    def node(self, label, children=None):
+        if self.anonymize and label.startswith("Var: "):
+            label = anonymous_label(label, self.name_map)
+        node = Node(label, children=children)
+
+        node_id = len(self.nodes)
+        lmd = node_id
+        if children:
+            ids = self._ids
+            lmd = self.lmds[ids[id(children[0])]]
+            for child in children:
+                self.parents[ids[id(child)]] = node_id
+        self._ids[id(node)] = node_id
+        self.nodes.append(node)
+        self.lmds.append(lmd)
+        self.parents.append(-1)
+        self.labels.append(node.label)
+        return node
+
+    def annotated_tree(self, root):
+        """
+        Return the annotated tree of the last built tree, whose root is `root`.
+        """
+        return AnnotatedTree.from_post_order(root, Node.get_children, self.nodes, self.lmds, self.parents,
+                                             self.labels, self.label_table)
+
+
+def _convert(builder, ast_node):
+    """
+    Start the conversion of an AST node with the handler of its type.
+    """
+    node_type = type(ast_node)
+    handler = _handler_cache.get(node_type)
+    if handler is None:
+        handler = _handler(node_type)
+    return handler(builder, ast_node)
+
+
+def _handler(node_type):
+    """
+    Find the handler of an AST type: its own, the one of its closest base class, or the default.
+    """
+    handler = _HANDLERS.get(node_type.__name__)
+    if handler is None:
+        handler = next((_HANDLERS[base] for base in node_type.__mro__ if base in _HANDLERS), _convert_default)
+    _handler_cache[node_type] = handler
+    return handler
+
+
+def _child_nodes(builder, ast_node):
+    """
+    Convert every child of an AST node, in order.
+    """
+    children = []
+    for child in ast.iter_child_nodes(ast_node):
+        child_nodes = yield child
+        if child_nodes:
+            children.extend(child_nodes)
+    return children
 
-def handle_comparison(comparison_node):
-    # Mapping of AST comparison types to their string representation.
-    comparison_ops = {
-        ast.Gt: '>',
-        ast.Lt: '<',
-        ast.LtE: '<=',
-        ast.GtE: '>=',
-        ast.Eq: '==',
-        ast.NotEq: '!=',
-        ast.In: 'In',
-        ast.NotIn: 'Not in'
-    }
 
+def _statements(builder, statements):
+    """
+    Convert a list of statements, in order.
+    """
+    nodes = []
+    for stmt in statements:
+        nodes.extend((yield stmt))
+    return nodes
+
+
+def _convert_comparison(builder, comparison_node):
     operator = comparison_node.ops[0]
-    operator_label = comparison_ops.get(type(operator), '')
+    operator_label = _COMPARISON_OPS.get(type(operator), '')
 
-    left_nodes = ast_to_custom_node(comparison_node.left)
-    right_nodes = ast_to_custom_node(comparison_node.comparators[0])
+    left_nodes = yield comparison_node.left
+    right_nodes = yield comparison_node.comparators[0]
 
     condition_children = left_nodes + right_nodes
     node_label = (
@@ -38,16 +213,230 @@ def handle_comparison(comparison_node):
         else f"Call: {operator_label}"
     )
 
-    return [Node(node_label, children=condition_children)]
+    return [builder.node(node_label, children=condition_children)]
 
 
-def process_child_nodes(ast_node):
+def _convert_skipped(builder, ast_node):
+    # 'Load' and 'Store' nodes are skipped.
+    return []
+
+
+def _convert_expr(builder, ast_node):
+    return (yield from _child_nodes(builder, ast_node))
+
+
+def _convert_unary_op(builder, ast_node):
+    if isinstance(ast_node.op, ast.USub):
+        if isinstance(ast_node.operand, ast.Constant):
+            return [builder.node(f"Const: -{ast_node.operand.value}")]
+        elif isinstance(ast_node.operand, ast.Name):
+            return [builder.node(f"Var: -{ast_node.operand.id}")]
+    return []
+
+
+def _convert_function_def(builder, ast_node):
+    children = yield from _child_nodes(builder, ast_node)
+    return [builder.node(f"Function: {ast_node.name}", children=children)]
+
+
+def _convert_arg(builder, ast_node):
+    return [builder.node(f"Arg: {ast_node.arg}")]
+
+
+def _convert_arguments(builder, ast_node):
+    children = yield from _child_nodes(builder, ast_node)
+    if children:
+        return [builder.node("arguments", children=children)]
+    return []
+
+
+def _convert_operation(builder, ast_node):
+    # Binary operations and augmented assignments.
+    op_label = _OPERATION_OPS.get(type(ast_node.op), 'Operation')
+    if isinstance(ast_node, ast.BinOp):
+        first, second = ast_node.left, ast_node.right
+    else:
+        first, second = ast_node.target, ast_node.value
+    first_nodes = yield first
+    second_nodes = yield second
+    return [builder.node(f"Operation: {op_label}", children=first_nodes + second_nodes)]
+
+
+def _convert_for(builder, ast_node):
+    loop_var_nodes = yield ast_node.target
+    iter_nodes = yield ast_node.iter
+    condition_node = builder.node("Condition:", children=loop_var_nodes + iter_nodes)
+
+    body_nodes = yield from _statements(builder, ast_node.body)
+
+    children = [condition_node, builder.node("Body:", children=body_nodes)]
+    return [builder.node("For", children=children)]
+
+
+def _convert_assign(builder, ast_node):
+    nodes = []
+    if isinstance(ast_node.targets[0], ast.Tuple) and isinstance(ast_node.value, ast.Tuple):
+        for target, value in zip(ast_node.targets[0].elts, ast_node.value.elts):
+            target_label = f"Var: {target.id}"
+            value_label = (
+                f"Const: {value.value}" if isinstance(value, ast.Constant) else f"Var: {value.id}"
+            )
+            target_node = builder.node(target_label)
+            nodes.append(builder.node("Assign", children=[target_node, builder.node(value_label)]))
+    else:
+        # The target comes first in the tree, so it is created before the value.
+        target_node = builder.node(f"Var: {ast_node.targets[0].id}")
+        value_nodes = yield ast_node.value
+        nodes.append(builder.node("Assign", children=[target_node] + value_nodes))
+    return nodes
+
+
+def _convert_conditional(builder, ast_node):
+    # Conditional statements ('If') and loops ('While').
     children = []
-    for child in ast.iter_child_nodes(ast_node):
-        child_nodes = ast_to_custom_node(child)
-        if child_nodes:
-            children.extend(child_nodes)
-    return children
+    test = ast_node.test
+
+    # Handle the test condition
+    if isinstance(test, ast.Compare):
+        condition_nodes = yield from _convert_comparison(builder, test)
+        children.append(builder.node("Condition:", children=condition_nodes))
+    elif isinstance(test, ast.BoolOp):
+        boolop_children = []
+        for value in test.values:
+            if isinstance(value, ast.Compare):
+                boolop_children.extend((yield from _convert_comparison(builder, value)))
+            else:
+                boolop_children.extend((yield value))
+        op_name = type(test.op).__name__
+        children.append(builder.node(f"Cond. set: {op_name}", children=boolop_children))
+    elif (
+            isinstance(test, ast.UnaryOp)
+            and isinstance(test.op, ast.Not)
+            and isinstance(test.operand, ast.Compare)
+    ):
+        not_node = builder.node("Call: Not")
+        condition_nodes = yield from _convert_comparison(builder, test.operand)
+        children.append(builder.node("Condition:", children=[not_node] + condition_nodes))
+    else:
+        test_nodes = yield test
+        if test_nodes:
+            children.append(builder.node("Condition:", children=test_nodes))
+
+    # Handle the body
+    body_nodes = yield from _statements(builder, ast_node.body)
+    if body_nodes:
+        children.append(builder.node("Body:", children=body_nodes))
+
+    # Handle the else part
+    else_nodes = yield from _statements(builder, ast_node.orelse)
+    if else_nodes:
+        children.append(builder.node("Else:", children=else_nodes))
+
+    return [builder.node(type(ast_node).__name__, children=children)]
+
+
+def _convert_list(builder, ast_node):
+    elements = []
+    for elt in ast_node.elts:
+        if isinstance(elt, ast.Constant):
+            elements.append(str(elt.value))
+        elif isinstance(elt, ast.Name):
+            elements.append(elt.id)
+    elements_str = ', '.join(elements)
+    return [builder.node(f"Const: [{elements_str}]")]
+
+
+def _convert_subscript(builder, ast_node):
+    value_nodes = yield ast_node.value
+    slice_nodes = yield ast_node.slice
+    return value_nodes + [builder.node("Sliced by", children=slice_nodes)]
+
+
+def _convert_compare(builder, ast_node):
+    return (yield from _convert_comparison(builder, ast_node))
+
+
+def _convert_constant(builder, ast_node):
+    value = ast_node.value
+    formatted_value = f"'{value}'" if isinstance(value, str) else str(value)
+    return [builder.node(f"Const: {formatted_value}")]
+
+
+def _convert_call(builder, ast_node):
+    children = yield from _statements(builder, ast_node.args)
+    func_name = ast_node.func.id if hasattr(ast_node.func, "id") else "Unknown"
+    return [builder.node(f"Call: {func_name}", children=children)]
+
+
+def _convert_name(builder, ast_node):
+    return [builder.node(f"Var: {ast_node.id}")]
+
+
+def _convert_module(builder, ast_node):
+    children = yield from _child_nodes(builder, ast_node)
+    return [builder.node("Module", children=children)]
+
+
+def _convert_return(builder, ast_node):
+    value_nodes = yield ast_node.value
+    return [builder.node("Return", children=value_nodes)]
+
+
+def _convert_alias(builder, ast_node):
+    return [builder.node(f"alias: {ast_node.name}")]
+
+
+def _convert_import_from(builder, ast_node):
+    names_nodes = yield from _statements(builder, ast_node.names)
+    return [builder.node(f"ImportFrom: {ast_node.module}", children=names_nodes)]
+
+
+def _convert_default(builder, ast_node):
+    # Default case for other node types.
+    children = yield from _child_nodes(builder, ast_node)
+    return [builder.node(type(ast_node).__name__, children=children)]
+
+
+# Handler of each AST type. 'Load', 'Store', 'Expr' and 'UnaryOp' are matched by the exact name
+# of the type; the other types also cover their subclasses.
+_HANDLERS = {
+    'Load': _convert_skipped,
+    'Store': _convert_skipped,
+    'Expr': _convert_expr,
+    'UnaryOp': _convert_unary_op,
+    ast.FunctionDef: _convert_function_def,
+    ast.arg: _convert_arg,
+    ast.arguments: _convert_arguments,
+    ast.BinOp: _convert_operation,
+    ast.AugAssign: _convert_operation,
+    ast.For: _convert_for,
+    ast.Assign: _convert_assign,
+    ast.If: _convert_conditional,
+    ast.While: _convert_conditional,
+    ast.List: _convert_list,
+    ast.Subscript: _convert_subscript,
+    ast.Compare: _convert_compare,
+    ast.Constant: _convert_constant,
+    ast.Call: _convert_call,
+    ast.Name: _convert_name,
+    ast.Module: _convert_module,
+    ast.Return: _convert_return,
+    ast.alias: _convert_alias,
+    ast.ImportFrom: _convert_import_from,
+}
+
+# The handler found for each AST type met so far.
+_handler_cache = {}
+
+
+def handle_comparison(comparison_node):
+    builder = _TreeBuilder()
+    return builder.run(_convert_comparison(builder, comparison_node))
+
+
+def process_child_nodes(ast_node):
+    builder = _TreeBuilder()
+    return builder.run(_child_nodes(builder, ast_node))
 
 
 def ast_to_custom_node(ast_node):
@@ -57,189 +446,33 @@ def ast_to_custom_node(ast_node):
     Returns:
         Node: Tree object representing ast_node
     """
-    node_type = type(ast_node).__name__
-
-    # Skip 'Load' or 'Store' node types.
-    if node_type in {'Load', 'Store'}:
-        return []
-
-    # Handle 'Expr' nodes.
-    elif node_type == 'Expr':
-        return process_child_nodes(ast_node)
-
-    # Handle 'UnaryOp' nodes.
-    elif node_type == 'UnaryOp':
-        if isinstance(ast_node.op, ast.USub):
-            if isinstance(ast_node.operand, ast.Constant):
-                return [Node(f"Const: -{ast_node.operand.value}")]
-            elif isinstance(ast_node.operand, ast.Name):
-                return [Node(f"Var: -{ast_node.operand.id}")]
-        return []
-
-    # Handle function definitions.
-    elif isinstance(ast_node, ast.FunctionDef):
-        children = process_child_nodes(ast_node)
-        return [Node(f"Function: {ast_node.name}", children=children)]
-
-    # Handle function arguments.
-    elif isinstance(ast_node, ast.arg):
-        return [Node(f"Arg: {ast_node.arg}")]
-
-    # Handle function argument lists.
-    elif isinstance(ast_node, ast.arguments):
-        children = process_child_nodes(ast_node)
-        if children:
-            return [Node("arguments", children=children)]
-        return []
-
-    # Handle binary operations and augmented assignments.
-    elif isinstance(ast_node, (ast.BinOp, ast.AugAssign)):
-        op_labels = {
-            ast.Mod: '%',
-            ast.Add: '+',
-            ast.Sub: '-',
-            ast.Mult: '*',
-            ast.Div: '/',
-            ast.FloorDiv: '//',
-            ast.Pow: '**',
-        }
-        op_type = type(ast_node.op)
-        op_label = op_labels.get(op_type, 'Operation')
-
-        children = []
-        if isinstance(ast_node, ast.BinOp):
-            left_nodes = ast_to_custom_node(ast_node.left)
-            right_nodes = ast_to_custom_node(ast_node.right)
-            children.extend(left_nodes + right_nodes)
-        elif isinstance(ast_node, ast.AugAssign):
-            target_nodes = ast_to_custom_node(ast_node.target)
-            value_nodes = ast_to_custom_node(ast_node.value)
-            children.extend(target_nodes + value_nodes)
-
-        return [Node(f"Operation: {op_label}", children=children)]
-
-    # Handle 'For' loops.
-    elif isinstance(ast_node, ast.For):
-        loop_var_nodes = ast_to_custom_node(ast_node.target)
-        iter_nodes = ast_to_custom_node(ast_node.iter)
-        condition_node = Node("Condition:", children=loop_var_nodes + iter_nodes)
-
-        body_nodes = []
-        for stmt in ast_node.body:
-            body_nodes.extend(ast_to_custom_node(stmt))
-
-        children = [condition_node, Node("Body:", children=body_nodes)]
-        return [Node("For", children=children)]
-
-    # Handle variable assignments.
-    elif isinstance(ast_node, ast.Assign):
-        nodes = []
-        if isinstance(ast_node.targets[0], ast.Tuple) and isinstance(ast_node.value, ast.Tuple):
-            for target, value in zip(ast_node.targets[0].elts, ast_node.value.elts):
-                target_label = f"Var: {target.id}"
-                value_label = (
-                    f"Const: {value.value}" if isinstance(value, ast.Constant) else f"Var: {value.id}"
-                )
-                nodes.append(Node("Assign", children=[Node(target_label), Node(value_label)]))
-        else:
-            target_label = f"Var: {ast_node.targets[0].id}"
-            value_nodes = ast_to_custom_node(ast_node.value)
-            nodes.append(Node("Assign", children=[Node(target_label)] + value_nodes))
-        return nodes
-
-    # Handle conditional statements ('If') and loops ('While').
-    elif isinstance(ast_node, (ast.If, ast.While)):
-        children = []
-
-        # Handle the test condition
-        if isinstance(ast_node.test, ast.Compare):
-            condition_nodes = handle_comparison(ast_node.test)
-            children.append(Node("Condition:", children=condition_nodes))
-        elif isinstance(ast_node.test, ast.BoolOp):
-            boolop_children = []
-            for value in ast_node.test.values:
-                if isinstance(value, ast.Compare):
-                    boolop_children.extend(handle_comparison(value))
-                else:
-                    boolop_children.extend(ast_to_custom_node(value))
-            op_name = type(ast_node.test.op).__name__
-            children.append(Node(f"Cond. set: {op_name}", children=boolop_children))
-        elif (
-                isinstance(ast_node.test, ast.UnaryOp)
-                and isinstance(ast_node.test.op, ast.Not)
-                and isinstance(ast_node.test.operand, ast.Compare)
-        ):
-            condition_nodes = handle_comparison(ast_node.test.operand)
-            children.append(Node("Condition:", children=[Node("Call: Not")] + condition_nodes))
-        else:
-            test_nodes = ast_to_custom_node(ast_node.test)
-            if test_nodes:
-                children.append(Node("Condition:", children=test_nodes))
-
-        # Handle the body
-        body_nodes = []
-        for stmt in ast_node.body:
-            body_nodes.extend(ast_to_custom_node(stmt))
-        if body_nodes:
-            children.append(Node("Body:", children=body_nodes))
-
-        # Handle the else part
-        else_nodes = []
-        for stmt in ast_node.orelse:
-            else_nodes.extend(ast_to_custom_node(stmt))
-        if else_nodes:
-            children.append(Node("Else:", children=else_nodes))
-
-        return [Node(node_type, children=children)]
-
-    # Handle list constructs.
-    elif isinstance(ast_node, ast.List):
-        elements = []
-        for elt in ast_node.elts:
-            if isinstance(elt, ast.Constant):
-                elements.append(str(elt.value))
-            elif isinstance(elt, ast.Name):
-                elements.append(elt.id)
-        elements_str = ', '.join(elements)
-        return [Node(f"Const: [{elements_str}]")]
-
-    # Handle variable subscripts.
-    elif isinstance(ast_node, ast.Subscript):
-        value_nodes = ast_to_custom_node(ast_node.value)
-        slice_nodes = ast_to_custom_node(ast_node.slice)
-        return value_nodes + [Node("Sliced by", children=slice_nodes)]
-
-    # Handle comparison constructs.
-    elif isinstance(ast_node, ast.Compare):
-        return handle_comparison(ast_node)
+    return _TreeBuilder().convert(ast_node)
 
-    # Default case for other node types.
-    else:
-        if isinstance(ast_node, ast.Constant):
-            value = ast_node.value
-            formatted_value = f"'{value}'" if isinstance(value, str) else str(value)
-            return [Node(f"Const: {formatted_value}")]
-        elif isinstance(ast_node, ast.Call):
-            children = []
-            for arg in ast_node.args:
-                children.extend(ast_to_custom_node(arg))
-            func_name = ast_node.func.id if hasattr(ast_node.func, "id") else "Unknown"
-            return [Node(f"Call: {func_name}", children=children)]
-        elif isinstance(ast_node, ast.Name):
-            return [Node(f"Var: {ast_node.id}")]
-        elif isinstance(ast_node, ast.Module):
-            children = process_child_nodes(ast_node)
-            return [Node("Module", children=children)]
-        elif isinstance(ast_node, ast.Return):
-            value_nodes = ast_to_custom_node(ast_node.value)
-            return [Node("Return", children=value_nodes)]
-        elif isinstance(ast_node, ast.alias):
-            return [Node(f"alias: {ast_node.name}")]
-        elif isinstance(ast_node, ast.ImportFrom):
-            names_nodes = []
-            for alias in ast_node.names:
-                names_nodes.extend(ast_to_custom_node(alias))
-            return [Node(f"ImportFrom: {ast_node.module}", children=names_nodes)]
-        else:
-            children = process_child_nodes(ast_node)
-            return [Node(node_type, children=children)]
+
+def ast_to_annotated_tree(ast_node, label_table=None, anonymize=True):
+    """
+    Transform an AST node into an annotated custom tree in a single pass.
+
+    This is `ast_to_custom_node`, followed by `anonymize_variable_names` on its first node and
+    by the construction of the `AnnotatedTree` of that node, but the variables are renamed and
+    the post-order ids, LMDs, parents and interned labels are recorded while the nodes are
+    created, without walking the tree again.
+
+    Args:
+        ast_node (ast.AST): The AST node, usually an `ast.Module`.
+        label_table (LabelTable, optional): The symbol table to intern labels in. Defaults to
+                                            None, in which case the tree gets a table of its own.
+        anonymize (bool, optional): Whether to anonymize the variables. Defaults to True.
+
+    Returns:
+        AnnotatedTree or None: The annotated tree, or None if the AST node converts to no node.
+    """
+    builder = _AnnotatingBuilder(label_table, anonymize)
+    nodes = builder.convert(ast_node)
+    if not nodes:
+        return None
+    if len(nodes) > 1:
+        # Several trees (a tuple assignment outside of a module): the first one was built, and its
+        # variables numbered, before the others, but the records cover all of them.
+        return AnnotatedTree(nodes[0], Node.get_children, label_table)
+    return builder.annotated_tree(nodes[0])
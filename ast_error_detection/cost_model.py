@@ -0,0 +1,246 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+from weakref import WeakKeyDictionary
+from numpy import array, full, int32, unique, zeros
+from .annotated_tree import LabelTable
+
+
+def node_kind(label):
+    """
+    Return the kind of a node, i.e. the part of its label before the first colon.
+
+    Labels of the custom trees look like "For", "Condition:", "Call: range" or "Const: 5";
+    their kinds are "For", "Condition", "Call" and "Const".
+
+    Args:
+        label (str): The label of the node.
+
+    Returns:
+        str: The kind of the node.
+    """
+    return str(label).split(":", 1)[0].strip()
+
+
+def _check_weight(weight, name):
+    """
+    Check that a weight can be stored in the int32 cost matrices of the distance kernels.
+
+    Args:
+        weight (int): The weight to check.
+        name (str): The name of the weight, for the error message.
+
+    Returns:
+        int: The weight.
+
+    Raises:
+        ValueError: If the weight is not a non-negative integer.
+    """
+    if isinstance(weight, bool) or not isinstance(weight, int) or weight < 0:
+        raise ValueError(f"The {name} weight must be a non-negative integer, got {weight!r}.")
+    return weight
+
+
+class CostTables:
+    """
+    The costs of one comparison, compiled into arrays read directly by the distance kernels.
+
+    Attributes:
+        remove_costs (numpy.ndarray): The cost of removing each node of the first tree, by post-order id.
+        insert_costs (numpy.ndarray): The cost of inserting each node of the second tree, by post-order id.
+        classes_a (numpy.ndarray): The kind class of each node of the first tree, by post-order id.
+        classes_b (numpy.ndarray): The kind class of each node of the second tree, by post-order id.
+        update_matrix (numpy.ndarray): The cost of updating a node of a given kind class (row) into a
+                                       node of another kind class (column), when their labels differ.
+                                       Updating a node into one with the same label is always free.
+        update_rows (list): The same matrix as nested lists, for kernels reading it one cell at a time.
+        update_extra_a (numpy.ndarray): An extra cost added to any update of each node of the first tree
+                                        into a node with another label, by post-order id.
+        update_extra_b (numpy.ndarray): The same extra cost for each node of the second tree.
+
+    The extra update costs are zero for trees compiled by a `CostModel`. They are used when a node
+    stands for a whole collapsed subtree (see `identical_subtrees`): updating it means updating
+    the root of the subtree and removing (or inserting) all its other nodes.
+    """
+
+    def __init__(self, remove_costs, insert_costs, classes_a, classes_b, update_matrix,
+                 update_extra_a=None, update_extra_b=None):
+        self.remove_costs = remove_costs
+        self.insert_costs = insert_costs
+        self.classes_a = classes_a
+        self.classes_b = classes_b
+        self.update_matrix = update_matrix
+        self.update_rows = update_matrix.tolist()
+        self.update_extra_a = update_extra_a if update_extra_a is not None else zeros(len(classes_a), int32)
+        self.update_extra_b = update_extra_b if update_extra_b is not None else zeros(len(classes_b), int32)
+        self._transposed = None
+
+    def transposed(self):
+        """
+        Return the tables of the reversed comparison, from the second tree to the first one.
+
+        Removals become insertions and the other way round, and the update matrix is transposed.
+        The kernels use it when they swap the two trees.
+
+        Returns:
+            CostTables: The tables with the roles of both trees swapped.
+        """
+        if self._transposed is None:
+            self._transposed = CostTables(self.insert_costs, self.remove_costs, self.classes_b,
+                                          self.classes_a, self.update_matrix.T, self.update_extra_b,
+                                          self.update_extra_a)
+            self._transposed._transposed = self
+        return self._transposed
+
+    def reordered(self, order_a, order_b):
+        """
+        Return the tables of the same comparison with the nodes of both trees renumbered.
+
+        Args:
+            order_a (numpy.ndarray): The former post-order id of each node of the first tree, by new id.
+            order_b (numpy.ndarray): The former post-order id of each node of the second tree, by new id.
+
+        Returns:
+            CostTables: The tables indexed by the new ids, e.g. those of the mirrored trees.
+        """
+        return CostTables(self.remove_costs[order_a], self.insert_costs[order_b], self.classes_a[order_a],
+                          self.classes_b[order_b], self.update_matrix, self.update_extra_a[order_a],
+                          self.update_extra_b[order_b])
+
+
+class CostModel:
+    """
+    Per-node-kind weights of the Zhang-Shasha tree edit distance.
+
+    The weights are given by node kind (see `node_kind`): inserting a missing "For" can cost
+    more than inserting a missing "Const", for instance. They are never looked up while the
+    dynamic program runs: `compile` turns them into the arrays of a `CostTables` once per
+    comparison, and the kernels only read from these arrays.
+
+    Updating a node into a node with the same label is always free. Otherwise its cost is looked
+    up first for the pair of kinds `(kind_a, kind_b)` in `update_weights`, then for `kind_a`
+    alone, and falls back to `update`.
+
+    The default model gives every insertion, removal and update a cost of 1, which are the
+    costs of `insert_cost`, `remove_cost` and `update_cost` in `zang_shasha_distance`.
+
+    Attributes:
+        insert (int): The cost of inserting a node whose kind has no weight in `insert_weights`.
+        remove (int): The cost of removing a node whose kind has no weight in `remove_weights`.
+        update (int): The cost of updating a node when `update_weights` has no matching weight.
+        insert_weights (dict): The cost of inserting a node, by node kind.
+        remove_weights (dict): The cost of removing a node, by node kind.
+        update_weights (dict): The cost of updating a node, by node kind or by pair of node kinds.
+    """
+
+    def __init__(self, insert=1, remove=1, update=1, insert_weights=None, remove_weights=None,
+                 update_weights=None):
+        """
+        Initialize the cost model. All weights must be non-negative integers.
+
+        Args:
+            insert (int, optional): The default insertion cost. Defaults to 1.
+            remove (int, optional): The default removal cost. Defaults to 1.
+            update (int, optional): The default update cost. Defaults to 1.
+            insert_weights (dict, optional): Insertion costs by node kind, e.g. {"For": 3}.
+            remove_weights (dict, optional): Removal costs by node kind.
+            update_weights (dict, optional): Update costs by node kind, or by (kind, kind) pair
+                                             for an update from one kind into another.
+
+        Raises:
+            ValueError: If a weight is not a non-negative integer.
+        """
+        self.insert = _check_weight(insert, "insert")
+        self.remove = _check_weight(remove, "remove")
+        self.update = _check_weight(update, "update")
+        self.insert_weights = {kind: _check_weight(weight, "insert")
+                               for kind, weight in (insert_weights or {}).items()}
+        self.remove_weights = {kind: _check_weight(weight, "remove")
+                               for kind, weight in (remove_weights or {}).items()}
+        self.update_weights = {kind: _check_weight(weight, "update")
+                               for kind, weight in (update_weights or {}).items()}
+
+        # Node kinds are interned into classes, and each label id of a label table is mapped to
+        # its class only once: the classes of the label ids of a table are kept as long as the
+        # table itself is alive. The update matrix covers every class seen so far and is rebuilt
+        # when it grows.
+        self._kinds = LabelTable()
+        self._label_classes = WeakKeyDictionary()
+        self._update_matrix = None
+        self._lock = threading.Lock()
+
+    def _update_weight(self, kind_a, kind_b):
+        """
+        Return the cost of updating a node of kind `kind_a` into a node of kind `kind_b`.
+        """
+        weight = self.update_weights.get((kind_a, kind_b))
+        if weight is None:
+            weight = self.update_weights.get(kind_a, self.update)
+        return weight
+
+    def _classes(self, tree):
+        """
+        Return the kind class of every node of an annotated tree, by post-order id.
+        """
+        label_table = tree.label_table
+        with self._lock:
+            label_classes = self._label_classes.get(label_table)
+            if label_classes is None:
+                label_classes = self._label_classes[label_table] = {}
+        distinct, inverse = unique(tree.label_ids, return_inverse=True)
+        classes = []
+        for label_id in distinct.tolist():
+            class_id = label_classes.get(label_id)
+            if class_id is None:
+                class_id = label_classes[label_id] = self._kinds.intern(node_kind(label_table.labels[label_id]))
+            classes.append(class_id)
+        return array(classes, int32)[inverse]
+
+    def _compiled_update_matrix(self):
+        """
+        Return the update matrix over all the kind classes interned so far.
+        """
+        with self._lock:
+            kinds = self._kinds.labels[:]
+            matrix = self._update_matrix
+            if matrix is None or len(matrix) != len(kinds):
+                matrix = full((len(kinds), len(kinds)), self.update, int32)
+                if self.update_weights:
+                    for row, kind_a in enumerate(kinds):
+                        for column, kind_b in enumerate(kinds):
+                            matrix[row, column] = self._update_weight(kind_a, kind_b)
+                self._update_matrix = matrix
+        return matrix
+
+    def compile(self, A, B):
+        """
+        Compile the weights for the comparison of two annotated trees.
+
+        Args:
+            A (AnnotatedTree): The first annotated tree (the one nodes are removed from).
+            B (AnnotatedTree): The second annotated tree (the one nodes are inserted from).
+
+        Returns:
+            CostTables: The removal costs of A, the insertion costs of B and the update matrix
+                        over the kind classes of both trees.
+        """
+        classes_a = self._classes(A)
+        classes_b = self._classes(B)
+        kinds = self._kinds.labels
+        remove_costs = array([self.remove_weights.get(kinds[class_id], self.remove)
+                              for class_id in classes_a.tolist()], int32)
+        insert_costs = array([self.insert_weights.get(kinds[class_id], self.insert)
+                              for class_id in classes_b.tolist()], int32)
+        return CostTables(remove_costs, insert_costs, classes_a, classes_b, self._compiled_update_matrix())
+
+
+# Cost model used by `distance` when none is given: unit costs for every operation.
+default_cost_model = CostModel()
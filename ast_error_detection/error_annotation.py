@@ -17,177 +17,320 @@ from ast_error_detection.constants import ANNOTATION_TAG_CONST_VALUE_MISMATCH, \
     ANNOTATION_CONTEXT_CALL_NATIVE_FUNCTION_TOURNER_NODE_NAME, ANNOTATION_TAG_UNNECESSARY_FOR_LOOP, \
     ANNOTATION_TAG_UNNECESSARY_WHILE_LOOP, ANNOTATION_TAG_MISSING_FOR_LOOP, \
     ANNOTATION_TAG_INCORRECT_FUNCTION_NAME
+from .primary_error import PrimaryError
 import re
 
-### HIGH LEVEL RULES ##
+def _op_context(op):
+    """
+    Return the " > "-joined path of an edit operation.
 
-# Rule: If there is an UNNECESSARY CALL statement, suppress ALL other errors
-# that are *inside* that call's context (i.e., deeper in the same path).
-# Keep the UNNECESSARY_CALL_STATEMENT trigger itself.
-def rule_remove_inside_unnecessary_call_context():
-    def rule(errors):
-        # Collect exact contexts where an unnecessary call is flagged
-        # Example context: "Module > Expr > Call: print"
-        trigger_contexts = {
-            (e[-1] or "").strip()
-            for e in errors
-            if e[0] == ANNOTATION_TAG_UNNECESSARY_CALL_STATEMENT
-        }
+    Operations produced by `distance` carry this string precomputed by the annotated tree
+    under the 'context' key; it is only rebuilt from 'path' for operations that lack it.
+    """
+    context = op.get('context')
+    if context is not None:
+        return context
+    return " > ".join(map(str, op['path'])) if op.get('path') else ""
 
-        if not trigger_contexts:
-            return errors
-        filtered = []
 
-        for e in errors:
-            code = e[0]
-            ctx  = (e[-1] or "").strip()
-            # Always keep the trigger(s) themselves
-            if code == ANNOTATION_TAG_UNNECESSARY_CALL_STATEMENT:
-                filtered.append(e)
-                continue
-            # Drop errors that are strictly *under* a trigger call context:
-            # i.e., context starts with "<trigger> >"
-            if any(ctx.startswith(tc + " > ") for tc in trigger_contexts):
-                continue
-            # Everything else stays
-            filtered.append(e)
-        return filtered
 
-    return rule
+def _structural_element(element):
+    """
+    Strip the sibling index from a path element or a label: "For[0]" -> "For".
+    """
+    return element.split("[")[0]
 
-# Rule: If there is an UNNECESSARY FOR loop, suppress ALL other errors
-# that are *inside* that FOR's context (i.e., deeper in the same path).
-# Keep the UNNECESSARY_FOR_LOOP trigger itself.
-def rule_remove_inside_unnecessary_loop_context():
-    def rule(errors):
-        # Collect exact contexts where an unnecessary FOR is flagged
-        # Example context: "Module > For[0]"
-        trigger_contexts = {
-            (e[-1] or "").strip()
-            for e in errors
-            if e[0] == ANNOTATION_TAG_UNNECESSARY_FOR_LOOP or e[0] == ANNOTATION_TAG_UNNECESSARY_WHILE_LOOP
-        }
 
-        if not trigger_contexts:
-            return errors
+def _label_kind(label):
+    """
+    Return the upper-case kind of a label: "Call: print" -> "CALL", "For" -> "FOR".
+    """
+    return _structural_element(label or "").split(":", 1)[0].strip().upper()
 
-        filtered = []
-        for e in errors:
-            code = e[0]
-            ctx  = (e[-1] or "").strip()
 
-            # Always keep the trigger(s) themselves
-            if code == ANNOTATION_TAG_UNNECESSARY_FOR_LOOP or code == ANNOTATION_TAG_UNNECESSARY_WHILE_LOOP:
-                filtered.append(e)
-                continue
+def group_by(items, key):
+    """
+    Group items by a key, e.g. the entries of an `OpIndex` by (kind, label) to join two groups.
+
+    Args:
+        items (iterable): The items to group.
+        key (callable): A function returning the (hashable) key of an item.
+
+    Returns:
+        dict: The list of the items of each key, in their original order; the keys come in the
+              order of their first item.
+    """
+    groups = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return groups
 
-            # Drop errors that are strictly *under* a trigger FOR context:
-            # i.e., context starts with "<trigger> >"
-            if any(ctx.startswith(tc + " > ") for tc in trigger_contexts):
+
+class _LabelKinds(dict):
+    """
+    The kinds of the labels met so far, computed on first lookup.
+    """
+
+    def __missing__(self, label):
+        kind = self[label] = _label_kind(label)
+        return kind
+
+
+class OpIndex:
+    """
+    The edit operations of a comparison, indexed once for all the detectors of `ErrorAnnotation`.
+
+    Edit scripts hold a 'match' operation for every node both trees share, so they run to
+    thousands of operations of which only a few are edits. The index is built in a single pass
+    over them: the 'match' operations are skipped, and every other one is grouped by type, by
+    node kind and by full label, with its kinds and its structural context (the path without
+    sibling indices, e.g. "Module > For > Body: > Call: avancer") computed once. The detectors
+    then only read the groups they need.
+
+    The label an operation is grouped by is its target label: the new label of an insertion or
+    an update, the current label of a deletion.
+
+    Attributes:
+        patterns (list): The indexed operations, as given.
+        by_type (dict): For each type ('delete', 'insert', 'update'), the list of its entries in
+                        the order of the operations. An entry is a tuple
+                        `(op, current_kind, new_kind, structural_context)`; the kind of a missing
+                        label is the empty string.
+        by_kind (dict): The entries by `(type, kind of the target label)`, in the order of the
+                        operations.
+        by_label (dict): The entries by `(type, target label)`, in the order of the operations.
+        current_labels (dict): For each type, the set of the current labels of its operations.
+    """
+
+    def __init__(self, patterns):
+        """
+        Index a list of edit operations.
+
+        Args:
+            patterns (list): A list of dictionaries containing the type of operation,
+                             path, current value, and new value for transformations.
+        """
+        self.patterns = patterns
+        self.by_type = {'delete': [], 'insert': [], 'update': []}
+        self.by_kind = {}
+        self.by_label = {}
+        self.current_labels = {op_type: set() for op_type in self.by_type}
+
+        # The same labels recur throughout a script: each kind is only derived once.
+        kinds = _LabelKinds()
+        for op in patterns:
+            op_type = op['type']
+            entries = self.by_type.get(op_type)
+            if entries is None:
+                # A 'match' operation: no detector reads them.
                 continue
+            current = op['current']
+            new = op['new']
+            current_kind = kinds[current]
+            new_kind = kinds[new]
+            path = op.get('path') or ()
+            entry = (op, current_kind, new_kind, " > ".join(_structural_element(p) for p in path))
+            entries.append(entry)
+
+            target, target_kind = (current, current_kind) if op_type == 'delete' else (new, new_kind)
+            self.by_kind.setdefault((op_type, target_kind), []).append(entry)
+            self.by_label.setdefault((op_type, target), []).append(entry)
+            self.current_labels[op_type].add(current)
+
+    @classmethod
+    def of(cls, patterns):
+        """
+        Return `patterns` if it is already an OpIndex, or the index of that list of operations.
+        """
+        return patterns if isinstance(patterns, cls) else cls(patterns)
 
-            # Everything else stays
-            filtered.append(e)
 
-        return filtered
+### HIGH LEVEL RULES ##
+
+# Separator of the elements of an error context, e.g. "Module > For > Body: > Call: print".
+_CONTEXT_SEPARATOR = " > "
 
+
+def _enclosing_rules(context, triggers):
+    """
+    Return the rules triggered by a context that `context` lies strictly under.
+
+    `context` lies under a trigger context `tc` when it starts with `tc + " > "`, i.e. when
+    the part of `context` before one of its separators is `tc`. Labels may contain the
+    separator themselves (e.g. "Compare: >" followed by " > "), so the context is not split
+    into elements: every occurrence of the separator, overlapping ones included, is probed.
+    Each probe is a single lookup, so the cost only depends on the depth of `context`, not on
+    the number of triggers.
+
+    Args:
+        context (str): The (stripped) context of an error.
+        triggers (dict): The bit mask of the rules triggered by each trigger context.
+
+    Returns:
+        int: The bit mask of the rules triggered by an enclosing context.
+    """
+    rules = 0
+    if triggers:
+        position = context.find(_CONTEXT_SEPARATOR)
+        while position != -1:
+            rules |= triggers.get(context[:position], 0)
+            position = context.find(_CONTEXT_SEPARATOR, position + 1)
+    return rules
+
+
+def _context_rule(trigger_codes):
+    """
+    Build a rule suppressing the errors located inside the context of a trigger error.
+
+    The triggers are the errors whose code is in `trigger_codes`; they are always kept. Any
+    other error whose context is strictly under a trigger context ("<trigger> > ...") is
+    dropped. The codes are exposed as the `trigger_codes` attribute of the rule, which lets
+    `high_level_filtering` compile a pipeline of such rules into a single pass.
+
+    Args:
+        trigger_codes (iterable): The codes of the trigger errors.
+
+    Returns:
+        callable: The rule, taking and returning a list of errors.
+    """
+    trigger_codes = frozenset(trigger_codes)
+    rule = _compiled_context_rules([trigger_codes])
+    rule.trigger_codes = trigger_codes
     return rule
 
 
+# Rule: If there is an UNNECESSARY CALL statement, suppress ALL other errors
+# that are *inside* that call's context (i.e., deeper in the same path).
+# Keep the UNNECESSARY_CALL_STATEMENT trigger itself.
+# Example context: "Module > Expr > Call: print"
+def rule_remove_inside_unnecessary_call_context():
+    return _context_rule({ANNOTATION_TAG_UNNECESSARY_CALL_STATEMENT})
+
+# Rule: If there is an UNNECESSARY FOR loop, suppress ALL other errors
+# that are *inside* that FOR's context (i.e., deeper in the same path).
+# Keep the UNNECESSARY_FOR_LOOP trigger itself.
+# Example context: "Module > For[0]"
+def rule_remove_inside_unnecessary_loop_context():
+    return _context_rule({ANNOTATION_TAG_UNNECESSARY_FOR_LOOP, ANNOTATION_TAG_UNNECESSARY_WHILE_LOOP})
+
+
 # Rule: If there is a MISSING CALL statement, suppress ALL other errors
 # that are *inside* that call's context (i.e., deeper in the same path).
 # Keep the MISSING_CALL_STATEMENT trigger itself.
+# Example context: "Module > Expr > Call: print"
 def rule_remove_inside_missing_call_context():
-    def rule(errors):
-        # Collect exact contexts where a missing call is flagged
-        # Example context: "Module > Expr > Call: print"
-        trigger_contexts = {
-            (e[-1] or "").strip()
-            for e in errors
-            if e[0] == ANNOTATION_TAG_MISSING_CALL_STATEMENT
-        }
-
-        if not trigger_contexts:
-            return errors
+    return _context_rule({ANNOTATION_TAG_MISSING_CALL_STATEMENT})
 
-        filtered = []
-        for e in errors:
-            code = e[0]
-            ctx  = (e[-1] or "").strip()
-
-            # Always keep the trigger(s) themselves
-            if code == ANNOTATION_TAG_MISSING_CALL_STATEMENT:
-                filtered.append(e)
-                continue
+# Rule: If there is a MISSING FOR loop, suppress ALL other errors
+# that are *inside* that loop's context, e.g. "Module > For" or "FunctionDef: foo > For".
+# Keep the MISSING_FOR_LOOP trigger itself.
+def rule_remove_inside_missing_for_loop():
+    return _context_rule({ANNOTATION_TAG_MISSING_FOR_LOOP})
 
-            # Drop errors that are strictly *under* a trigger call context:
-            # i.e., context starts with "<trigger> >"
-            if any(ctx.startswith(tc + " > ") for tc in trigger_contexts):
-                continue
 
-            # Everything else stays
-            filtered.append(e)
+def _compiled_context_rules(rule_codes):
+    """
+    Compile a pipeline of context rules into a function filtering the errors in a single pass.
 
-        return filtered
+    Applying the rules one after the other means that the triggers of a rule are the ones
+    the previous rules kept, and that an error is kept only if no rule drops it. The
+    compiled function reproduces that: the surviving triggers of each rule are found in rule
+    order (they are few), then every error is checked once against all the trigger contexts
+    with `_enclosing_rules`, ignoring the rule it triggers itself.
 
-    return rule
+    Args:
+        rule_codes (list): The trigger codes of each rule, in the order of the pipeline.
 
-def rule_remove_inside_missing_for_loop():
-    def rule(errors):
-        # Collect exact contexts where a missing for-loop is flagged
-        # e.g., "Module > For" or "FunctionDef: foo > For"
-        trigger_contexts = {
-            (e[-1] or "").strip()
-            for e in errors
-            if e[0] == ANNOTATION_TAG_MISSING_FOR_LOOP
-        }
+    Returns:
+        callable: The filter, taking and returning a list of errors.
+    """
+    rule_of_code = {code: rule for rule, codes in enumerate(rule_codes) for code in codes}
 
-        if not trigger_contexts:
+    def apply_rules(errors):
+        trigger_contexts = [[] for _ in rule_codes]
+        for e in errors:
+            rule = rule_of_code.get(e[0])
+            if rule is not None:
+                trigger_contexts[rule].append((e[-1] or "").strip())
+        if not any(trigger_contexts):
             return errors
 
+        # The bit mask of the rules each trigger context triggers. A trigger only counts if it
+        # is not inside the context of a trigger of an earlier rule.
+        triggers = {}
+        for rule, contexts in enumerate(trigger_contexts):
+            kept = [ctx for ctx in contexts if not _enclosing_rules(ctx, triggers)]
+            for ctx in kept:
+                triggers[ctx] = triggers.get(ctx, 0) | (1 << rule)
+
         filtered = []
         for e in errors:
-            code = e[0]
-            ctx  = (e[-1] or "").strip()
-
-            # Always keep the trigger(s) themselves
-            if code == ANNOTATION_TAG_MISSING_FOR_LOOP:
+            rules = _enclosing_rules((e[-1] or "").strip(), triggers)
+            rule = rule_of_code.get(e[0])
+            if rule is not None:
+                # Always keep the trigger(s) themselves
+                rules &= ~(1 << rule)
+            if not rules:
                 filtered.append(e)
-                continue
-
-            # Drop errors that are strictly *under* a trigger "for" context:
-            # i.e., context starts with "<trigger> >"
-            if any(ctx.startswith(tc + " > ") for tc in trigger_contexts):
-                continue
-
-            # Everything else stays
-            filtered.append(e)
-
         return filtered
 
-    return rule
+    return apply_rules
 
 
 def high_level_filtering():
     """
     Returns a function that applies a pipeline of rules to an error list.
     Default rules include:
-        - Removing all 'Call: range' errors if a MISSING_CALL_STATEMENT
-          on 'Call: range' is present.
+        - Removing all errors inside the context of an UNNECESSARY_CALL_STATEMENT,
+          a MISSING_CALL_STATEMENT, an UNNECESSARY_FOR_LOOP (or WHILE) and a
+          MISSING_FOR_LOOP, in that order.
+
+    The context rules are compiled once into a single pass over the errors (see
+    `_compiled_context_rules`) instead of being applied one after the other.
     """
-    rules = [
+    return _HIGH_LEVEL_FILTER
+
+
+# The pipeline of `high_level_filtering`, compiled once.
+_HIGH_LEVEL_FILTER = _compiled_context_rules([
+    rule.trigger_codes for rule in (
         rule_remove_inside_unnecessary_call_context(),
         rule_remove_inside_missing_call_context(),
         rule_remove_inside_unnecessary_loop_context(),
-        rule_remove_inside_missing_for_loop()
-    ]
-
-    def apply_rules(errors):
-        for rule in rules:
-            errors = rule(errors)
-        return errors
-
-    return apply_rules
+        rule_remove_inside_missing_for_loop(),
+    )
+])
+
+
+# Tags of the inserted nodes that are missing from the incorrect code, by node kind.
+_MISSING_CONSTRUCT_TAGS = {
+    "FOR": "MISSING_FOR_LOOP",
+    "WHILE": "MISSING_WHILE_LOOP",
+    "CALL": "MISSING_CALL_STATEMENT",
+    "IF": "MISSING_IF_STATEMENT",
+    "ASSIGN": "MISSING_ASSIGN_STATEMENT",
+    "FUNCTION": "MISSING_FUNCTION_DEFINITION",
+    "RETURN": "MISSING_RETURN",
+    "CONST": "MISSING_CONST_VALUE",
+    "OPERATION": "MISSING_OPERATION",
+    "ARG": "MISSING_ARGUMENT",
+    "VAR": "MISSING_VARIABLE",
+}
+
+# Tags of the deleted nodes that are unnecessary in the incorrect code, by node kind.
+_UNNECESSARY_CONSTRUCT_TAGS = {
+    "FOR": "UNNECESSARY_FOR_LOOP",
+    "WHILE": "UNNECESSARY_WHILE_LOOP",
+    "FUNCTION": "UNNECESSARY_FUNCTION",
+    "RETURN": "UNNECESSARY_RETURN_IN_FUNCTION",
+    "IF": "UNNECESSARY_CONDITIONAL",
+    "CALL": "UNNECESSARY_CALL_STATEMENT",
+    "ASSIGN": "UNNECESSARY_ASSIGN_STATEMENT",
+    "CONST": "UNNECESSARY_CONST_VALUE",
+    "OPERATION": "UNNECESSARY_OPERATION",
+    "ARG": "UNNECESSARY_ARGUMENT",
+    "VAR": "UNNECESSARY_VAR",
+}
 
 
 class ErrorAnnotation:
@@ -196,20 +339,25 @@ class ErrorAnnotation:
         """
         Collect errors from all detection functions and concatenate them into a single list.
 
+        The operations are indexed once (see `OpIndex`) and every detection function reads the
+        same index, so the edit script is only walked once.
+
         Args:
             patterns (list): A list of dictionaries containing the type of operation,
                              path, current value, and new value for transformations.
 
         Returns:
-            list: A combined list of tuples from all error detection functions.
+            list: A combined list of the `PrimaryError` tuples from all error detection functions.
         """
 
+        index = OpIndex(patterns)
+
         # Call individual detection functions
-        missing_statements = self.detect_specific_missing_constructs(patterns)
-        unnecessary_deletions = self.detect_unnecessary_deletions(patterns)
-        incorrect_positions = self.detect_incorrect_statement_positions(patterns)
-        updates = self.track_all_updates(patterns)
-        variable_mismatches = self.detect_variable_mismatches(patterns)
+        missing_statements = self.detect_specific_missing_constructs(index)
+        unnecessary_deletions = self.detect_unnecessary_deletions(index)
+        incorrect_positions = self.detect_incorrect_statement_positions(index)
+        updates = self.track_all_updates(index)
+        variable_mismatches = self.detect_variable_mismatches(index)
 
 
         # Combine all errors into one list
@@ -237,64 +385,26 @@ class ErrorAnnotation:
         - The context (path) where the missing construct occurs.
 
         Args:
-            patterns (list): A list of dictionaries containing the type of operation,
-                             path, current value, and new value for transformations.
+            patterns (list or OpIndex): A list of dictionaries containing the type of operation,
+                                        path, current value, and new value for transformations,
+                                        or their index.
 
         Returns:
             list: A list of tuples in the format:
                   (missing_construct, value (or None), context_path)
         """
         missing_errors = []
+        index = OpIndex.of(patterns)
 
+        # Nodes also removed or updated elsewhere are not missing
+        updated_nodes = index.current_labels['update']
 
-        # Helper function to remove indices from path elements
-        def structural_path_element(element):
-            return element.split("[")[0]
-
-        # Extract all delete nodes for comparison
-        deleted_nodes = {d['current'] for d in patterns if d['type'] == 'delete'}
-        updated_nodes = {u['current'] for u in patterns if u['type'] == 'update'}
-
-        # Analyze insert operations
-        for insert in patterns:
-            if insert['type'] == 'insert':
-                node_type_with_value = structural_path_element(insert['new']).upper()
-                context_path = " > ".join(map(str, insert['path'])) if insert.get('path') else ""
-
-                # Handle cases where ":" is present
-                if ":" in node_type_with_value:
-                    node_type, value = node_type_with_value.split(":", 1)
-                    node_type = node_type.strip().upper()
-                    value = value.strip()
-                else:
-                    node_type = node_type_with_value
-                    value = None
-
-                # Check if the node is also being removed elsewhere
-                if insert['new'] not in deleted_nodes and insert['new'] not in updated_nodes:
-                    # Determine the missing construct
-                    if node_type == "FOR":
-                        missing_errors.append(("MISSING_FOR_LOOP", insert['new'], context_path))
-                    elif node_type == "WHILE":
-                        missing_errors.append(("MISSING_WHILE_LOOP", insert['new'], context_path))
-                    elif node_type == "CALL":
-                        missing_errors.append(("MISSING_CALL_STATEMENT", insert['new'], context_path))
-                    elif node_type == "IF":
-                        missing_errors.append(("MISSING_IF_STATEMENT", insert['new'], context_path))
-                    elif node_type == "ASSIGN":
-                        missing_errors.append(("MISSING_ASSIGN_STATEMENT", insert['new'], context_path))
-                    elif node_type == "FUNCTION":
-                        missing_errors.append(("MISSING_FUNCTION_DEFINITION", insert['new'], context_path))
-                    elif node_type == "RETURN":
-                        missing_errors.append(("MISSING_RETURN", insert['new'], context_path))
-                    elif node_type == "CONST":
-                        missing_errors.append(("MISSING_CONST_VALUE", insert['new'], context_path))
-                    elif node_type == "OPERATION":
-                        missing_errors.append(("MISSING_OPERATION", insert['new'], context_path))
-                    elif node_type == "ARG":
-                        missing_errors.append(("MISSING_ARGUMENT", insert['new'], context_path))
-                    elif node_type == "VAR":
-                        missing_errors.append(("MISSING_VARIABLE", insert['new'], context_path))
+        # Analyze the insert operations of the kinds that have a tag
+        for node_type, tag in _MISSING_CONSTRUCT_TAGS.items():
+            for insert, _, _, _ in index.by_kind.get(('insert', node_type), ()):
+                label = insert['new']
+                if ('delete', label) not in index.by_label and label not in updated_nodes:
+                    missing_errors.append(PrimaryError(tag, label, _op_context(insert)))
 
         return list(set(missing_errors))  # Remove duplicates
 
@@ -316,62 +426,26 @@ class ErrorAnnotation:
         - The context (path) where the unnecessary deletion occurs.
 
         Args:
-            patterns (list): A list of dictionaries containing the type of operation,
-                             path, current value, and new value for transformations.
+            patterns (list or OpIndex): A list of dictionaries containing the type of operation,
+                                        path, current value, and new value for transformations,
+                                        or their index.
 
         Returns:
             list: A list of tuples in the format:
                   (unnecessary_statement, value (or None), context_path)
         """
         unnecessary_errors = []
-
-        # Helper function to remove indices from path elements
-        def structural_path_element(element):
-            return element.split("[")[0]
-
-        # Extract all insert nodes for comparison
-        inserted_nodes = {i['new'] for i in patterns if i['type'] == 'insert'}
-
-        # Analyze delete operations
-        for delete in patterns:
-            if delete['type'] == 'delete':
-                original_label = structural_path_element(delete['current'])
-                node_type_with_value = original_label.upper()
-                context_path = " > ".join(map(str, delete['path'])) if delete.get('path') else ""
-
-                # Handle cases where ":" is present
-                if ":" in node_type_with_value:
-                    node_type = node_type_with_value.split(":", 1)[0].strip().upper()
-                    value = original_label.split(":", 1)[1].strip()  # preserve original case
-                else:
-                    node_type = node_type_with_value
-                    value = None
-
-                # Check if the node is also being inserted elsewhere
-                if delete['current'] not in inserted_nodes:
-                    # Group broader categories
-                    if node_type == "FOR":
-                        unnecessary_errors.append(("UNNECESSARY_FOR_LOOP", value, context_path))
-                    elif node_type == "WHILE":
-                        unnecessary_errors.append(("UNNECESSARY_WHILE_LOOP", value, context_path))
-                    elif node_type == "FUNCTION":  # Group Function and Return
-                        unnecessary_errors.append(("UNNECESSARY_FUNCTION", value, context_path))
-                    elif node_type == "RETURN":
-                        unnecessary_errors.append(("UNNECESSARY_RETURN_IN_FUNCTION", value, context_path))
-                    elif node_type == "IF":  # Group If into Conditional
-                        unnecessary_errors.append(("UNNECESSARY_CONDITIONAL", value, context_path))
-                    elif node_type == "CALL":
-                        unnecessary_errors.append(("UNNECESSARY_CALL_STATEMENT", value, context_path))
-                    elif node_type == "ASSIGN":
-                        unnecessary_errors.append(("UNNECESSARY_ASSIGN_STATEMENT", value, context_path))
-                    elif node_type == "CONST":
-                        unnecessary_errors.append(("UNNECESSARY_CONST_VALUE", value, context_path))
-                    elif node_type == "OPERATION":
-                        unnecessary_errors.append(("UNNECESSARY_OPERATION", value, context_path))
-                    elif node_type == "ARG":
-                        unnecessary_errors.append(("UNNECESSARY_ARGUMENT", value, context_path))
-                    elif node_type == "VAR":
-                        unnecessary_errors.append(("UNNECESSARY_VAR", value, context_path))
+        index = OpIndex.of(patterns)
+
+        # Analyze the delete operations of the kinds that have a tag; nodes also inserted
+        # elsewhere are not unnecessary
+        for node_type, tag in _UNNECESSARY_CONSTRUCT_TAGS.items():
+            for delete, _, _, _ in index.by_kind.get(('delete', node_type), ()):
+                if ('insert', delete['current']) not in index.by_label:
+                    original_label = _structural_element(delete['current'])
+                    # Preserve the original case of the value after ":"
+                    value = original_label.split(":", 1)[1].strip() if ":" in original_label else None
+                    unnecessary_errors.append(PrimaryError(tag, value, _op_context(delete)))
 
         return list(set(unnecessary_errors))  # Remove duplicates
 
@@ -380,7 +454,8 @@ class ErrorAnnotation:
         Detect nodes that are deleted and re-appear elsewhere (inserted/updated),
         inserted where they previously existed elsewhere (insert+update),
         or updated in multiple places (simultaneous updates) — all indicating
-        incorrect statement positioning.
+        incorrect statement positioning. `patterns` can be the list of operations or
+        its `OpIndex`.
 
         Covered node kinds: "Assign", "For", "While", "Call", "If", "Function",
         and "Return".
@@ -390,15 +465,7 @@ class ErrorAnnotation:
         where `context_path` points to the *new/target* location (the insert/update).
         """
 
-        # ---- helper: strip indices from a single path element ----
-        def structural_path_element(element):
-            return element.split("[")[0]
-
-        # ---- helper: derive a normalized "kind" (e.g., 'CALL', 'FOR') from a label ----
-        # e.g., 'Call: print' -> 'CALL', 'For' -> 'FOR', 'Var: i' -> 'VAR'
-        def node_kind(label):
-            base = (label or "").split("[")[0]
-            return base.split(":", 1)[0].strip().upper()
+        index = OpIndex.of(patterns)
 
         # ---- helper: extract human-readable value after ":" if it exists ----
         # e.g., 'CALL: PRINT' -> 'PRINT', 'ASSIGN: X' -> 'X'
@@ -407,21 +474,6 @@ class ErrorAnnotation:
                 return label.split(":", 1)[1].strip()
             return None
 
-        # Build sets of (KIND, FULL_LABEL_UPPER, PATH_TUPLE)
-        deleted_nodes = {
-            (node_kind(d['current']), (d['current'] or "").upper(), tuple(d['path']))
-            for d in patterns if d['type'] == 'delete'
-        }
-        inserted_nodes = {
-            (node_kind(i['new']), (i['new'] or "").upper(), tuple(i['path']))
-            for i in patterns if i['type'] == 'insert'
-        }
-        # For updates we key by the *new* label (where the node ended up)
-        updated_nodes = {
-            (node_kind(u['new']), (u['new'] or "").upper(), tuple(u['path']))
-            for u in patterns if u['type'] == 'update'
-        }
-
         incorrect_positions = []
         kind_to_code = {
             "FOR": "INCORRECT_STATEMENT_POSITION_FOR",
@@ -433,25 +485,25 @@ class ErrorAnnotation:
             "RETURN": "INCORRECT_STATEMENT_POSITION_RETURN",
         }
 
-        # ---- helper: append a detection result given (kind, label, target_path) ----
-        def append_result(kind, label_upper, target_path_tuple):
-            base_kind = kind.split(":", 1)[0].strip().upper()  # kind is already normalized (CALL/FOR/…)
-            code = kind_to_code.get(base_kind)
-            if not code:
-                return
-            value = extract_value(label_upper)  # human-readable value (after ':') or None
-            context_path = " > ".join(structural_path_element(p) for p in target_path_tuple)
-            incorrect_positions.append((code, value, context_path))
-
         # ------------------------------------------------------------
         # 1) DELETE + INSERT (existing behavior): node reappears elsewhere
-        #    Compare like-with-like by (KIND, FULL_LABEL_UPPER)
+        #    Compare like-with-like by (KIND, FULL_LABEL_UPPER): for each kind, the inserted
+        #    nodes of that kind are grouped by upper-case label and each deleted label is joined
+        #    with its group, instead of comparing every deleted node with every inserted one.
         #    Report context at the *insert* location.
         # ------------------------------------------------------------
-        for del_kind, del_label, del_path in deleted_nodes:
-            for ins_kind, ins_label, ins_path in inserted_nodes:
-                if del_kind == ins_kind and del_label == ins_label:
-                    append_result(del_kind, del_label, ins_path)
+        for kind, code in kind_to_code.items():
+            deletes = index.by_kind.get(('delete', kind))
+            inserts = index.by_kind.get(('insert', kind))
+            if not deletes or not inserts:
+                continue
+            inserted_nodes = group_by(inserts, lambda entry: (entry[0]['new'] or "").upper())
+            for label_upper in dict.fromkeys((d['current'] or "").upper() for d, _, _, _ in deletes):
+                group = inserted_nodes.get(label_upper)
+                if group is None:
+                    continue
+                value = extract_value(label_upper)  # human-readable value (after ':') or None
+                incorrect_positions.extend(PrimaryError(code, value, context) for _, _, _, context in group)
 
         # Deduplicate results
         return list(set(incorrect_positions))
@@ -468,22 +520,16 @@ class ErrorAnnotation:
         - Variable updates → Ignored for now
 
         Args:
-            patterns (list): A list of dictionaries containing the type of operation,
-                             path, current value, and new value for transformations.
+            patterns (list or OpIndex): A list of dictionaries containing the type of operation,
+                                        path, current value, and new value for transformations,
+                                        or their index.
 
         Returns:
             list: A list of tuples in the format:
                   (update_category, current_value, new_value, context_path)
         """
         updates = []
-
-        def _node_kind(label):
-            base = (label or "").split("[")[0]
-            return base.split(":", 1)[0].strip().upper()
-
-        # Helper function to remove indices from path elements
-        def structural_path_element(element):
-            return element.split("[")[0]
+        index = OpIndex.of(patterns)
 
         call_token = re.compile(ANNOTATION_CONTEXT_FUNCTION_CALL_NODE, re.IGNORECASE)
 
@@ -502,48 +548,42 @@ class ErrorAnnotation:
 
 
         # Analyze update operations
-        for update in patterns:
-            if update['type'] == 'update':
-                path = update['path']
-                node_type = structural_path_element(path[-1]).upper()
-                context_path = " > ".join(structural_path_element(p) for p in path)
-                current_value = update['current']
-                new_value = update['new']
-
-                cur_kind = _node_kind(current_value)
-                new_kind = _node_kind(new_value)
-
-                if cur_kind in _unnecessary_map and new_kind and current_value != new_value:
-                    updates.append((_unnecessary_map[cur_kind], current_value, new_value, context_path))
-
-                # Handle "missing construct" cases based on the new node type
-                if new_kind in (
-                "FOR", "WHILE", "IF", "CALL", "ASSIGN", "FUNCTIONDEF", "RETURN", "ARGUMENT"):
-                    missing_map = {
-                        "FOR": "MISSING_FOR_LOOP",
-                        "WHILE": "MISSING_WHILE_LOOP",
-                        "IF": "MISSING_IF_STATEMENT",
-                        "CALL": "MISSING_CALL_STATEMENT",
-                        "ASSIGN": "MISSING_ASSIGN_STATEMENT",
-                    }
-                    updates.append((missing_map[new_kind], new_value, context_path))
-
-
-                if "COMPARE" in node_type:
-                    updates.append((ANNOTATION_TAG_INCORRECT_OPERATION_IN_COMP, current_value, new_value, context_path))
-                elif "OPERATION" in node_type:
-                    updates.append((ANNOTATION_TAG_INCORRECT_OPERATION_IN_ASSIGN, current_value, new_value, context_path))
-                elif "CONST" in node_type:
-                    updates.append((ANNOTATION_TAG_CONST_VALUE_MISMATCH, current_value, new_value, context_path))
-                elif "ASSIGN" in node_type:
-                    updates.append(("NODE_TYPE_MISMATCH", current_value, new_value, context_path))
-                elif node_type.startswith("FUNCTION:"):
-                    # Function name was changed (e.g. def foo → def bar)
-                    updates.append((ANNOTATION_TAG_INCORRECT_FUNCTION_NAME, current_value, new_value, context_path))
-                elif "ARG:" in node_type:
-                    continue  # Parameter name difference is not an error per spec
-                elif "VAR" in node_type:
-                    continue  # Skip variable changes for now
+        for update, cur_kind, new_kind, context_path in index.by_type['update']:
+            node_type = _structural_element(update['path'][-1]).upper()
+            current_value = update['current']
+            new_value = update['new']
+
+            if cur_kind in _unnecessary_map and new_kind and current_value != new_value:
+                updates.append(PrimaryError(_unnecessary_map[cur_kind], current_value, new_value, context_path))
+
+            # Handle "missing construct" cases based on the new node type
+            if new_kind in (
+            "FOR", "WHILE", "IF", "CALL", "ASSIGN", "FUNCTIONDEF", "RETURN", "ARGUMENT"):
+                missing_map = {
+                    "FOR": "MISSING_FOR_LOOP",
+                    "WHILE": "MISSING_WHILE_LOOP",
+                    "IF": "MISSING_IF_STATEMENT",
+                    "CALL": "MISSING_CALL_STATEMENT",
+                    "ASSIGN": "MISSING_ASSIGN_STATEMENT",
+                }
+                updates.append(PrimaryError(missing_map[new_kind], new_value, context_path))
+
+
+            if "COMPARE" in node_type:
+                updates.append(PrimaryError(ANNOTATION_TAG_INCORRECT_OPERATION_IN_COMP, current_value, new_value, context_path))
+            elif "OPERATION" in node_type:
+                updates.append(PrimaryError(ANNOTATION_TAG_INCORRECT_OPERATION_IN_ASSIGN, current_value, new_value, context_path))
+            elif "CONST" in node_type:
+                updates.append(PrimaryError(ANNOTATION_TAG_CONST_VALUE_MISMATCH, current_value, new_value, context_path))
+            elif "ASSIGN" in node_type:
+                updates.append(PrimaryError("NODE_TYPE_MISMATCH", current_value, new_value, context_path))
+            elif node_type.startswith("FUNCTION:"):
+                # Function name was changed (e.g. def foo → def bar)
+                updates.append(PrimaryError(ANNOTATION_TAG_INCORRECT_FUNCTION_NAME, current_value, new_value, context_path))
+            elif "ARG:" in node_type:
+                continue  # Parameter name difference is not an error per spec
+            elif "VAR" in node_type:
+                continue  # Skip variable changes for now
 
         return updates
 
@@ -554,48 +594,43 @@ class ErrorAnnotation:
         If the value of a variable changes in any of the update operations, it is flagged as a mismatch.
 
         Args:
-            patterns (list): A list of dictionaries containing the type of operation,
-                             path, current value, and new value for transformations.
+            patterns (list or OpIndex): A list of dictionaries containing the type of operation,
+                                        path, current value, and new value for transformations,
+                                        or their index.
 
         Returns:
             list: A list of tuples in the format:
                   ("VARIABLE_MISMATCH", variable_name, context_path)
         """
         variable_updates = {}
+        index = OpIndex.of(patterns)
 
-        # Helper function to remove indices from path elements
-        def structural_path_element(element):
-            return element.split("[")[0]
-
-        # Collect all updates involving variables
-        for pattern in patterns:
-            if pattern['type'] == 'update':
-
-                # Handle cases where ":" is present
-                if ": " in pattern['current']:
-                    # The space is important here as in the label of the Var node its 'Var: i'
-                    cur_node_type, cur_var_value = pattern['current'].split(": ", 1)
-
-                    if ": " in pattern['new']:
-                        new_node_type, new_var_value = pattern['new'].split(": ", 1)
+        # Collect all updates involving variables: those into a Var node, of which only the
+        # updates of a Var node are kept
+        for pattern, _, _, context_path in index.by_kind.get(('update', 'VAR'), ()):
+            # Handle cases where ":" is present
+            if ": " in pattern['current']:
+                # The space is important here as in the label of the Var node its 'Var: i'
+                cur_node_type, cur_var_value = pattern['current'].split(": ", 1)
 
-                        # Check if the last element is a Var node
-                        if cur_node_type.upper() == "VAR" and new_node_type.upper() == "VAR":
-                            context_path = " > ".join(structural_path_element(p) for p in pattern['path'])
+                if ": " in pattern['new']:
+                    new_node_type, new_var_value = pattern['new'].split(": ", 1)
 
-                            # Track the variable updates
-                            if cur_var_value not in variable_updates:
-                                variable_updates[cur_var_value] = {'values': set(), 'context_paths': set()}
+                    # Check if the last element is a Var node
+                    if cur_node_type.upper() == "VAR" and new_node_type.upper() == "VAR":
+                        # Track the variable updates
+                        if cur_var_value not in variable_updates:
+                            variable_updates[cur_var_value] = {'values': set(), 'context_paths': set()}
 
-                            variable_updates[cur_var_value]['values'].add(new_var_value)
-                            variable_updates[cur_var_value]['context_paths'].add(context_path)
+                        variable_updates[cur_var_value]['values'].add(new_var_value)
+                        variable_updates[cur_var_value]['context_paths'].add(context_path)
 
         # Check for inconsistencies
         mismatches = []
         for var_name, details in variable_updates.items():
             if len(details['values']) > 1:  # Inconsistent updates
                 for context_path in details['context_paths']:
-                    mismatches.append(("VARIABLE_MISMATCH", var_name, context_path))
+                    mismatches.append(PrimaryError("VARIABLE_MISMATCH", var_name, context_path))
 
         return mismatches
 
@@ -8,13 +8,37 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
-import ast
-from .convert_ast_to_custom_node import ast_to_custom_node
 from .error_checks import get_customized_error_tags
 from .zang_shasha_distance import distance
 from .node import Node
 from .error_annotation import ErrorAnnotation
-from .node_functions import anonymize_variable_names
+from .annotated_tree import AnnotatedTree
+from .reference_set import ReferenceSet, build_annotated_tree
+from .pair_memo import subtree_pair_memo
+
+
+def _build_code_trees(code1: str, code2: str):
+    """
+    Parse two Python code snippets and turn them into anonymized, annotated custom Node trees.
+
+    Args:
+        code1 (str): The first (incorrect) code snippet.
+        code2 (str): The second (correct) code snippet.
+
+    Returns:
+        tuple: The AnnotatedTrees of the two custom Node trees.
+
+    Raises:
+        ValueError: If one of the snippets could not be converted into a tree.
+    """
+    tree1 = build_annotated_tree(code1)
+    tree2 = build_annotated_tree(code2)
+
+    # Ensure both trees have valid roots
+    if tree1 is None or tree2 is None:
+        raise ValueError("Failed to parse one or both code snippets.")
+
+    return tree1, tree2
 
 
 def get_primary_code_errors(code1: str, code2: str):
@@ -46,32 +70,35 @@ def get_primary_code_errors(code1: str, code2: str):
             - dist: The computed tree edit distance between the two code snippets. This can be an integer or a float.
             - errors (list): A list of error annotations that detail the differences between the two code snippets.
     """
-    # Parse the AST for both code snippets
-    symbolic_code1 = ast.parse(code1)
-    symbolic_code2 = ast.parse(code2)
+    tree1, tree2 = _build_code_trees(code1, code2)
+    return _annotated_errors(tree1, tree2)
 
-    # Convert AST to custom Node structure
-    tree1 = ast_to_custom_node(symbolic_code1)
-    tree2 = ast_to_custom_node(symbolic_code2)
 
-    # Ensure both trees have valid roots
-    if not tree1 or not tree2:
-        raise ValueError("Failed to parse one or both code snippets.")
+def _annotated_errors(tree1, tree2):
+    """
+    Compute the tree edit distance between two trees and turn its edit script into error annotations.
 
-    # Variable anonymization — applied independently to each tree so that
-    # programs using different variable names for the same structural role
-    # (e.g. ``n`` vs ``x``) are not penalised for a pure naming difference.
-    # Each tree's variables are renamed VAR_0, VAR_1, … by order of first
-    # appearance (pre-order). After this step the distance algorithm only
-    # sees genuine structural or value differences.
-    anonymize_variable_names(tree1[0])
-    anonymize_variable_names(tree2[0])
+    The trees can be custom Node trees or AnnotatedTrees; annotated trees are used as they are,
+    which lets `get_typology_based_code_error` annotate the closest correct code with the trees
+    it already built. Neither tree is modified: the edit operations only refer to the paths
+    the annotated trees precompute. The trees are not collapsed (see `identical_subtrees`): the
+    collapsed edit script has the same cost but may break ties between equal-cost mappings
+    differently, which would change the annotations.
 
+    Args:
+        tree1 (Node or AnnotatedTree): The tree of the first (incorrect) code snippet.
+        tree2 (Node or AnnotatedTree): The tree of the second (correct) code snippet.
+
+    Returns:
+        tuple: The tree edit distance and the list of error annotations, as returned by
+               `get_primary_code_errors`.
+    """
     # Zhang-Shasha Tree Edit Distance computation
     dist, ops = distance(
-        tree1[0],
-        tree2[0],
+        tree1,
+        tree2,
         get_children=Node.get_children,
+        memo=subtree_pair_memo,
     )
 
     # --- Critical Section for Future Modifications ---
@@ -89,18 +116,76 @@ def get_primary_code_errors(code1: str, code2: str):
     return dist, errors
 
 
-def get_typology_based_code_error(incorrect_code : str, correct_code_list: list[str]):
+def get_code_distance(code1: str, code2: str):
+    """
+    Compute only the tree edit distance between two Python code snippets.
+
+    This is the cheap counterpart of `get_primary_code_errors`: the trees are built the same
+    way, but the Zhang-Shasha computation stops once the cost matrices are filled. No edit
+    operation is built and no error annotation is produced, which makes it suitable for
+    ranking several candidate correct codes before annotating the closest one. Since no edit
+    script is needed, the orientation of the trees is chosen from their shape.
+
+    Args:
+        code1 (str): The first (incorrect) code snippet.
+        code2 (str): The second (correct) code snippet.
+
+    Returns:
+        float: The computed tree edit distance between the two code snippets.
+    """
+    tree1, tree2 = _build_code_trees(code1, code2)
+    return distance(tree1, tree2, get_children=Node.get_children, return_ops=False, kernel='vectorized',
+                    orientation='auto', collapse_identical=True, trim_siblings=True, memo=subtree_pair_memo)
+
+
+def _closest_reference(tree1: AnnotatedTree, references: ReferenceSet):
+    """
+    Find the correct code with the smallest tree edit distance to the incorrect code.
+
+    The incorrect code is annotated once by the caller and compared as it is with every tree
+    of the reference set. Once a first distance is known, every other correct code is
+    compared with `max_cost` set just below the best distance found so far (distances are
+    integers): a code that cannot beat it is ruled out by the lower bounds of `lower_bounds`
+    or stops early, instead of going through the full dynamic program. Such a code can at best
+    tie, and ties go to the first code, so the result is the same as ranking every code with
+    `get_code_distance`.
+
+    Args:
+        tree1 (AnnotatedTree): The annotated tree of the erroneous code snippet.
+        references (ReferenceSet): The preprocessed candidate correct code snippets.
+
+    Returns:
+        int: The position of the closest correct code in the set (the first one on ties).
+    """
+    best_distance = None
+    closest = None
+    for index, tree2 in enumerate(references.trees):
+        max_cost = None if best_distance is None else best_distance - 1
+        dist = distance(tree1, tree2, get_children=Node.get_children, return_ops=False, max_cost=max_cost,
+                        kernel='vectorized', orientation='auto', collapse_identical=True,
+                        trim_siblings=True, memo=subtree_pair_memo)
+        if best_distance is None or dist < best_distance:
+            best_distance = dist
+            closest = index
+    return closest
+
+
+def get_typology_based_code_error(incorrect_code : str, correct_code_list, result_cache=None):
     """
     Compute customized code error annotations by applying a two-step wrapper process.
 
     This function acts as a secondary wrapper around the core code error extraction process.
     It performs the following steps:
-      1. It first calls `get_primary_code_errors`, which internally uses the reimplemented Zhang-Shasha
-         tree edit distance algorithm to calculate the differences between two Python code snippets.
+      1. It looks for the closest correct code (the first one on ties) by computing only the
+         tree edit distance, bounded by the best distance found so far.
+      2. It then annotates the differences with that closest code as `get_primary_code_errors`
+         does, reusing the trees built for the comparisons: the incorrect code is parsed once per
+         call, and the correct codes once per `ReferenceSet`. The reimplemented Zhang-Shasha tree
+         edit distance algorithm calculates the differences between the two Python code snippets.
          - The `get_primary_code_errors` function generates a detailed list of errors by calling
            the `concatenate_all_errors` method, resulting in a rich set of error data based on
            multiple criteria.
-      2. It then applies a typology overlay by calling `get_customized_error_tags` with the
+      3. It finally applies a typology overlay by calling `get_customized_error_tags` with the
          original error list. This additional processing filters and refines the error tags according
          to a limited set of error types tailored for current services.
 
@@ -113,9 +198,18 @@ def get_typology_based_code_error(incorrect_code : str, correct_code_list: list[
       - Future modifications may consolidate these steps if a simpler error collection process
         that aligns directly with service requirements is developed.
 
+    The correct codes can be given as a `ReferenceSet`, which parses and annotates them once:
+    a service grading many submissions of the same exercise should build one set per exercise
+    and pass it on every call. A plain list is turned into a `ReferenceSet` on each call.
+
+    With a `result_cache.ResultCache`, a submission whose anonymized tree was already graded
+    against the same correct codes is answered from the cache, without computing any distance.
+
     Args:
         correct_code_list: Erroneous code snippet
-        incorrect_code: List of possible correct code snippets.
+        incorrect_code: List of possible correct code snippets, or a `ReferenceSet` built from it.
+        result_cache (ResultCache, optional): The cache of the results. Defaults to None, in
+                                              which case every result is computed.
 
     Returns:
         tuple: A tuple containing:
@@ -124,10 +218,30 @@ def get_typology_based_code_error(incorrect_code : str, correct_code_list: list[
               typology rules overlay.
     """
 
-    results = []
-    for correct_code in correct_code_list:
-        dist, primary_errors = get_primary_code_errors(incorrect_code, correct_code)
-        typology_based_error_tags = get_customized_error_tags(primary_errors)
-        results.append([dist, typology_based_error_tags])
+    # The incorrect code is parsed, anonymized and annotated once, and that same tree is
+    # compared with every correct code, then annotated against the closest one.
+    tree1 = build_annotated_tree(incorrect_code)
+    references = correct_code_list
+    if not isinstance(references, ReferenceSet):
+        references = ReferenceSet(references)
+    if tree1 is None or not len(references):
+        raise ValueError("Failed to parse one or both code snippets.")
+    tree1 = references.submission_tree(tree1)
+
+    if result_cache is not None:
+        key = result_cache.key(tree1, references)
+        result = result_cache.get(key)
+        if result is not None:
+            return result
+
+    # Find the closest correct code with distance-only computations; the edit script and the
+    # annotations are only produced for that one (the first one on ties), from the trees
+    # already built.
+    closest = _closest_reference(tree1, references)
+
+    dist, primary_errors = _annotated_errors(tree1, references.trees[closest])
+    typology_based_error_tags = get_customized_error_tags(primary_errors)
 
-    return min(results, key=lambda x: x[0])
+    if result_cache is not None:
+        result_cache.put(key, [dist, typology_based_error_tags])
+    return [dist, typology_based_error_tags]
@@ -0,0 +1,399 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Annotated trees stored as flat arrays, which can be placed in shared memory.
+
+An `AnnotatedTree` keeps the `Node` object graph of its tree alive, and every process holding
+it touches the reference counts of these objects, so the pages of a forked worker are copied
+one by one. A `FlatTree` holds everything the distance engine reads from a tree in a few
+contiguous int32 arrays (label ids, LMDs, keyroots, parents, pre-order label ids and path
+steps, for the tree and its mirror image) and two UTF-8 string tables (the labels and the path
+steps). It can be written into a `multiprocessing.shared_memory` block once and attached by any
+number of workers without copying the arrays.
+
+The label ids of the block refer to its own table of labels, since label tables are not shared
+between processes; attaching a tree maps them once into a `LabelTable` of the worker, which is
+the only array built per worker.
+"""
+
+from multiprocessing.shared_memory import SharedMemory
+from numpy import array, concatenate, cumsum, frombuffer, int32, zeros
+from .annotated_tree import LabelTable
+
+# Header of the shared layout: the number of nodes, of keyroots, of mirrored keyroots and of
+# ancestors on the root path, then the number of labels and their size in bytes, and the number
+# of path steps and their size in bytes.
+_HEADER_SIZE = 8
+
+
+class _StringTable:
+    """
+    A read-only table of strings stored as UTF-8 bytes and their int32 offsets.
+
+    Strings are decoded when they are read, so that attaching a tree does not create them.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [str(string).encode() for string in strings]
+        offsets = concatenate((zeros(1, int32), cumsum([len(item) for item in encoded], dtype=int32)))
+        return cls(b"".join(encoded), offsets.astype(int32))
+
+    def __getitem__(self, index):
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class FlatTree:
+    """
+    An annotated tree stored as flat int32 arrays, without any `Node` object.
+
+    It exposes the attributes of `AnnotatedTree` read by `distance`, so both kinds of trees can be
+    compared with one another. The LMDs, keyroots and parents are memoryviews over the arrays,
+    which the kernels index like lists. Only the operations of the dynamic program run on flat
+    trees: `distance` compares them in full, without collapsing identical subtrees or trimming
+    siblings, which need the `Node` objects.
+
+    Attributes:
+        local_label_ids (numpy.ndarray): The id of the label of each node in `labels`, in post-order.
+        label_ids (numpy.ndarray): The same labels interned in `label_table`, in post-order.
+        lmds (memoryview): The leftmost leaf descendant of each node, by post-order ID.
+        lmds_array (numpy.ndarray): The same LMDs as an int32 array.
+        keyroots (memoryview): The keyroots of the tree, sorted.
+        parents (memoryview): The post-order ID of the parent of each node (-1 for the root).
+        path_ids (numpy.ndarray): The id in `steps` of the last step of the path of each node.
+        preorder_label_ids (numpy.ndarray): The interned label ids of the nodes in pre-order.
+        root_path_ids (numpy.ndarray): The ids in `steps` of the ancestors of the root, if it was a subtree.
+        labels (_StringTable): The distinct labels of the tree.
+        steps (_StringTable): The distinct path steps of the tree (see `AnnotatedTree.nodes_path`).
+        label_table (LabelTable): The symbol table the labels are interned in.
+    """
+
+    def __init__(self, local_label_ids, lmds, keyroots, parents, path_ids, preorder_label_ids,
+                 root_path_ids, labels, steps, label_table=None):
+        """
+        Wrap the arrays of one orientation of a tree.
+
+        Args:
+            local_label_ids (numpy.ndarray): The id of the label of each node in `labels`.
+            lmds (numpy.ndarray): The LMD of each node.
+            keyroots (numpy.ndarray): The sorted keyroots.
+            parents (numpy.ndarray): The parent of each node.
+            path_ids (numpy.ndarray): The id in `steps` of the last path step of each node.
+            preorder_label_ids (numpy.ndarray): The ids in `labels` of the nodes in pre-order.
+            root_path_ids (numpy.ndarray): The ids in `steps` of the ancestors of the root.
+            labels (_StringTable): The distinct labels.
+            steps (_StringTable): The distinct path steps.
+            label_table (LabelTable, optional): The symbol table to intern the labels in.
+                                                Defaults to None, in which case the tree gets a
+                                                table of its own.
+        """
+        self.local_label_ids = local_label_ids
+        self.lmds_array = lmds
+        self.lmds = memoryview(lmds)
+        self.keyroots = memoryview(keyroots)
+        self.parents = memoryview(parents)
+        self.path_ids = path_ids
+        self.root_path_ids = root_path_ids
+        self.labels = labels
+        self.steps = steps
+        self.label_table = label_table if label_table is not None else LabelTable()
+
+        interned = array([self.label_table.intern(labels[label_id]) for label_id in range(len(labels))], int32)
+        self.label_ids = interned[local_label_ids]
+        self.preorder_label_ids = interned[preorder_label_ids]
+        self._local_preorder_label_ids = preorder_label_ids
+        self._nodes_path = None
+        self._nodes_context = None
+        self._mirror = None
+        self._shared_memory = None
+
+    @classmethod
+    def from_tree(cls, tree):
+        """
+        Flatten an annotated tree and its mirror image.
+
+        Args:
+            tree (AnnotatedTree): The annotated tree.
+
+        Returns:
+            FlatTree: The flat tree, whose `mirrored` is the flat mirror image.
+        """
+        labels = LabelTable()
+        steps = LabelTable()
+        root_path_ids = array([steps.intern(step) for step in tree.nodes_path[-1][:-1]], int32)
+
+        orientations = []
+        for oriented in (tree, tree.mirrored()):
+            local_label_ids = [labels.intern(oriented.label(node_id)) for node_id in range(len(oriented))]
+            local_ids = dict(zip(oriented.label_ids.tolist(), local_label_ids))
+            orientations.append((
+                array(local_label_ids, int32),
+                array(oriented.lmds, int32),
+                array(oriented.keyroots, int32),
+                array(oriented.parents, int32),
+                array([steps.intern(path[-1]) for path in oriented.nodes_path], int32),
+                array([local_ids[label_id] for label_id in oriented.preorder_label_ids], int32),
+            ))
+
+        label_strings = _StringTable.from_strings(labels.labels)
+        step_strings = _StringTable.from_strings(steps.labels)
+        return cls._linked(orientations, root_path_ids, label_strings, step_strings, tree.label_table)
+
+    @classmethod
+    def _linked(cls, orientations, root_path_ids, labels, steps, label_table):
+        """
+        Build the flat trees of both orientations and link them as each other's mirror image.
+        """
+        if label_table is None:
+            label_table = LabelTable()
+        flat, mirror = (cls(*arrays, root_path_ids, labels, steps, label_table) for arrays in orientations)
+        flat._mirror = mirror
+        mirror._mirror = flat
+        return flat
+
+    def __len__(self):
+        """
+        Return the number of nodes of the tree.
+        """
+        return len(self.lmds)
+
+    def label(self, node_id):
+        """
+        Return the label of a node, by post-order ID.
+
+        Args:
+            node_id (int): The post-order ID of the node.
+
+        Returns:
+            str: The label of the node.
+        """
+        return self.labels[self.local_label_ids[node_id]]
+
+    def relabeled(self, label_table):
+        """
+        Return the same tree with its labels interned in another label table.
+
+        The arrays and string tables are shared; only the interned label ids are new.
+
+        Args:
+            label_table (LabelTable): The table to intern the labels in.
+
+        Returns:
+            FlatTree: The relabeled tree, whose `mirrored` is the relabeled mirror image, or this
+                      tree if its label ids are already valid in `label_table`.
+        """
+        if label_table.covers(self.label_table):
+            return self
+        orientations = [(oriented.local_label_ids, oriented.lmds_array, oriented.keyroots.obj,
+                         oriented.parents.obj, oriented.path_ids, oriented._local_preorder_label_ids)
+                        for oriented in (self, self._mirror)]
+        tree = self._linked(orientations, self.root_path_ids, self.labels, self.steps, label_table)
+        tree._shared_memory = tree._mirror._shared_memory = self._shared_memory
+        return tree
+
+    def mirrored(self):
+        """
+        Return the flat mirror image of the tree, stored along with it.
+
+        Returns:
+            FlatTree: The flat tree whose children are visited from right to left.
+        """
+        return self._mirror
+
+    @property
+    def nodes_path(self):
+        """
+        list: The path from the root to each node, by post-order ID (see `AnnotatedTree.nodes_path`).
+        """
+        if self._nodes_path is None:
+            self._compute_paths()
+        return self._nodes_path
+
+    @property
+    def nodes_context(self):
+        """
+        list: The " > "-joined path of each node, by post-order ID.
+        """
+        if self._nodes_context is None:
+            self._compute_paths()
+        return self._nodes_context
+
+    def _compute_paths(self):
+        """
+        Rebuild the paths and context strings from the path steps, top-down like `AnnotatedTree`.
+        """
+        steps = self.steps
+        root_path = [steps[step_id] for step_id in self.root_path_ids.tolist()]
+        path_ids = self.path_ids.tolist()
+        size = len(self)
+        paths = [None] * size
+        contexts = [None] * size
+        for node_id in range(size - 1, -1, -1):
+            parent_id = self.parents[node_id]
+            parent_path = root_path if parent_id == -1 else paths[parent_id]
+            path = parent_path + [steps[path_ids[node_id]]]
+            paths[node_id] = path
+            contexts[node_id] = " > ".join(path)
+        self._nodes_path = paths
+        self._nodes_context = contexts
+
+    def _sections(self):
+        """
+        Return the header and the int32 sections of the shared layout, then its byte sections.
+        """
+        mirror = self._mirror
+        header = array([len(self), len(self.keyroots), len(mirror.keyroots), len(self.root_path_ids),
+                        len(self.labels), len(self.labels.data), len(self.steps), len(self.steps.data)], int32)
+        sections = [header]
+        for oriented in (self, mirror):
+            sections += [oriented.local_label_ids, oriented.lmds_array, oriented.keyroots.obj,
+                         oriented.parents.obj, oriented.path_ids, oriented._local_preorder_label_ids]
+        sections += [self.root_path_ids, self.labels.offsets, self.steps.offsets]
+        return sections, [self.labels.data, self.steps.data]
+
+    @property
+    def nbytes(self):
+        """
+        int: The size of the shared layout of the tree and its mirror image, in bytes.
+        """
+        sections, data = self._sections()
+        return sum(section.nbytes for section in sections) + sum(len(item) for item in data)
+
+    def write(self, buffer):
+        """
+        Write the tree and its mirror image into a writable buffer of at least `nbytes` bytes.
+
+        Args:
+            buffer: The buffer, e.g. the `buf` of a `SharedMemory` block.
+        """
+        sections, data = self._sections()
+        buffer = memoryview(buffer).cast("B")
+        offset = 0
+        for section in sections:
+            frombuffer(buffer, int32, len(section), offset)[:] = section
+            offset += section.nbytes
+        for item in data:
+            buffer[offset:offset + len(item)] = item
+            offset += len(item)
+
+    @classmethod
+    def from_buffer(cls, buffer, label_table=None):
+        """
+        Read a tree written by `write`, without copying its arrays.
+
+        The returned arrays are views over the buffer, which must outlive the tree.
+
+        Args:
+            buffer: The buffer holding the tree.
+            label_table (LabelTable, optional): The symbol table to intern the labels in.
+                                                Defaults to None, in which case the tree gets a
+                                                table of its own.
+
+        Returns:
+            FlatTree: The flat tree, whose `mirrored` is the flat mirror image.
+        """
+        buffer = memoryview(buffer).cast("B")
+        offset = 0
+
+        def read(count):
+            nonlocal offset
+            section = frombuffer(buffer, int32, count, offset)
+            offset += section.nbytes
+            return section
+
+        size, keyroots, mirror_keyroots, root_path, labels, label_bytes, steps, step_bytes = \
+            read(_HEADER_SIZE).tolist()
+        orientations = [tuple(read(count) for count in (size, size, keyroot_count, size, size, size))
+                        for keyroot_count in (keyroots, mirror_keyroots)]
+        root_path_ids = read(root_path)
+        label_offsets = read(labels + 1)
+        step_offsets = read(steps + 1)
+        label_data = buffer[offset:offset + label_bytes]
+        step_data = buffer[offset + label_bytes:offset + label_bytes + step_bytes]
+        return cls._linked(orientations, root_path_ids, _StringTable(label_data, label_offsets),
+                           _StringTable(step_data, step_offsets), label_table)
+
+    def to_shared_memory(self, name=None):
+        """
+        Copy the tree and its mirror image into a new shared memory block.
+
+        The caller owns the block: it must keep it open while workers may attach it, then
+        `close()` and `unlink()` it.
+
+        Args:
+            name (str, optional): The name of the block. Defaults to None, in which case a
+                                  unique name is generated.
+
+        Returns:
+            multiprocessing.shared_memory.SharedMemory: The block, to be attached by its `name`.
+        """
+        shared_memory = SharedMemory(name=name, create=True, size=max(self.nbytes, 1))
+        self.write(shared_memory.buf)
+        return shared_memory
+
+    @classmethod
+    def attach(cls, name, label_table=None):
+        """
+        Attach a tree written into a shared memory block by `to_shared_memory`, without copying it.
+
+        The block stays attached as long as the tree (or its mirror image) is alive. Only the
+        process that created the block unlinks it.
+
+        Args:
+            name (str): The name of the block.
+            label_table (LabelTable, optional): The symbol table to intern the labels in.
+                                                Defaults to None, in which case the tree gets a
+                                                table of its own.
+
+        Returns:
+            FlatTree: The flat tree, whose `mirrored` is the flat mirror image.
+        """
+        shared_memory = _attach_shared_memory(name)
+        tree = cls.from_buffer(shared_memory.buf, label_table)
+        tree._shared_memory = shared_memory
+        tree._mirror._shared_memory = shared_memory
+        return tree
+
+
+class _AttachedMemory(SharedMemory):
+    """
+    A shared memory block attached by a flat tree, whose arrays are views over its mapping.
+
+    The mapping stays alive as long as any of these views, even once the block is dropped, so
+    failing to close it while views remain (typically at interpreter exit) is not an error.
+    """
+
+    def __del__(self):
+        try:
+            self.close()
+        except BufferError:
+            pass
+
+
+def _attach_shared_memory(name):
+    """
+    Open an existing shared memory block, without tracking it where the Python version allows it.
+
+    Before Python 3.13, attaching a block registers it with the resource tracker. Workers started
+    by `multiprocessing` share the tracker of the process that created the block, for which the
+    registration is a no-op.
+    """
+    try:
+        return _AttachedMemory(name=name, track=False)
+    except TypeError:
+        return _AttachedMemory(name=name)
@@ -0,0 +1,197 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Collapse the subtrees shared by two trees before computing their edit distance.
+
+Two submissions of the same exercise usually share large identical subtrees (the whole
+"Condition:" of a `range` loop, runs of identical `Call: avancer` statements, ...). Each
+maximal subtree of one tree whose structural hash (`AnnotatedTree.subtree_hashes`) also
+occurs in the other tree is replaced by a single leaf, a "block", labelled by that hash, so
+that the dynamic program runs on much smaller trees:
+
+- matching two blocks with the same label costs nothing and stands for matching both
+  subtrees node by node;
+- removing (inserting) a block costs the removal (insertion) of its whole subtree;
+- updating a block costs the update of its root plus the removal (insertion) of all its
+  other nodes (`CostTables.update_extra_a` and `update_extra_b`).
+
+Every mapping of the collapsed trees is thus a mapping of the original trees with the same
+cost, and the collapsed distance is an upper bound of the exact one; `distance` only uses it
+when a lower bound proves that it is exact.
+"""
+
+from numpy import arange, array, concatenate, cumsum, int32, where, zeros
+from .annotated_tree import AnnotatedTree, LabelTable
+from .cost_model import CostTables
+
+
+def _subtree_sizes(tree):
+    """
+    Return the number of nodes of the subtree rooted at each node, by post-order id.
+    """
+    return [node_id - lmd + 1 for node_id, lmd in enumerate(tree.lmds)]
+
+
+def _blocks(tree, other_hashes):
+    """
+    Return the post-order ids of the maximal subtrees of `tree` whose hash is in `other_hashes`.
+    """
+    hashes = tree.subtree_hashes
+    parents = tree.parents
+    blocks = []
+    for node_id, size in enumerate(_subtree_sizes(tree)):
+        if size > 1 and hashes[node_id] in other_hashes:
+            parent_id = parents[node_id]
+            if parent_id == -1 or hashes[parent_id] not in other_hashes:
+                blocks.append(node_id)
+    return blocks
+
+
+def _collapsed_tree(tree, blocks, label_table):
+    """
+    Annotate a tree in which every block is a leaf labelled by its subtree hash.
+
+    Args:
+        tree (AnnotatedTree): The original annotated tree.
+        blocks (list): The post-order ids of the roots of the collapsed subtrees.
+        label_table (LabelTable): The label table shared by both collapsed trees.
+
+    Returns:
+        tuple: The collapsed AnnotatedTree and the original post-order id of each of its nodes.
+    """
+    block_labels = {id(tree.nodes[node_id]): "\0" + tree.subtree_hashes[node_id].hex() for node_id in blocks}
+    get_children = tree.get_children
+
+    def collapsed_children(node):
+        return [] if id(node) in block_labels else get_children(node)
+
+    def collapsed_label(node):
+        return block_labels.get(id(node), node.label)
+
+    collapsed = AnnotatedTree(tree.root, collapsed_children, label_table, collapsed_label)
+    original_ids = {id(node): node_id for node_id, node in enumerate(tree.nodes)}
+    return collapsed, array([original_ids[id(node)] for node in collapsed.nodes], int32)
+
+
+def collapse_identical_subtrees(A, B):
+    """
+    Collapse the maximal subtrees of each tree that also occur in the other tree.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+
+    Returns:
+        tuple or None: The collapsed trees and the original post-order id of each of their
+                       nodes, as `(A2, B2, a_ids, b_ids)`, or None when no subtree of more
+                       than one node is shared.
+    """
+    sizes_a = _subtree_sizes(A)
+    sizes_b = _subtree_sizes(B)
+    hashes_a = {digest for digest, size in zip(A.subtree_hashes, sizes_a) if size > 1}
+    hashes_b = {digest for digest, size in zip(B.subtree_hashes, sizes_b) if size > 1}
+    blocks_a = _blocks(A, hashes_b)
+    blocks_b = _blocks(B, hashes_a)
+    if not blocks_a and not blocks_b:
+        return None
+
+    # The block labels only need to be consistent between both collapsed trees, so they are
+    # interned in a table of their own rather than in the shared one.
+    label_table = LabelTable()
+    A2, a_ids = _collapsed_tree(A, blocks_a, label_table)
+    B2, b_ids = _collapsed_tree(B, blocks_b, label_table)
+    return A2, B2, a_ids, b_ids
+
+
+def _collapsed_side(costs, tree, collapsed, ids):
+    """
+    Return the costs of the nodes of one collapsed tree and the extra cost of their updates.
+
+    A block, i.e. a leaf of the collapsed tree whose original node has children, costs as much
+    as its whole original subtree; any other node keeps its own cost.
+    """
+    cumulative = concatenate((zeros(1, int32), cumsum(costs, dtype=int32)))
+    own_costs = costs[ids]
+    original_lmds = tree.lmds_array[ids]
+    is_block = (collapsed.lmds_array == arange(len(ids))) & (original_lmds != ids)
+    node_costs = where(is_block, cumulative[ids + 1] - cumulative[original_lmds], own_costs)
+    return node_costs, node_costs - own_costs
+
+
+def collapsed_costs(costs, A, B, A2, B2, a_ids, b_ids):
+    """
+    Derive the cost tables of the collapsed trees from those of the original trees.
+
+    Args:
+        costs (CostTables): The costs of the original trees.
+        A (AnnotatedTree): The first original annotated tree.
+        B (AnnotatedTree): The second original annotated tree.
+        A2 (AnnotatedTree): The first collapsed tree.
+        B2 (AnnotatedTree): The second collapsed tree.
+        a_ids (numpy.ndarray): The original post-order id of each node of the first collapsed tree.
+        b_ids (numpy.ndarray): The original post-order id of each node of the second collapsed tree.
+
+    Returns:
+        CostTables: The costs of the collapsed trees.
+    """
+    remove_costs, extra_a = _collapsed_side(costs.remove_costs, A, A2, a_ids)
+    insert_costs, extra_b = _collapsed_side(costs.insert_costs, B, B2, b_ids)
+    return CostTables(remove_costs, insert_costs, costs.classes_a[a_ids], costs.classes_b[b_ids],
+                      costs.update_matrix, extra_a, extra_b)
+
+
+def expand_edit_script(script, A, B, A2, B2, a_ids, b_ids):
+    """
+    Turn the edit script of the collapsed trees into an edit script of the original trees.
+
+    Operations on ordinary nodes are only renumbered. A matched pair of blocks becomes the
+    'match' operations of both subtrees node by node, which need not be computed since both
+    subtrees are identical; a removed (inserted) block becomes the removal (insertion) of every
+    node of its subtree; an updated block becomes the removal (insertion) of the other nodes of
+    its subtree and the update, or match, of its root.
+
+    Args:
+        script (list[tuple]): The (type, id in A2, id in B2) operations of the collapsed trees.
+        A (AnnotatedTree): The first original annotated tree.
+        B (AnnotatedTree): The second original annotated tree.
+        A2 (AnnotatedTree): The first collapsed tree.
+        B2 (AnnotatedTree): The second collapsed tree.
+        a_ids (numpy.ndarray): The original post-order id of each node of the first collapsed tree.
+        b_ids (numpy.ndarray): The original post-order id of each node of the second collapsed tree.
+
+    Returns:
+        list[tuple]: The (type, id in A, id in B) operations of the original trees.
+    """
+    a_ids = a_ids.tolist()
+    b_ids = b_ids.tolist()
+    Al = A.lmds
+    Bl = B.lmds
+
+    ops = []
+    for op_type, a2, b2 in script:
+        a_id = None if a2 is None else a_ids[a2]
+        b_id = None if b2 is None else b_ids[b2]
+        # A block is a leaf of the collapsed tree whose original node has children.
+        a_first = a_id if a2 is None or A2.lmds[a2] != a2 else Al[a_id]
+        b_first = b_id if b2 is None or B2.lmds[b2] != b2 else Bl[b_id]
+        if op_type == 'delete':
+            ops.extend(('delete', node_id, None) for node_id in range(a_first, a_id + 1))
+        elif op_type == 'insert':
+            ops.extend(('insert', None, node_id) for node_id in range(b_first, b_id + 1))
+        elif op_type == 'match' and a_first != a_id:
+            # Two blocks with the same hash: identical subtrees, matched node by node.
+            ops.extend(('match', a_first + offset, b_first + offset) for offset in range(a_id - a_first + 1))
+        else:
+            ops.extend(('delete', node_id, None) for node_id in range(a_first, a_id))
+            ops.extend(('insert', None, node_id) for node_id in range(b_first, b_id))
+            same_label = A.label_ids[a_id] == B.label_ids[b_id]
+            ops.append(('match' if same_label else 'update', a_id, b_id))
+    return ops
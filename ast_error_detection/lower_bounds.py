@@ -0,0 +1,145 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Cheap lower bounds of the unit-cost Zhang-Shasha tree edit distance.
+
+Every bound below is admissible: it never exceeds the distance computed by `distance` with
+the default (unit) cost model. They are used to skip the exact computation for a reference
+solution that provably cannot be closer than the best one found so far.
+"""
+
+from numpy import arange, array, bincount, concatenate, empty, int32, minimum, unique
+
+
+def size_lower_bound(A, B):
+    """
+    Bound the distance by the difference between the number of nodes of both trees.
+
+    Each insertion or removal changes the size of a tree by one, and an update does not
+    change it, so at least that many insertions or removals are needed.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+
+    Returns:
+        int: The lower bound.
+    """
+    return abs(len(A) - len(B))
+
+
+def histogram_lower_bound(A, B):
+    """
+    Bound the distance by the L1 distance between the label histograms of both trees.
+
+    A removal or an insertion changes the histogram of A by one label and an update moves
+    one label to another, so each operation lowers the surplus of labels of A over B by at
+    most one, and the surplus of B over A by at most one. The distance is therefore at
+    least the larger of both surpluses, which is `(L1 + size difference) / 2` and is never
+    below `size_lower_bound`.
+
+    The histograms are built over the labels present in either tree, renumbered from 0, so
+    their size does not depend on how many labels the label table holds.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+
+    Returns:
+        int: The lower bound.
+    """
+    distinct, compact_ids = unique(concatenate((A.label_ids, B.label_ids)), return_inverse=True)
+    size = len(distinct)
+    difference = bincount(compact_ids[:len(A)], minlength=size) - bincount(compact_ids[len(A):], minlength=size)
+    surplus_a = int(difference[difference > 0].sum())
+    surplus_b = int(-difference[difference < 0].sum())
+    return max(surplus_a, surplus_b)
+
+
+def sequence_edit_distance(labels1, labels2):
+    """
+    Compute the unit-cost string edit distance between two sequences of label ids.
+
+    The table is filled one row at a time along the shorter sequence; within a row the
+    chained insertion candidate is resolved with a running minimum, as in the vectorized
+    forest-distance kernel.
+
+    Args:
+        labels1 (list or numpy.ndarray): The first sequence of label ids.
+        labels2 (list or numpy.ndarray): The second sequence of label ids.
+
+    Returns:
+        int: The edit distance between both sequences.
+    """
+    if len(labels1) > len(labels2):
+        labels1, labels2 = labels2, labels1
+    labels2 = array(labels2, int32)
+    positions = arange(len(labels2) + 1, dtype=int32)
+
+    previous = positions.copy()
+    row = empty(len(positions), int32)
+    for x, label in enumerate(labels1, 1):
+        row[0] = x
+        minimum(previous[1:] + 1, previous[:-1] + (labels2 != label), out=row[1:])
+        row -= positions
+        minimum.accumulate(row, out=row)
+        row += positions
+        previous, row = row, previous
+    return int(previous[-1])
+
+
+def traversal_lower_bound(A, B):
+    """
+    Bound the distance by the string edit distance of the pre-order and post-order label sequences.
+
+    Any edit script between two trees is also an edit script of the same cost between their
+    pre-order (and their post-order) label sequences, so the larger of both string edit
+    distances is a lower bound of the tree edit distance.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+
+    Returns:
+        int: The lower bound.
+    """
+    postorder = sequence_edit_distance(A.label_ids, B.label_ids)
+    preorder = sequence_edit_distance(A.preorder_label_ids, B.preorder_label_ids)
+    return max(postorder, preorder)
+
+
+# Bounds tried by `lower_bound`, from the cheapest to the tightest.
+LOWER_BOUNDS = (size_lower_bound, histogram_lower_bound, traversal_lower_bound)
+
+
+def lower_bound(A, B, threshold=None):
+    """
+    Compute a lower bound of the unit-cost tree edit distance with a cascade of bounds.
+
+    The bounds of `LOWER_BOUNDS` are computed from the cheapest to the most expensive one,
+    and the cascade stops as soon as one of them reaches `threshold`: the exact distance is
+    then known to be at least `threshold` without computing the tighter bounds.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+        threshold (float, optional): Stop once a bound reaches this value. Defaults to None,
+                                     in which case every bound is computed.
+
+    Returns:
+        int: The largest bound computed.
+    """
+    best = 0
+    for bound in LOWER_BOUNDS:
+        best = max(best, bound(A, B))
+        if threshold is not None and best >= threshold:
+            break
+    return best
@@ -9,6 +9,7 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 import collections
+from sys import intern
 
 
 class Node(object):
@@ -34,8 +35,13 @@ class Node(object):
 
     This structure is particularly useful for representing parsed ASTs in a simplified,
     labeled tree format suitable for tree difference computations.
+
+    Nodes declare `__slots__`: a program tree holds one Node per AST element, and without a
+    per-instance `__dict__` each of them is smaller and cheaper to allocate.
     """
 
+    __slots__ = ('label', 'children', 'parent', 'index')
+
     def __init__(self, label, children=None, parent=None, index=None):
         """
         Initialize a Node with a given label and optional children, parent, and index.
@@ -49,7 +55,9 @@ class Node(object):
         When children are provided, this constructor updates each child's `parent` and `index`
         attributes to maintain the tree structure.
         """
-        self.label = label
+        # Labels repeat a lot within a tree ("Body:", "Call: avancer", ...): interning them keeps
+        # a single string per distinct label.
+        self.label = intern(label) if type(label) is str else label
         self.children = []
         self.parent = parent
         self.index = index
@@ -139,7 +147,8 @@ class Node(object):
         """
         Add a child node to this node's children.
 
-        The child's `parent` is set to this node, and `index` is updated accordingly.
+        The child's `parent` is set to this node, and `index` is updated accordingly. Appending
+        a child only sets its own index; inserting it first shifts the index of every sibling.
 
         Args:
             node (Node): The child node to add.
@@ -149,14 +158,15 @@ class Node(object):
         Returns:
             Node: This node (for chaining calls if desired).
         """
+        node.parent = self
         if before:
             self.children.insert(0, node)
+            # Reassign indices to maintain correct ordering
+            for idx, child in enumerate(self.children):
+                child.index = idx
         else:
+            node.index = len(self.children)
             self.children.append(node)
-        node.parent = self
-        # Reassign indices to maintain correct ordering
-        for idx, child in enumerate(self.children):
-            child.index = idx
         return self
 
     def get(self, label):
@@ -212,8 +222,10 @@ class Node(object):
             # Include [index] if the node has a parent
             if node.parent:
                 label = f"{label}[{node.index}]"
-            path.insert(0, label)
+            path.append(label)
             node = node.parent
+        # Labels were collected from this node up to the root
+        path.reverse()
         return path
 
     def __contains__(self, b):
@@ -32,27 +32,39 @@ def anonymize_variable_names(root):
               useful for debugging.
     """
     name_map = {}
-    counter = [0]
-
-    def traverse(node):
+    # Pre-order traversal with an explicit stack, children pushed in reverse order.
+    stack = [root]
+    while stack:
+        node = stack.pop()
         if node is None:
-            return
+            continue
         if node.label and node.label.startswith("Var: "):
-            rest = node.label[5:]                      # everything after "Var: "
-            negated = rest.startswith("-")
-            var_name = rest[1:] if negated else rest   # strip leading '-' if present
-            if var_name not in name_map:
-                name_map[var_name] = f"VAR_{counter[0]}"
-                counter[0] += 1
-            prefix = "-" if negated else ""
-            node.label = f"Var: {prefix}{name_map[var_name]}"
-        for child in node.children:
-            traverse(child)
-
-    traverse(root)
+            node.label = anonymous_label(node.label, name_map)
+        stack.extend(reversed(node.children))
     return name_map
 
 
+def anonymous_label(label, name_map):
+    """
+    Return the anonymous form of a ``Var: <name>`` label, numbering new variable names.
+
+    Args:
+        label (str): The label, ``Var: name`` or ``Var: -name``.
+        name_map (dict): The ``{original_name: anonymous_name}`` mapping of the tree so far,
+                         extended in-place with ``VAR_<len(name_map)>`` for a new name.
+
+    Returns:
+        str: ``Var: VAR_k`` or ``Var: -VAR_k``.
+    """
+    rest = label[5:]                           # everything after "Var: "
+    negated = rest.startswith("-")
+    var_name = rest[1:] if negated else rest   # strip leading '-' if present
+    if var_name not in name_map:
+        name_map[var_name] = f"VAR_{len(name_map)}"
+    prefix = "-" if negated else ""
+    return f"Var: {prefix}{name_map[var_name]}"
+
+
 def print_ast_nodes(nodes, indent=0):
     """
     Recursively print the labels of an AST's nodes with indentation.
@@ -0,0 +1,151 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Memoization of the keyroot-level subproblems of the Zhang-Shasha distance across comparisons.
+
+Submissions of the same exercise differ from the correct codes in the same places, so the
+same pairs of subtrees (a common wrong `For` body against the expected one, ...) are compared
+again and again. For a pair of keyroots, the forest-distance table only depends on both
+subtrees, and so do the subtree distances it writes (those of the nodes on both left paths)
+and the part of the edit script it walks back. A `SubtreePairMemo` keeps both, keyed by the
+Merkle hashes of the two subtrees (`AnnotatedTree.subtree_hashes`), so that a subproblem
+solved for one submission is a lookup for the next one.
+
+The costs must only depend on the labels, which is the case for the default cost model and
+for the collapsed trees derived from it (a block is labelled by the hash of its subtree):
+`distance` only uses the memo with `default_cost_model`.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+
+# Default bound of the total size of the memoized entries: int32 distances plus edit script items.
+DEFAULT_MAX_CELLS = 4_000_000
+
+# Keyroot pairs whose forest-distance table has fewer cells are computed rather than looked up:
+# hashing and copying would cost about as much as filling the table.
+MIN_TABLE_CELLS = 64
+
+# Kinds of memoized entries.
+_DISTANCES = 0
+_SCRIPT = 1
+
+
+class SubtreePairMemo:
+    """
+    A bounded, least-recently-used memo of keyroot-pair subproblems, shared across comparisons.
+
+    Two kinds of entries are kept for a pair of subtrees:
+
+    - the block of subtree distances between the nodes of both left paths, as an int32 array
+      (rows: the left path of the first subtree, bottom-up; columns: that of the second);
+    - the part of the edit script walked back from the forest-distance table of the pair, as
+      a list of operations and nested subtree pairs, with ids relative to the leftmost leaf
+      of each subtree.
+
+    Entries are evicted once their total size (array cells plus script items) exceeds
+    `max_cells`.
+
+    Attributes:
+        max_cells (int): The bound of the total size of the entries.
+        cells (int): The total size of the entries.
+        hits (int): The number of subproblems answered from the memo.
+        misses (int): The number of subproblems that had to be computed.
+    """
+
+    def __init__(self, max_cells: int = DEFAULT_MAX_CELLS):
+        """
+        Create an empty memo.
+
+        Args:
+            max_cells (int, optional): The bound of the total size of the entries. Defaults to
+                                       `DEFAULT_MAX_CELLS`.
+        """
+        self.max_cells = max_cells
+        self.cells = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _put(self, key, entry, size):
+        if size > self.max_cells:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            while self.cells + size > self.max_cells:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.cells -= evicted_size
+            self._entries[key] = (entry, size)
+            self.cells += size
+
+    def distances(self, hash_a, hash_b):
+        """
+        Return the left-path subtree distances of a subtree pair, or None if not memoized.
+        """
+        entry = self._get((_DISTANCES, hash_a, hash_b))
+        return None if entry is None else entry[0]
+
+    def store_distances(self, hash_a, hash_b, block):
+        """
+        Memoize the left-path subtree distances of a subtree pair.
+
+        Args:
+            hash_a (bytes): The hash of the subtree of the first tree.
+            hash_b (bytes): The hash of the subtree of the second tree.
+            block (numpy.ndarray): The int32 distances, which must not be modified afterwards.
+        """
+        self._put((_DISTANCES, hash_a, hash_b), block, block.size)
+
+    def script(self, hash_a, hash_b):
+        """
+        Return the edit script fragment of a subtree pair, or None if not memoized.
+        """
+        entry = self._get((_SCRIPT, hash_a, hash_b))
+        return None if entry is None else entry[0]
+
+    def store_script(self, hash_a, hash_b, fragment):
+        """
+        Memoize the edit script fragment of a subtree pair.
+
+        Args:
+            hash_a (bytes): The hash of the subtree of the first tree.
+            hash_b (bytes): The hash of the subtree of the second tree.
+            fragment (tuple): The operations and nested subtree pairs, in the order
+                              `_edit_script` pushes them.
+        """
+        self._put((_SCRIPT, hash_a, hash_b), fragment, len(fragment))
+
+    def clear(self):
+        """
+        Drop every entry and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.cells = self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# The memo shared by the comparisons of `error_diagnosis`.
+subtree_pair_memo = SubtreePairMemo()
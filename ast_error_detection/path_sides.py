@@ -0,0 +1,219 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+A one-sided heuristic choosing the left or the right path of every subtree of one tree.
+
+Zhang-Shasha decomposes both trees along left paths: for every keyroot i of the first tree F,
+it fills one forest-distance table per keyroot j of the second tree G, which yields the
+distances between every subtree of F rooted on the left path of i and every subtree of G. The
+subtrees hanging off that path are handled the same way, recursively. On the mirrored trees the
+paths are right paths instead.
+
+Nothing forces every subtree of F to use the same side: the table of a left path is filled
+against the left keyroots of G and the one of a right path against the right keyroots of G (on
+the mirrored trees), and the subtrees hanging off the chosen path are decomposed in turn. A
+subtree whose large child comes first takes its left path, a subtree whose large child comes
+last (the `Body:` of a `For`) takes its right path.
+
+This is not RTED. Only one of the trees is decomposed path by path; the other one always
+brings all of its left or all of its right keyroots, whatever their shape. Only left and right
+paths are offered: heavy paths need forests from which both the leftmost and the rightmost
+roots are removed, which neither kernel fills. The choice is therefore optimal only among these
+one-sided left/right decompositions, and its cost is an estimate: the number of cells of the
+tables, |F_v| times the sum of the keyroot subtree sizes of G on that side
+(`orientation_costs`). `one_sided_paths` picks the cheaper side of every subtree bottom-up, for
+F decomposed against G and for G decomposed against F, and keeps the cheaper of both.
+
+On the 58 pairs of the regression corpus, it estimates 2.88M cells against 2.95M for the
+mirrored trees and 5.49M for Zhang-Shasha, never 1.5x fewer than the better whole-tree
+orientation, so `select_orientation` never picks it there. It pays off on trees that are
+left-heavy in one branch and right-heavy in another, e.g. 16 nested sums followed by 8 nested
+loops (102 nodes): 117K cells against 203K and 543K, and 620 ms against 829 ms and 2087 ms with
+the scalar kernel.
+"""
+
+
+def orientation_costs(tree):
+    """
+    Estimate the work of Zhang-Shasha on an annotated tree and on its mirror image.
+
+    Zhang-Shasha fills one forest-distance table per pair of keyroots, each as large as the
+    product of both subtree sizes, so the work is proportional to the product of the sums of
+    the keyroot subtree sizes of both trees. Left keyroots are the root and every node that is
+    not a first child; right keyroots, used when the trees are mirrored, are the root and
+    every node that is not a last child. A node is a last child when its parent immediately
+    follows it in post-order.
+
+    Args:
+        tree (AnnotatedTree): The annotated tree, in its original (left) orientation.
+
+    Returns:
+        tuple: The sums of the keyroot subtree sizes of the left and of the right orientation.
+    """
+    left = 0
+    right = 0
+    lmds = tree.lmds
+    parents = tree.parents
+    for node_id, parent_id in enumerate(parents):
+        size = node_id - lmds[node_id] + 1
+        if parent_id == -1 or lmds[parent_id] != lmds[node_id]:
+            left += size
+        if parent_id != node_id + 1:
+            right += size
+    return left, right
+
+
+class OneSidedPaths:
+    """
+    The left or right path of every subtree of one of two trees, chosen by `one_sided_paths`.
+
+    Attributes:
+        cost (int): The estimated number of table cells filled with these paths.
+        swapped (bool): Whether the paths are those of the second tree, decomposed against the
+                        first one, instead of those of the first tree.
+        roots (list): The `(node_id, right)` pairs of the decomposed tree, in post-order: the
+                      post-order id of the top node of each path, and whether it is a right path.
+    """
+
+    def __init__(self, cost, swapped, roots):
+        self.cost = cost
+        self.swapped = swapped
+        self.roots = roots
+
+
+def _path_sides(tree, cost_left, cost_right):
+    """
+    Choose the cheaper side of the path of every subtree of a tree decomposed against another one.
+
+    The subtrees hanging off the left path of a node are the children of its path nodes but
+    their first children, and likewise with the last children for its right path, so the cost
+    of the subtrees hanging off a path is the one of its first (or last) child plus the best
+    cost of the other children. Children come before their parent in post-order, so a single
+    pass over the post-order ids computes them all.
+
+    Args:
+        tree (AnnotatedTree): The decomposed tree.
+        cost_left (int): The sum of the left keyroot subtree sizes of the other tree.
+        cost_right (int): The sum of the right keyroot subtree sizes of the other tree.
+
+    Returns:
+        tuple: The estimated cost of the whole tree and, by post-order id, whether the path of
+               each subtree is its right path.
+    """
+    lmds = tree.lmds
+    parents = tree.parents
+    size = len(tree)
+    best = [0] * size
+    right_sides = [False] * size
+    hanging_left = [0] * size
+    hanging_right = [0] * size
+    children_best = [0] * size
+    first_children = [-1] * size
+
+    for node_id in range(size):
+        lmd = lmds[node_id]
+        if lmd != node_id:
+            first = first_children[node_id]
+            last = node_id - 1
+            hanging_left[node_id] = hanging_left[first] + children_best[node_id] - best[first]
+            hanging_right[node_id] = hanging_right[last] + children_best[node_id] - best[last]
+        subtree_size = node_id - lmd + 1
+        left = subtree_size * cost_left + hanging_left[node_id]
+        right = subtree_size * cost_right + hanging_right[node_id]
+        right_sides[node_id] = right < left
+        best[node_id] = min(left, right)
+
+        parent_id = parents[node_id]
+        if parent_id != -1:
+            children_best[parent_id] += best[node_id]
+            if lmds[parent_id] == lmd:
+                first_children[parent_id] = node_id
+    return best[-1], right_sides
+
+
+def _path_roots(tree, right_sides):
+    """
+    List the top node of every path of a tree, from the root down, given the side of each subtree.
+
+    Returns:
+        list: The `(node_id, right)` pairs, sorted by post-order id.
+    """
+    children = [[] for _ in range(len(tree))]
+    for node_id, parent_id in enumerate(tree.parents):
+        if parent_id != -1:
+            children[parent_id].append(node_id)
+
+    roots = []
+    pending = [len(tree) - 1]
+    while pending:
+        root = pending.pop()
+        right = right_sides[root]
+        roots.append((root, right))
+        node_id = root
+        while children[node_id]:
+            kids = children[node_id]
+            node_id = kids[-1] if right else kids[0]
+            pending.extend(kid for kid in kids if kid != node_id)
+    roots.sort()
+    return roots
+
+
+def one_sided_paths(A, B, costs_a=None, costs_b=None):
+    """
+    Choose the left or the right path of every subtree of one of two trees, decomposed against
+    the other one, whose keyroots are all taken on the matching side.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+        costs_a (tuple, optional): The `orientation_costs` of A, if already known.
+        costs_b (tuple, optional): The `orientation_costs` of B, if already known.
+
+    Returns:
+        OneSidedPaths: The paths of the cheaper tree to decompose.
+    """
+    left_a, right_a = costs_a if costs_a is not None else orientation_costs(A)
+    left_b, right_b = costs_b if costs_b is not None else orientation_costs(B)
+    cost_a, sides_a = _path_sides(A, left_b, right_b)
+    cost_b, sides_b = _path_sides(B, left_a, right_a)
+    if cost_b < cost_a:
+        return OneSidedPaths(cost_b, True, _path_roots(B, sides_b))
+    return OneSidedPaths(cost_a, False, _path_roots(A, sides_a))
+
+
+def mirror_ids(tree):
+    """
+    Return the post-order id in the mirror image of a tree of each of its nodes.
+
+    The post-order of the mirror image visits the children from right to left, so it is the
+    pre-order of the tree read backwards: a node with pre-order id p gets the id n - 1 - p.
+
+    Args:
+        tree (AnnotatedTree): The annotated tree, in its original orientation.
+
+    Returns:
+        list: The mirrored post-order id of each node, by post-order id.
+    """
+    size = len(tree)
+    children = [[] for _ in range(size)]
+    for node_id, parent_id in enumerate(tree.parents):
+        if parent_id != -1:
+            children[parent_id].append(node_id)
+
+    ids = [0] * size
+    next_id = size - 1
+    pending = [size - 1]
+    while pending:
+        node_id = pending.pop()
+        ids[node_id] = next_id
+        next_id -= 1
+        pending.extend(reversed(children[node_id]))
+    return ids
@@ -0,0 +1,86 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Typed records of the primary errors produced by `ErrorAnnotation`.
+
+A primary error is `(tag, value, context)` or `(tag, current_value, new_value, context)`, and
+the meaning of its items depends on its length. A `PrimaryError` names them (`tag`, `value`,
+`new_value`, `context`) so that they no longer have to be read by position. It is still a
+slotted tuple: it costs no more memory than the plain tuple, compares and hashes equal to it,
+and every consumer indexing errors (`e[0]`, `e[-1]`) is unchanged.
+"""
+
+
+class PrimaryError(tuple):
+    """
+    A primary error: `(tag, value, context)`, or `(tag, current_value, new_value, context)` for
+    the errors of an update.
+
+    Attributes:
+        tag (str): The primary tag, e.g. "MISSING_CALL_STATEMENT".
+        value: The value of the error, i.e. the current value of an update.
+        new_value: The new value of an update, None for the other errors.
+        context (str): The " > "-joined path of the node in error.
+        is_update (bool): Whether the error has a new value, i.e. has four items.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, tag, *details):
+        """
+        Create a primary error.
+
+        Args:
+            tag (str): The primary tag.
+            *details: The value, or the current and new values, then the context.
+        """
+        return tuple.__new__(cls, (tag, *details))
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+    @classmethod
+    def of(cls, details):
+        """
+        Return an error given as a plain sequence as a `PrimaryError`.
+
+        Args:
+            details (sequence): The error, e.g. a 3- or 4-item tuple or list.
+
+        Returns:
+            PrimaryError or None: None if the error does not have 3 or 4 items, otherwise the
+                                  error itself if it is already a record, or the record of its
+                                  items.
+        """
+        if len(details) not in (3, 4):
+            return None
+        return details if isinstance(details, cls) else cls(*details)
+
+    @property
+    def tag(self):
+        return self[0]
+
+    @property
+    def value(self):
+        return self[1]
+
+    @property
+    def new_value(self):
+        return self[2] if len(self) == 4 else None
+
+    @property
+    def context(self):
+        return self[-1]
+
+    @property
+    def is_update(self):
+        return len(self) == 4
+
@@ -0,0 +1,168 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+from hashlib import blake2b
+from .annotated_tree import LabelTable
+from .flat_tree import FlatTree
+from .tree_cache import tree_cache
+
+
+def build_annotated_tree(code: str):
+    """
+    Parse a Python code snippet and turn it into an anonymized, annotated custom Node tree.
+
+    Variables are anonymized so that programs using different variable names for the same
+    structural role (e.g. ``n`` vs ``x``) are not penalised for a pure naming difference: they
+    are renamed VAR_0, VAR_1, … by order of first appearance (pre-order). The tree is built,
+    anonymized and annotated in a single pass (see `ast_to_annotated_tree`).
+
+    The tree is looked up in the process-wide `tree_cache.tree_cache` first: a snippet that
+    only differs from an already converted one by comments or whitespace gets the same tree
+    object back, without being parsed again. The tree must therefore not be modified. Its
+    labels are interned in a label table of its own.
+
+    Args:
+        code (str): The code snippet.
+
+    Returns:
+        AnnotatedTree or None: The annotated tree, or None if the snippet could not be
+                               converted into a tree.
+    """
+    return tree_cache.get(code)
+
+
+class ReferenceSet:
+    """
+    The correct solutions of an exercise, preprocessed once for many submissions.
+
+    Every correct code is parsed, converted into a custom Node tree, anonymized and annotated
+    when the set is built, and the features the distance computations derive from a tree
+    (interned label ids, subtree hashes, pre-order label ids and the mirror image used by the
+    right orientation) are computed right away. A grading service can then build one
+    set per exercise and pass it to `get_typology_based_code_error` for every submission,
+    instead of preprocessing the same correct codes again on every call.
+
+    The labels of the correct codes are interned once, in the label table of the set. A
+    submission is compared with them after being relabeled into an overlay of that table
+    (`submission_tree`), so that the labels only the submission has are dropped with it
+    instead of accumulating in the set.
+
+    The trees must not be modified once the set is built: they are shared by every comparison.
+
+    A set can also be copied into shared memory (`to_shared_memory`) and attached by other
+    processes (`attach`), whose sets then hold the flat trees of the correct codes without parsing
+    them again. Flat trees are compared in full, without the reductions that need `Node` objects
+    (see `distance`); the results are the same.
+
+    Attributes:
+        codes (list): The correct code snippets, in the given order.
+        trees (list): The AnnotatedTree of each correct code snippet, in the same order, or its
+                      FlatTree in an attached set.
+        label_table (LabelTable): The label table of the correct codes.
+    """
+
+    def __init__(self, correct_code_list: list[str]):
+        """
+        Parse, convert, anonymize and annotate every correct code snippet.
+
+        Args:
+            correct_code_list (list[str]): The correct code snippets.
+
+        Raises:
+            ValueError: If one of the snippets could not be converted into a tree.
+        """
+        self.codes = list(correct_code_list)
+        self.trees = []
+        self.label_table = LabelTable()
+        self._fingerprint = None
+        for code in self.codes:
+            tree = build_annotated_tree(code)
+            if tree is None:
+                raise ValueError("Failed to parse one or both code snippets.")
+            tree = tree.relabeled(self.label_table)
+            # Compute the lazy features now, so that the comparisons only read them.
+            tree.subtree_hashes
+            tree.preorder_label_ids
+            tree.mirrored().subtree_hashes
+            tree.mirrored().preorder_label_ids
+            self.trees.append(tree)
+
+    @classmethod
+    def attach(cls, codes, names, fingerprint):
+        """
+        Build a set from the trees another process copied into shared memory with `to_shared_memory`.
+
+        Nothing is parsed: the flat trees are attached without copying their arrays, and only their
+        labels are interned, in the label table of the new set.
+
+        Args:
+            codes (list[str]): The correct code snippets, in order.
+            names (list[str]): The names of the shared memory blocks of their trees, in the same order.
+            fingerprint (bytes): The `fingerprint` of the set the trees were copied from.
+
+        Returns:
+            ReferenceSet: The set of the attached flat trees.
+        """
+        references = cls.__new__(cls)
+        references.codes = list(codes)
+        references.label_table = LabelTable()
+        references.trees = [FlatTree.attach(name, references.label_table) for name in names]
+        references._fingerprint = fingerprint
+        return references
+
+    def to_shared_memory(self):
+        """
+        Copy the trees of the correct codes into new shared memory blocks, one per tree.
+
+        The caller owns the blocks: it must keep them open while other processes may `attach`
+        them, then `close()` and `unlink()` them.
+
+        Returns:
+            list: The `multiprocessing.shared_memory.SharedMemory` block of each tree, in order.
+        """
+        return [(tree if isinstance(tree, FlatTree) else FlatTree.from_tree(tree)).to_shared_memory()
+                for tree in self.trees]
+
+    def submission_tree(self, tree):
+        """
+        Return the tree of a submission with its labels interned in an overlay of the set's table.
+
+        The overlay is only referenced by the returned tree, so the labels the correct codes do
+        not have are freed with it.
+
+        Args:
+            tree (AnnotatedTree): The annotated tree of the submission.
+
+        Returns:
+            AnnotatedTree: The tree, relabeled to be compared with the trees of the set.
+        """
+        return tree.relabeled(LabelTable(self.label_table))
+
+    @property
+    def fingerprint(self):
+        """
+        bytes: A hash of the trees of the correct codes, in order.
+
+        Two sets have the same fingerprint exactly when their correct codes have the same
+        anonymized trees in the same order (up to BLAKE2b collisions), so they grade every
+        submission the same way.
+        """
+        if self._fingerprint is None:
+            digest = blake2b(len(self.trees).to_bytes(4, "little"), digest_size=16)
+            for tree in self.trees:
+                digest.update(tree.subtree_hashes[-1])
+            self._fingerprint = digest.digest()
+        return self._fingerprint
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        return iter(zip(self.codes, self.trees))
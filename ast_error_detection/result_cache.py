@@ -0,0 +1,229 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Memoization of the results of `get_typology_based_code_error`.
+
+The result of grading a submission only depends on its anonymized tree, on the trees of the
+correct codes (in order, since ties go to the first one) and on the code of this package. A
+`ResultCache` keys each result by the Merkle hash of the submission tree, the fingerprint of
+the `ReferenceSet` and a fingerprint of the package sources, so structural duplicates
+(including submissions that only differ by variable names, comments or spacing) are answered
+without computing any distance, and a change of the rules or of the distance invalidates the
+stored results instead of serving stale ones.
+
+The results are kept by a pluggable store: `MemoryResultStore` is a bounded LRU dictionary of
+the current process, and `SQLiteResultStore` keeps them in an SQLite file that survives
+restarts and can be shared by several processes.
+"""
+
+import json
+import sqlite3
+from collections import OrderedDict
+from hashlib import blake2b
+from pathlib import Path
+from threading import Lock
+
+# Bump to invalidate every stored result when the stored format changes.
+RESULT_FORMAT_VERSION = 1
+
+# Default bound of the number of results kept by a MemoryResultStore.
+DEFAULT_MAX_ENTRIES = 65_536
+
+_code_fingerprint = None
+
+
+def code_fingerprint():
+    """
+    Compute the fingerprint of the grading code: the result format and the package sources.
+
+    Any change of the rules, of the tree conversion or of the distance changes the sources of
+    the package, and so the keys of all the results.
+
+    Returns:
+        bytes: The 16-byte fingerprint, computed once per process.
+    """
+    global _code_fingerprint
+    if _code_fingerprint is None:
+        digest = blake2b(RESULT_FORMAT_VERSION.to_bytes(4, "little"), digest_size=16)
+        for path in sorted(Path(__file__).parent.glob("*.py")):
+            source = path.read_bytes()
+            digest.update(path.name.encode() + b"\0" + len(source).to_bytes(8, "little") + source)
+        _code_fingerprint = digest.digest()
+    return _code_fingerprint
+
+
+class MemoryResultStore:
+    """
+    A bounded, least-recently-used store of encoded results in the memory of the process.
+
+    Attributes:
+        max_entries (int): The bound of the number of stored results.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._values = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: bytes):
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self._values.move_to_end(key)
+            return value
+
+    def put(self, key: bytes, value: str):
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def __len__(self):
+        return len(self._values)
+
+
+class SQLiteResultStore:
+    """
+    A store of encoded results in an SQLite database file.
+
+    The results survive restarts and the file can be shared by several processes; SQLite
+    serializes the writes. The connection is opened on first use, so a store can be created
+    before the worker processes that use it are started.
+
+    Attributes:
+        path (str): The path of the database file.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._connection = None
+        self._lock = Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, value TEXT NOT NULL)")
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get(self, key: bytes):
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, key: bytes, value: str):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)", (key, value))
+            connection.commit()
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM results")
+            connection.commit()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def __getstate__(self):
+        # Connections cannot cross processes: a copy reopens the same file on first use.
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+
+class ResultCache:
+    """
+    Memoize the `[dist, tags]` results of `get_typology_based_code_error`.
+
+    Pass a cache as the `result_cache` argument of `get_typology_based_code_error`: the
+    submission is still parsed (through `tree_cache`) to compute its key, but a submission
+    whose tree was already graded against the same references is answered from the store.
+
+    Attributes:
+        store: The backend keeping the encoded results, with `get(key)` and `put(key, value)`
+               methods (`MemoryResultStore`, `SQLiteResultStore` or any object alike).
+        hits (int): The number of results answered from the store.
+        misses (int): The number of results that had to be computed.
+    """
+
+    def __init__(self, store=None):
+        """
+        Create a result cache.
+
+        Args:
+            store (optional): The backend keeping the results. Defaults to None, in which
+                              case a new `MemoryResultStore` is used.
+        """
+        self.store = store if store is not None else MemoryResultStore()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(tree, references):
+        """
+        Compute the key of the result of grading a submission tree against a reference set.
+
+        Args:
+            tree (AnnotatedTree): The annotated tree of the submission.
+            references (ReferenceSet): The correct codes it is graded against.
+
+        Returns:
+            bytes: The 16-byte key.
+        """
+        digest = blake2b(code_fingerprint(), digest_size=16)
+        digest.update(references.fingerprint)
+        digest.update(tree.subtree_hashes[-1])
+        return digest.digest()
+
+    def get(self, key: bytes):
+        """
+        Look a result up.
+
+        Args:
+            key (bytes): The key computed by `key`.
+
+        Returns:
+            list or None: A new `[dist, tags]` list, or None if the result is not stored.
+        """
+        value = self.store.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        dist, tags = json.loads(value)
+        return [dist, set(tags)]
+
+    def put(self, key: bytes, result):
+        """
+        Store a result.
+
+        Args:
+            key (bytes): The key computed by `key`.
+            result (list): The `[dist, tags]` result of `get_typology_based_code_error`.
+        """
+        dist, tags = result
+        self.store.put(key, json.dumps([dist, sorted(tags)]))
@@ -0,0 +1,174 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Align the statement lists of two trees to compare only the window where they differ.
+
+Programs are mostly flat sequences of statements under `Module` or `Body:`, and a student
+submission often differs from the reference in a single statement. The children of both roots
+are aligned by their structural hashes (`AnnotatedTree.subtree_hashes`): the identical
+children at the start (common prefix) and at the end (common suffix) are matched as they are,
+and only the remaining window is left to the dynamic program. When the windows are a single
+pair of containers with the same label (e.g. the `For` loop holding the change), the
+alignment goes on inside them.
+
+Matching the trimmed siblings is one particular mapping, so the distance of the windows is an
+upper bound of the exact distance; `distance` only uses it when a lower bound proves that it
+is exact.
+"""
+
+from .annotated_tree import AnnotatedTree
+
+
+class SiblingAlignment:
+    """
+    The result of aligning the children of two trees level by level.
+
+    Attributes:
+        levels (list): One (a_id, b_id, prefix, suffix) tuple per aligned pair of containers, from
+                       the roots down: the post-order ids of both containers, and the pairs of
+                       post-order ids of their matched children before and after the window.
+        window_a (list): The children of the innermost container of the first tree left to compare.
+        window_b (list): The children of the innermost container of the second tree left to compare.
+    """
+
+    def __init__(self, levels, window_a, window_b):
+        self.levels = levels
+        self.window_a = window_a
+        self.window_b = window_b
+
+    def windowed_trees(self, A, B):
+        """
+        Annotate the innermost containers of both trees restricted to their window children.
+
+        The nodes keep their parents and indices, so the paths of the windowed trees are the
+        absolute paths of the original trees.
+
+        Args:
+            A (AnnotatedTree): The first annotated tree.
+            B (AnnotatedTree): The second annotated tree.
+
+        Returns:
+            tuple: The two windowed AnnotatedTrees.
+        """
+        a_id, b_id, _, _ = self.levels[-1]
+        return (_windowed_tree(A, A.nodes[a_id], self.window_a),
+                _windowed_tree(B, B.nodes[b_id], self.window_b))
+
+    def stitched_ops(self, A, B, window_ops, operation):
+        """
+        Stitch the edit operations of the windows back into those of the whole trees.
+
+        Matched children are expanded into 'match' operations node by node, since they are
+        identical subtrees, and the outer containers are matched; the innermost containers are
+        the roots of the windowed trees and already have their operation last in `window_ops`.
+        At each level, the operations of the prefix come first, then those of the window, the
+        suffix and the container, so the script stays in the post-order of both trees like an
+        untrimmed one.
+
+        Args:
+            A (AnnotatedTree): The first annotated tree.
+            B (AnnotatedTree): The second annotated tree.
+            window_ops (list): The operations of the windowed trees.
+            operation (callable): Builds an operation from its type and the post-order ids of its
+                                  nodes in A and B, like `zang_shasha_distance._operation`.
+
+        Returns:
+            list or None: The operations of the whole trees, or None when the windows do not map
+                          the innermost containers onto each other (a tie broken the other way),
+                          since the matched siblings would then not be a valid mapping.
+        """
+        a_id, b_id = self.levels[-1][:2]
+        container_op = operation('match', a_id, b_id)
+        if not window_ops or window_ops[-1] != container_op:
+            return None
+        ops = window_ops[:-1]
+        for a_id, b_id, prefix, suffix in reversed(self.levels):
+            ops = ([operation(*op) for op in _matched_subtrees(A, B, prefix)] + ops
+                   + [operation(*op) for op in _matched_subtrees(A, B, suffix)])
+            ops.append(operation('match', a_id, b_id))
+        return ops
+
+
+def _windowed_tree(tree, container, window):
+    """
+    Annotate the subtree rooted at `container` with only the `window` children under it.
+    """
+    get_children = tree.get_children
+
+    def windowed_children(node):
+        return window if node is container else get_children(node)
+
+    return AnnotatedTree(container, windowed_children, tree.label_table, tree.get_label)
+
+
+def _matched_subtrees(A, B, pairs):
+    """
+    Return the 'match' operations of pairs of identical subtrees, node by node in post-order.
+    """
+    ops = []
+    for a_id, b_id in pairs:
+        a_first = A.lmds[a_id]
+        b_first = B.lmds[b_id]
+        ops.extend(('match', a_first + offset, b_first + offset) for offset in range(a_id - a_first + 1))
+    return ops
+
+
+def align_siblings(A, B):
+    """
+    Trim the identical leading and trailing children of both roots, descending into the window.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+
+    Returns:
+        SiblingAlignment or None: The alignment, or None when the roots have different labels
+                                  or no child can be trimmed.
+    """
+    hashes_a = A.subtree_hashes
+    hashes_b = B.subtree_hashes
+    ids_a = {id(node): node_id for node_id, node in enumerate(A.nodes)}
+    ids_b = {id(node): node_id for node_id, node in enumerate(B.nodes)}
+
+    levels = []
+    a_id = len(A.nodes) - 1
+    b_id = len(B.nodes) - 1
+    window_a = window_b = None
+    while A.label_ids[a_id] == B.label_ids[b_id]:
+        children_a = list(A.get_children(A.nodes[a_id]))
+        children_b = list(B.get_children(B.nodes[b_id]))
+        child_ids_a = [ids_a[id(child)] for child in children_a]
+        child_ids_b = [ids_b[id(child)] for child in children_b]
+
+        size = min(len(child_ids_a), len(child_ids_b))
+        start = 0
+        while start < size and hashes_a[child_ids_a[start]] == hashes_b[child_ids_b[start]]:
+            start += 1
+        end = 0
+        while end < size - start and hashes_a[child_ids_a[-1 - end]] == hashes_b[child_ids_b[-1 - end]]:
+            end += 1
+        if start == end == 0 and levels:
+            break
+
+        prefix = list(zip(child_ids_a[:start], child_ids_b[:start]))
+        suffix = list(zip(child_ids_a[len(child_ids_a) - end:], child_ids_b[len(child_ids_b) - end:]))
+        levels.append((a_id, b_id, prefix, suffix))
+        window_a = children_a[start:len(children_a) - end]
+        window_b = children_b[start:len(children_b) - end]
+        if len(window_a) != 1 or len(window_b) != 1:
+            break
+        # A single pair of differing containers: align their children in turn.
+        a_id = ids_a[id(window_a[0])]
+        b_id = ids_b[id(window_b[0])]
+
+    if not levels or not any(prefix or suffix for _, _, prefix, suffix in levels):
+        return None
+    return SiblingAlignment(levels, window_a, window_b)
@@ -0,0 +1,205 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Content-addressed cache of the annotated trees built from code snippets.
+
+Students resubmit the same code many times, and many of them write the same solution. The
+cache keys each snippet by a hash of its token stream, which ignores comments, blank lines
+and the spacing between tokens, and keeps the parsed, converted, anonymized and annotated
+tree of the most recently used snippets. A snippet whose key is already cached skips
+`ast.parse` and the conversion entirely.
+"""
+
+import ast
+import io
+import tokenize
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+from .convert_ast_to_custom_node import ast_to_annotated_tree
+
+# Tokens that do not change the tree of a snippet.
+_IGNORED_TOKENS = frozenset({tokenize.COMMENT, tokenize.NL, tokenize.ENCODING})
+# Tokens whose text is layout only (indentation width, line endings): only their type is kept.
+_LAYOUT_TOKENS = frozenset({tokenize.INDENT, tokenize.DEDENT, tokenize.NEWLINE, tokenize.ENDMARKER})
+
+# Default bound of the total number of nodes kept by a TreeCache.
+DEFAULT_MAX_NODES = 1_000_000
+# Default bound of the number of exact snippets whose key a TreeCache remembers.
+DEFAULT_MAX_SOURCES = 16_384
+
+
+def source_key(code: str):
+    """
+    Compute the content address of a code snippet.
+
+    The key is a BLAKE2b digest of the snippet's token stream without comments and blank lines.
+    Indentation and line endings only contribute their token type, so two snippets that differ
+    only by comments or whitespace (and therefore have the same AST) get the same key.
+
+    Args:
+        code (str): The code snippet.
+
+    Returns:
+        bytes or None: The 16-byte key, or None if the snippet could not be tokenized.
+    """
+    digest = blake2b(digest_size=16)
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type in _IGNORED_TOKENS:
+                continue
+            text = '' if token.type in _LAYOUT_TOKENS else token.string
+            digest.update(f"{token.type} {len(text)} {text}\n".encode('utf-8', 'surrogatepass'))
+    except (tokenize.TokenError, SyntaxError):
+        return None
+    return digest.digest()
+
+
+def _build_tree(code: str):
+    """
+    Parse, convert, anonymize and annotate a code snippet, without going through a cache.
+    """
+    return ast_to_annotated_tree(ast.parse(code))
+
+
+class TreeCache:
+    """
+    A bounded, least-recently-used cache of annotated trees keyed by `source_key`.
+
+    The bound is the total number of nodes of the cached trees rather than the number of
+    entries, so that a few very large submissions cannot hold far more memory than many small
+    ones. A tree larger than the bound is built but not cached.
+
+    Tokenizing a snippet costs about as much as parsing it, so the cache also remembers the
+    key of the last `max_sources` snippets it was given, by their exact text: a byte-identical
+    resubmission finds its tree with a single dictionary lookup.
+
+    Cached trees are shared by every caller that looks up the same snippet, so they must not
+    be modified; the distance computations and the error annotation only read them.
+
+    Attributes:
+        max_nodes (int): The bound of the total number of nodes of the cached trees.
+        max_sources (int): The bound of the number of exact snippets whose key is remembered.
+        nodes (int): The total number of nodes of the cached trees.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that had to build the tree.
+    """
+
+    def __init__(self, max_nodes: int = DEFAULT_MAX_NODES, max_sources: int = DEFAULT_MAX_SOURCES):
+        """
+        Create an empty cache.
+
+        Args:
+            max_nodes (int, optional): The bound of the total number of nodes of the cached
+                                       trees. Defaults to `DEFAULT_MAX_NODES`; 0 disables caching.
+            max_sources (int, optional): The bound of the number of exact snippets whose key
+                                         is remembered. Defaults to `DEFAULT_MAX_SOURCES`.
+        """
+        self.max_nodes = max_nodes
+        self.max_sources = max_sources
+        self.nodes = 0
+        self.hits = 0
+        self.misses = 0
+        self._trees = OrderedDict()
+        self._keys = OrderedDict()  # Exact snippet -> source_key
+        self._lock = Lock()
+
+    def get(self, code: str):
+        """
+        Return the annotated tree of a code snippet, building and caching it if needed.
+
+        Args:
+            code (str): The code snippet.
+
+        Returns:
+            AnnotatedTree or None: The annotated tree, or None if the snippet could not be
+                                   converted into a tree.
+
+        Raises:
+            SyntaxError: If the snippet is not valid Python code.
+        """
+        key = self.key(code) if self.max_nodes > 0 else None
+        if key is not None:
+            with self._lock:
+                tree = self._trees.get(key)
+                if tree is not None:
+                    self._trees.move_to_end(key)
+                    self.hits += 1
+                    return tree
+                self.misses += 1
+
+        tree = _build_tree(code)
+        if key is not None and tree is not None:
+            self._store(key, tree)
+        return tree
+
+    def key(self, code: str):
+        """
+        Return the `source_key` of a code snippet, remembering it for the exact same text.
+
+        Args:
+            code (str): The code snippet.
+
+        Returns:
+            bytes or None: The key, or None if the snippet could not be tokenized.
+        """
+        with self._lock:
+            key = self._keys.get(code)
+            if key is not None:
+                self._keys.move_to_end(code)
+                return key
+        key = source_key(code)
+        if key is not None and self.max_sources > 0:
+            with self._lock:
+                self._keys[code] = key
+                if len(self._keys) > self.max_sources:
+                    self._keys.popitem(last=False)
+        return key
+
+    def _store(self, key, tree):
+        """
+        Cache a tree, evicting the least recently used ones to stay within `max_nodes`.
+        """
+        size = len(tree)
+        if size > self.max_nodes:
+            return
+        with self._lock:
+            if key in self._trees:
+                return
+            while self.nodes + size > self.max_nodes:
+                _, evicted = self._trees.popitem(last=False)
+                self.nodes -= len(evicted)
+            self._trees[key] = tree
+            self.nodes += size
+
+    def clear(self):
+        """
+        Drop every cached tree and reset the counters.
+        """
+        with self._lock:
+            self._trees.clear()
+            self._keys.clear()
+            self.nodes = self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._trees)
+
+    def __contains__(self, code):
+        key = self.key(code)
+        if key is None:
+            return False
+        with self._lock:
+            return key in self._trees
+
+
+# The cache used by `reference_set.build_annotated_tree`, and so by every entry point of
+# `error_diagnosis`.
+tree_cache = TreeCache()
@@ -8,8 +8,25 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
-from .annotated_tree import AnnotatedTree
-from numpy import zeros
+from .annotated_tree import AnnotatedTree, LabelTable
+from .flat_tree import FlatTree
+from .cost_model import default_cost_model
+from .lower_bounds import lower_bound
+from .identical_subtrees import collapse_identical_subtrees, collapsed_costs, expand_edit_script
+from .sibling_alignment import align_siblings
+from .pair_memo import MIN_TABLE_CELLS
+from .path_sides import mirror_ids, one_sided_paths, orientation_costs
+from math import floor, inf
+from numpy import add, arange, argsort, array, cumsum, empty, full, int32, int64, minimum, nonzero, putmask, \
+    repeat, where, zeros
+
+# Tables whose longer side does not exceed this width are filled by the scalar kernel even
+# when the vectorized one is selected.
+_VECTORIZED_MIN_WIDTH = 16
+
+# The largest value of the int32 arrays of the kernels.
+_INT32_MAX = 2 ** 31 - 1
+
 
 def insert_cost(node):
     """
@@ -49,7 +66,9 @@ def update_cost(node1, node2):
 
     This function is used by the Zhang-Shasha tree edit distance algorithm. If the two nodes have
     the same label, the update cost is zero (they match perfectly). Otherwise, changing node1
-    to node2 costs 1.
+    to node2 costs 1. The distance kernel applies the same rule to the interned label ids of
+    the nodes (`AnnotatedTree.label_ids`) instead of calling this function on every cell.
+    Other weights are given to `distance` through a `CostModel`.
 
     Args:
         node1 (Node): The original node.
@@ -60,129 +79,929 @@ def update_cost(node1, node2):
     """
     return 0 if node1.label == node2.label else 1
 
-def distance(A, B, get_children):
-    A = AnnotatedTree(A, get_children)
-    B = AnnotatedTree(B, get_children)
-    size_a = len(A.nodes)
-    size_b = len(B.nodes)
-    treedists = zeros((size_a, size_b), float)
-    operations = [[[] for _ in range(size_b)] for _ in range(size_a)]
-
-    def treedist(i, j):
-        Al = A.lmds
-        Bl = B.lmds
-        An = A.nodes
-        Bn = B.nodes
-
-        m = i - Al[i] + 2
-        n = j - Bl[j] + 2
-        fd = zeros((m, n), float)
-        partial_ops = [[[] for _ in range(n)] for _ in range(m)]
-
-        ioff = Al[i] - 1
-        joff = Bl[j] - 1
-
-        fd[0][0] = 0
-        for x in range(1, m):
-            node = An[x + ioff]
-            fd[x][0] = fd[x - 1][0] + remove_cost(node)
-            op = {
-                'type': 'delete',
-                'path': node.get_path(),
-                'current': node.label,
-                'new': None
-            }
-            partial_ops[x][0] = partial_ops[x - 1][0] + [op]
 
+def _operation(op_type, A, a_id, B, b_id):
+    """
+    Build a single edit operation in the format consumed by `ErrorAnnotation`.
+
+    Deletions and updates/matches are located by the path of the node in the first tree,
+    insertions by the path of the node in the second tree. The " > "-joined context strings
+    are the ones precomputed by the annotated tree for that post-order id; the paths are
+    copies of its precomputed paths, since trees are cached and shared across calls and a
+    caller modifying the path of an operation must not alter them.
+
+    Args:
+        op_type (str): One of 'delete', 'insert', 'update' or 'match'.
+        A (AnnotatedTree): The first annotated tree.
+        a_id (int or None): Post-order id of the node of A involved in the operation.
+        B (AnnotatedTree): The second annotated tree.
+        b_id (int or None): Post-order id of the node of B involved in the operation.
+
+    Returns:
+        dict: The operation with its 'type', 'path', 'current', 'new' and 'context' keys.
+    """
+    if op_type == 'insert':
+        return {'type': op_type, 'path': list(B.nodes_path[b_id]), 'current': None,
+                'new': B.label(b_id), 'context': B.nodes_context[b_id]}
+    new = None if op_type == 'delete' else B.label(b_id)
+    return {'type': op_type, 'path': list(A.nodes_path[a_id]), 'current': A.label(a_id),
+            'new': new, 'context': A.nodes_context[a_id]}
+
+
+def _forest_distance(A, B, i, j, treedists, costs):
+    """
+    Fill the forest-distance table of the subtree pair (i, j) of the Zhang-Shasha algorithm.
+
+    Every cell that pairs two complete subtrees is also written into `treedists`. Each cell
+    takes the cheapest of the removal, the insertion and the update (or subtree) candidate;
+    `_edit_script` reads the choices back from the table in that same order.
+
+    Costs are integers read from the compiled `CostTables`: removals and insertions by
+    post-order id, updates from the update matrix by kind class. An update is free exactly
+    when the interned label ids of both nodes are equal.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+        i (int): Post-order id of the subtree root in A.
+        j (int): Post-order id of the subtree root in B.
+        treedists (numpy.ndarray): The int32 subtree distance matrix shared by all calls.
+        costs (CostTables): The costs of the comparison, compiled by a `CostModel`.
+
+    Returns:
+        numpy.ndarray: The forest-distance table.
+    """
+    Al = A.lmds
+    Bl = B.lmds
+
+    m = i - Al[i] + 2
+    n = j - Bl[j] + 2
+    fd = zeros((m, n), int32)
+
+    ioff = Al[i] - 1
+    joff = Bl[j] - 1
+
+    # Plain lists of the rows and columns of this table: scalar reads from them are much
+    # cheaper than NumPy scalar indexing.
+    labels_a = A.label_ids[ioff + 1:i + 1].tolist()
+    labels_b = B.label_ids[joff + 1:j + 1].tolist()
+    row_remove_costs = costs.remove_costs[ioff + 1:i + 1].tolist()
+    column_insert_costs = costs.insert_costs[joff + 1:j + 1].tolist()
+    row_classes = costs.classes_a[ioff + 1:i + 1].tolist()
+    column_classes = costs.classes_b[joff + 1:j + 1].tolist()
+    row_update_extras = costs.update_extra_a[ioff + 1:i + 1].tolist()
+    column_update_extras = costs.update_extra_b[joff + 1:j + 1].tolist()
+    update_rows = costs.update_rows
+
+    for x in range(1, m):
+        fd[x, 0] = fd[x - 1, 0] + row_remove_costs[x - 1]
+    for y in range(1, n):
+        fd[0, y] = fd[0, y - 1] + column_insert_costs[y - 1]
+
+    for x in range(1, m):
+        label1 = labels_a[x - 1]
+        cost_remove1 = row_remove_costs[x - 1]
+        update_costs = update_rows[row_classes[x - 1]]
+        update_extra1 = row_update_extras[x - 1]
         for y in range(1, n):
-            node = Bn[y + joff]
-            fd[0][y] = fd[0][y - 1] + insert_cost(node)
-            op = {
-                'type': 'insert',
-                'path': node.get_path(),
-                'current': None,
-                'new': node.label
-            }
-            partial_ops[0][y] = partial_ops[0][y - 1] + [op]
+            cost_remove = fd[x - 1, y] + cost_remove1
+            cost_insert = fd[x, y - 1] + column_insert_costs[y - 1]
 
-        for x in range(1, m):
-            for y in range(1, n):
-                node1 = An[x + ioff]
-                node2 = Bn[y + joff]
-
-                if Al[i] == Al[x + ioff] and Bl[j] == Bl[y + joff]:
-                    cost_remove = fd[x - 1][y] + remove_cost(node1)
-                    cost_insert = fd[x][y - 1] + insert_cost(node2)
-                    cost_update = fd[x - 1][y - 1] + update_cost(node1, node2)
-
-                    costs = [cost_remove, cost_insert, cost_update]
-                    min_cost = min(costs)
-                    fd[x][y] = min_cost
-                    idx = costs.index(min_cost)
-
-                    if idx == 0:
-                        op = {
-                            'type': 'delete',
-                            'path': node1.get_path(),
-                            'current': node1.label,
-                            'new': None
-                        }
-                        partial_ops[x][y] = partial_ops[x - 1][y] + [op]
-                    elif idx == 1:
-                        op = {
-                            'type': 'insert',
-                            'path': node2.get_path(),
-                            'current': None,
-                            'new': node2.label
-                        }
-                        partial_ops[x][y] = partial_ops[x][y - 1] + [op]
-                    else:
-                        if fd[x][y] == fd[x-1][y-1]:
-                            op_type = 'match'
-                        else:
-                            op_type = 'update'
-                        op = {
-                            'type': op_type,
-                            'path': node1.get_path(),
-                            'current': node1.label,
-                            'new': node2.label
-                        }
-                        partial_ops[x][y] = partial_ops[x - 1][y - 1] + [op]
-                    treedists[x + ioff][y + joff] = fd[x][y]
-                    operations[x + ioff][y + joff] = partial_ops[x][y]
+            if Al[i] == Al[x + ioff] and Bl[j] == Bl[y + joff]:
+                # Both prefixes are whole subtrees: the last nodes can be matched directly.
+                if label1 == labels_b[y - 1]:
+                    cost_update = fd[x - 1, y - 1]
                 else:
-                    p = Al[x + ioff] - 1 - ioff
-                    q = Bl[y + joff] - 1 - joff
-                    cost_remove = fd[x - 1][y] + remove_cost(node1)
-                    cost_insert = fd[x][y - 1] + insert_cost(node2)
-                    cost_subtree = fd[p][q] + treedists[x + ioff][y + joff]
-
-                    costs = [cost_remove, cost_insert, cost_subtree]
-                    min_cost = min(costs)
-                    fd[x][y] = min_cost
-                    idx = costs.index(min_cost)
-
-                    if idx == 0:
-                        op = {
-                            'type': 'delete',
-                            'path': node1.get_path(),
-                            'current': node1.label,
-                            'new': None
-                        }
-                        partial_ops[x][y] = partial_ops[x - 1][y] + [op]
-                    elif idx == 1:
-                        op = {
-                            'type': 'insert',
-                            'path': node2.get_path(),
-                            'current': None,
-                            'new': node2.label
-                        }
-                        partial_ops[x][y] = partial_ops[x][y - 1] + [op]
-                    else:
-                        partial_ops[x][y] = partial_ops[p][q] + operations[x + ioff][y + joff]
+                    cost_update = (fd[x - 1, y - 1] + update_costs[column_classes[y - 1]] + update_extra1
+                                   + column_update_extras[y - 1])
+                min_cost = min(cost_remove, cost_insert, cost_update)
+                treedists[x + ioff, y + joff] = min_cost
+            else:
+                p = Al[x + ioff] - 1 - ioff
+                q = Bl[y + joff] - 1 - joff
+                min_cost = min(cost_remove, cost_insert, fd[p, q] + treedists[x + ioff, y + joff])
+            fd[x, y] = min_cost
+
+    return fd
+
+
+def _forest_distance_vectorized(A, B, i, j, treedists, costs):
+    """
+    Fill the forest-distance table of the subtree pair (i, j) one row at a time with NumPy.
+
+    This computes exactly the same table and `treedists` entries as `_forest_distance`, but
+    each row is produced by array operations instead of a Python loop over its cells:
+
+    - the removal and the update/subtree candidates only depend on the previous rows, so
+      they are computed for the whole row at once, the subtree candidates being gathered
+      from the previous rows and from `treedists`;
+    - the insertion candidate chains along the row (fd[x][y] depends on fd[x][y - 1]).
+      With C the cumulative insertion costs of the row, fd[x][y] = C[y] + min over k <= y
+      of (a[k] - C[k]), where a holds the other candidates, which is a running minimum.
+
+    Rows are taken along the shorter of the two subtrees (by transposing the problem) and
+    tables too small for array operations to pay off are handed to the scalar kernel. The
+    dynamic program fills its tables with `_keyroot_tables_vectorized`, which batches the
+    tables of many keyroot pairs; this kernel fills the single tables the edit script is
+    walked back from.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+        i (int): Post-order id of the subtree root in A.
+        j (int): Post-order id of the subtree root in B.
+        treedists (numpy.ndarray): The int32 subtree distance matrix shared by all calls.
+        costs (CostTables): The costs of the comparison, compiled by a `CostModel`.
+
+    Returns:
+        numpy.ndarray: The forest-distance table, like `_forest_distance`.
+    """
+    Al = A.lmds
+    Bl = B.lmds
+
+    m = i - Al[i] + 2
+    n = j - Bl[j] + 2
+    if max(m, n) <= _VECTORIZED_MIN_WIDTH:
+        # Too narrow for array operations to pay for their overhead.
+        return _forest_distance(A, B, i, j, treedists, costs)
+    if m > n:
+        # The problem is symmetric: iterate over the shorter side and vectorize the longer
+        # one by swapping the trees and their costs, and transposing.
+        return _forest_distance_vectorized(B, A, j, i, treedists.T, costs.transposed()).T
+
+    ioff = Al[i] - 1
+    joff = Bl[j] - 1
+
+    fd = zeros((m, n), int32)
+    row_remove_costs = costs.remove_costs[ioff + 1:i + 1]
+    cumsum(row_remove_costs, out=fd[1:, 0])
+    cumsum(costs.insert_costs[joff + 1:j + 1], out=fd[0, 1:])
+    cumulative_insert = fd[0].copy()
+
+    # Per-column data of the subtree of B: its label ids and kind classes, whether the column
+    # is a whole subtree sharing the LMD of j (update case), and the column q of the subtree case.
+    labels_b = B.label_ids[joff + 1:j + 1]
+    classes_b = costs.classes_b[joff + 1:j + 1]
+    update_extras_b = costs.update_extra_b[joff + 1:j + 1]
+    lmds_b = B.lmds_array[joff + 1:j + 1]
+    on_left_path_b = lmds_b == Bl[j]
+    update_columns = nonzero(on_left_path_b)[0] + 1
+    subtree_columns = lmds_b - 1 - joff
+    labels_a = A.label_ids
+    classes_a = costs.classes_a
+    update_matrix = costs.update_matrix
+    update_extras_a = costs.update_extra_a
+
+    candidates = empty(n, int32)
+    for x in range(1, m):
+        a_id = x + ioff
+        previous = fd[x - 1]
+        third = fd[Al[a_id] - 1 - ioff, subtree_columns] + treedists[a_id, joff + 1:j + 1]
+        on_left_path_a = Al[a_id] == Al[i]
+        if on_left_path_a:
+            update_costs = update_matrix[classes_a[a_id], classes_b] + update_extras_b + update_extras_a[a_id]
+            updates = previous[:-1] + where(labels_b != labels_a[a_id], update_costs, 0)
+            third = where(on_left_path_b, updates, third)
+
+        candidates[0] = fd[x, 0]
+        minimum(previous[1:] + row_remove_costs[x - 1], third, out=candidates[1:])
+        candidates -= cumulative_insert
+        minimum.accumulate(candidates, out=candidates)
+        fd[x] = candidates + cumulative_insert
+
+        if on_left_path_a:
+            treedists[a_id, update_columns + joff] = fd[x, update_columns]
+
+    return fd
+
+
+def _keyroot_tables(A, B, i, keyroots_b, treedists, costs, batches):
+    """
+    Fill the forest-distance tables of keyroot i of A and each of the given keyroots of B, in order.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+        i (int): Post-order id of the keyroot of A.
+        keyroots_b (list): The keyroots of B, sorted.
+        treedists (numpy.ndarray): The int32 subtree distance matrix shared by all calls.
+        costs (CostTables): The costs of the comparison, compiled by a `CostModel`.
+        batches (dict): Unused; see `_keyroot_tables_vectorized`.
+    """
+    for j in keyroots_b:
+        _forest_distance(A, B, i, j, treedists, costs)
+
+
+class _KeyrootBatch:
+    """
+    The columns of the forest-distance tables of several keyroots of B, laid side by side.
+
+    Every table of a batch gets its columns in one array row, starting with the column of the
+    empty forest, so that a row of all the tables of a keyroot of A is computed at once. The
+    tables of a batch must not depend on each other: none of its keyroots is inside the
+    subtree of another one.
+
+    Attributes:
+        starts (numpy.ndarray): The first column of each table.
+        b_ids (numpy.ndarray): The post-order id in B of each column (0 for the empty forests).
+        cumulative_insert (numpy.ndarray): The cost of inserting the forest of each column.
+        on_left_path (numpy.ndarray): Whether each column is a node on the left path of its keyroot.
+        subtree_columns (numpy.ndarray): The column of the forest preceding the subtree of each column.
+        labels (numpy.ndarray): The interned label id of each column.
+        classes (numpy.ndarray): The kind class of each column.
+        update_extras (numpy.ndarray): The extra update cost of each column.
+        update_columns (numpy.ndarray): The columns on the left path of their keyroot.
+        update_b_ids (numpy.ndarray): The post-order ids in B of these columns.
+        shift (numpy.ndarray): What to add to each column before the running minimum of a row:
+                               a decreasing offset per table, which keeps the minimum from
+                               crossing into the next table, minus `cumulative_insert`.
+    """
+
+    def __init__(self, B, keyroots, costs, spacing):
+        keyroots = array(keyroots)
+        firsts = B.lmds_array[keyroots]
+        widths = keyroots - firsts + 2
+        self.starts = zeros(len(keyroots), int64)
+        cumsum(widths[:-1], out=self.starts[1:])
+        tables = repeat(arange(len(keyroots)), widths)
+        columns = arange(int(widths.sum())) - self.starts[tables]
+        nodes = columns > 0
+        firsts = firsts[tables]
+        self.b_ids = where(nodes, firsts - 1 + columns, 0)
+        cumulative_insert = cumsum(where(nodes, costs.insert_costs[self.b_ids], 0))
+        self.cumulative_insert = (cumulative_insert - repeat(cumulative_insert[self.starts], widths)).astype(int32)
+        lmds = B.lmds_array[self.b_ids]
+        self.on_left_path = nodes & (lmds == firsts)
+        self.subtree_columns = where(nodes, self.starts[tables] + lmds - firsts, 0)
+        self.labels = B.label_ids[self.b_ids]
+        self.classes = costs.classes_b[self.b_ids]
+        self.update_extras = costs.update_extra_b[self.b_ids]
+        self.update_columns = nonzero(self.on_left_path)[0]
+        self.update_b_ids = self.b_ids[self.update_columns]
+        self.shift = ((len(keyroots) - tables) * spacing - self.cumulative_insert).astype(int32)
+
+
+def _keyroot_batches(B, keyroots, costs):
+    """
+    Group keyroots of B into batches whose tables can be filled side by side.
+
+    The table of a keyroot reads the subtree distances of the keyroots inside its subtree, so a
+    keyroot is batched one level above the highest keyroot inside it. Each level is then split
+    so that the offsets of its running minimum fit in int32.
+
+    Args:
+        B (AnnotatedTree): The second annotated tree.
+        keyroots (list): The keyroots of B to batch, sorted.
+        costs (CostTables): The costs of the comparison.
+
+    Returns:
+        list: The `_KeyrootBatch` of each group, lowest level first.
+    """
+    Bl = B.lmds
+    levels = []
+    # The keyroots seen so far that are not inside a later one, with their level: those inside
+    # the subtree of a keyroot are the last ones, since they precede it in post-order.
+    outermost = []
+    for j in keyroots:
+        level = 0
+        while outermost and outermost[-1][0] >= Bl[j]:
+            level = max(level, outermost.pop()[1] + 1)
+        outermost.append((j, level))
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(j)
+
+    # Every value of a row lies in [-bound, bound], and the offsets of two tables differ by spacing.
+    bound = int(costs.remove_costs.sum()) + int(costs.insert_costs.sum()) + 1
+    spacing = 2 * bound
+    size = max(1, _INT32_MAX // spacing - 1)
+    return [_KeyrootBatch(B, level[start:start + size], costs, spacing)
+            for level in levels for start in range(0, len(level), size)]
+
+
+def _keyroot_tables_vectorized(A, B, i, keyroots_b, treedists, costs, batches):
+    """
+    Fill the forest-distance tables of keyroot i of A and the given keyroots of B, many at a time.
+
+    The tables of i share their rows, the nodes of the subtree of i, and only differ by their
+    columns. The keyroots of B are grouped into batches whose tables do not depend on each
+    other (`_keyroot_batches`), and the columns of all the tables of a batch are laid side by
+    side, so that each row of all of them is computed by a few array operations, as in
+    `_forest_distance_vectorized`. The insertion candidates chain along the row: the running
+    minimum over the whole row is kept from crossing from one table into the next by adding a
+    decreasing offset to each table. A row is computed once per batch instead of once per
+    keyroot of B, which removes the per-table overhead of the many small keyroot pairs.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+        i (int): Post-order id of the keyroot of A.
+        keyroots_b (list): The keyroots of B, sorted.
+        treedists (numpy.ndarray): The int32 subtree distance matrix shared by all calls.
+        costs (CostTables): The costs of the comparison, compiled by a `CostModel`.
+        batches (dict): The `_keyroot_batches` of B already built in this comparison, by the
+                        tuple of their keyroots.
+    """
+    Al = A.lmds
+    key = tuple(keyroots_b)
+    keyroot_batches = batches.get(key)
+    if keyroot_batches is None:
+        keyroot_batches = batches[key] = _keyroot_batches(B, keyroots_b, costs)
+
+    ioff = Al[i] - 1
+    m = i - Al[i] + 2
+    row_remove_costs = costs.remove_costs[ioff + 1:i + 1]
+    cumulative_remove = zeros(m, int32)
+    cumsum(row_remove_costs, out=cumulative_remove[1:])
+    labels_a = A.label_ids
+    classes_a = costs.classes_a
+    update_matrix = costs.update_matrix
+    update_extras_a = costs.update_extra_a
+
+    for batch in keyroot_batches:
+        width = len(batch.b_ids)
+        fd = empty((m, width), int32)
+        fd[0] = batch.cumulative_insert
+        third = empty(width, int32)
+        for x in range(1, m):
+            a_id = x + ioff
+            row = fd[x]
+            previous = fd[x - 1]
+            add(fd[Al[a_id] - 1 - ioff].take(batch.subtree_columns), treedists[a_id].take(batch.b_ids), out=third)
+            on_left_path_a = Al[a_id] == Al[i]
+            if on_left_path_a:
+                updates = where(batch.labels != labels_a[a_id],
+                                update_matrix[classes_a[a_id], batch.classes] + batch.update_extras
+                                + update_extras_a[a_id], 0)
+                updates[1:] += previous[:-1]
+                putmask(third, batch.on_left_path, updates)
+
+            add(previous, row_remove_costs[x - 1], out=row)
+            minimum(row, third, out=row)
+            row[batch.starts] = cumulative_remove[x]
+            row += batch.shift
+            minimum.accumulate(row, out=row)
+            row -= batch.shift
+
+            if on_left_path_a:
+                treedists[a_id, batch.update_b_ids] = row[batch.update_columns]
+
+
+# Forest-distance kernels selectable through the `kernel` argument of `distance`: the function
+# filling the tables of a keyroot of A against keyroots of B, and the one filling a single table,
+# which the edit script is walked back from. They fill identical tables; only their speed differs.
+KERNELS = {
+    'scalar': (_keyroot_tables, _forest_distance),
+    'vectorized': (_keyroot_tables_vectorized, _forest_distance_vectorized),
+}
+
+
+def _edit_script(A, B, treedists, costs, forest_distance, memo=None):
+    """
+    Rebuild the edit script of the optimal mapping once all subtree distances are known.
+
+    The forest-distance table of the root pair is recomputed and walked back from its last
+    cell. The operation chosen for a cell is the first of the removal, the insertion and the
+    update (or subtree) candidates that gives its value, which is the tie-breaking of
+    Zhang-Shasha; only the cells on the path are looked at. A subtree choice defers to the
+    edit script of that subtree pair, which is recovered the same way, so only the pairs lying
+    on the optimal path are ever revisited.
+
+    With a `memo`, the walk of a large enough subtree pair is looked up by the hashes of both
+    subtrees before its table is recomputed, and memoized otherwise, with ids relative to the
+    leftmost leaf of each subtree.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+        treedists (numpy.ndarray): The completed subtree distance matrix.
+        costs (CostTables): The costs of the comparison, compiled by a `CostModel`.
+        forest_distance (callable): The kernel filling a single forest-distance table, from `KERNELS`.
+        memo (SubtreePairMemo, optional): The memo of the subtree pairs. Defaults to None.
+
+    Returns:
+        list[tuple]: The edit operations, in the order the dynamic program applies them, as
+                     (type, post-order id in A, post-order id in B) triples; the id of the
+                     tree an operation does not involve is None. See `_operation`.
+    """
+    Al = A.lmds
+    Bl = B.lmds
+    labels_a = A.label_ids
+    labels_b = B.label_ids
+    remove_costs = costs.remove_costs
+    insert_costs = costs.insert_costs
+
+    if memo is not None:
+        hashes_a = A.subtree_hashes
+        hashes_b = B.subtree_hashes
+
+    ops = []
+    # Operations are pushed last-first so that popping yields them in forward order;
+    # a (i, j) pair stands for the not yet expanded edit script of a subtree pair.
+    pending = [(len(A) - 1, len(B) - 1)]
+    while pending:
+        item = pending.pop()
+        if len(item) == 3:
+            ops.append(item)
+            continue
+
+        i, j = item
+        a_first = Al[i]
+        b_first = Bl[j]
+        memoized = memo is not None and (i - a_first + 1) * (j - b_first + 1) >= MIN_TABLE_CELLS
+        if memoized:
+            fragment = memo.script(hashes_a[i], hashes_b[j])
+            if fragment is not None:
+                pending.extend(_shifted(entry, a_first, b_first) for entry in fragment)
+                continue
+            start = len(pending)
+
+        fd = forest_distance(A, B, i, j, treedists, costs)
+        ioff = a_first - 1
+        joff = b_first - 1
+        x = i - Al[i] + 1
+        y = j - Bl[j] + 1
+        while x > 0 or y > 0:
+            a_id = x + ioff
+            b_id = y + joff
+            cost = fd[x, y]
+            if x > 0 and (y == 0 or fd[x - 1, y] + remove_costs[a_id] == cost):
+                pending.append(('delete', a_id, None))
+                x -= 1
+            elif y > 0 and (x == 0 or fd[x, y - 1] + insert_costs[b_id] == cost):
+                pending.append(('insert', None, b_id))
+                y -= 1
+            elif Al[a_id] == a_first and Bl[b_id] == b_first:
+                # A match keeps the label; a weighted update may be free but is still an update.
+                op_type = 'match' if labels_a[a_id] == labels_b[b_id] else 'update'
+                pending.append((op_type, a_id, b_id))
+                x -= 1
+                y -= 1
+            else:
+                pending.append((a_id, b_id))
+                x = Al[a_id] - 1 - ioff
+                y = Bl[b_id] - 1 - joff
+        if memoized:
+            memo.store_script(hashes_a[i], hashes_b[j],
+                              tuple(_shifted(entry, -a_first, -b_first) for entry in pending[start:]))
+    return ops
 
+
+def _shifted(entry, a_shift, b_shift):
+    """
+    Shift the ids of an edit script entry: an operation or a pending subtree pair.
+    """
+    if len(entry) == 3:
+        op_type, a_id, b_id = entry
+        return (op_type, None if a_id is None else a_id + a_shift, None if b_id is None else b_id + b_shift)
+    return entry[0] + a_shift, entry[1] + b_shift
+
+
+# Collapsed or windowed trees are only compared when they shrink the product of the tree sizes
+# by at least this factor: otherwise the exactness check fails too often for the detour to pay off.
+_REDUCTION_MIN_SHRINK = 4
+
+# Orientations selectable through the `orientation` argument of `distance`.
+ORIENTATIONS = ('left', 'right', 'mixed', 'auto')
+
+# 'auto' only picks the per-subtree paths when they are estimated to fill this many times fewer
+# cells than the best whole-tree orientation: they also copy every computed row into the
+# distance matrix of the other orientation.
+_MIXED_MIN_GAIN = 1.5
+
+
+def _select_orientation(A, B):
+    """
+    Choose the orientation of a comparison, and the paths of its subtrees for 'mixed'.
+
+    Returns:
+        tuple: The orientation, and the `OneSidedPaths` of 'mixed' (None otherwise).
+    """
+    costs_a = orientation_costs(A)
+    costs_b = orientation_costs(B)
+    left = costs_a[0] * costs_b[0]
+    right = costs_a[1] * costs_b[1]
+    strategy = one_sided_paths(A, B, costs_a, costs_b)
+    if strategy.cost * _MIXED_MIN_GAIN <= min(left, right):
+        return 'mixed', strategy
+    return ('right' if right < left else 'left'), None
+
+
+def select_orientation(A, B):
+    """
+    Choose how to decompose both trees from their shape.
+
+    'left' decomposes every subtree along its left path (Zhang-Shasha) and 'right' along its
+    right path (the mirrored trees). The right paths pay off on right-heavy trees, e.g. a `For`
+    whose large `Body` is its last child, nested several times: with left paths every such body
+    is a keyroot. 'mixed' chooses the side of each subtree of one tree on its own, against all
+    the left or all the right keyroots of the other one (see `one_sided_paths`, a one-sided
+    heuristic rather than RTED), which pays off on trees that are left-heavy in one branch and
+    right-heavy in another.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+
+    Returns:
+        str: 'mixed' when its estimated cost is at least `_MIXED_MIN_GAIN` times lower than the
+             one of both whole-tree orientations, otherwise 'right' when it is estimated to be
+             cheaper than 'left' (see `orientation_costs`), and 'left' otherwise.
+    """
+    return _select_orientation(A, B)[0]
+
+
+def _keyroot_band(A, B, costs, max_cost):
+    """
+    Return the range of post-order id differences of the node pairs a cheap enough mapping can use.
+
+    If a mapping pairs node x of A with node y of B, the x nodes preceding x in post-order
+    (its descendants and the nodes on its left) can only be paired with the y nodes preceding
+    y, and the same holds for the nodes following them. At least |x - y| nodes are therefore
+    inserted or removed, and so are |(|A| - x) - (|B| - y)| nodes. With c the cheapest
+    insertion or removal, a mapping costing at most `max_cost` only pairs nodes whose
+    difference x - y lies within the returned range.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+        costs (CostTables): The costs of the comparison.
+        max_cost (float): The largest cost of interest.
+
+    Returns:
+        tuple or None: The lowest and highest allowed x - y, or None when some insertion or
+                       removal is free and no pair can be ruled out.
+    """
+    cheapest = min(costs.remove_costs.min(), costs.insert_costs.min())
+    if cheapest == 0:
+        return None
+    width = floor(max_cost / cheapest)
+    size_difference = len(A) - len(B)
+    return max(-width, size_difference - width), min(width, size_difference + width)
+
+
+def _with_shared_labels(A, B):
+    """
+    Return both trees with label ids that can be compared with one another.
+
+    When neither label table covers the other one (see `LabelTable.covers`), A is relabeled
+    into an overlay of the table of B, which only lives as long as the comparison: neither
+    table grows.
+
+    Args:
+        A (AnnotatedTree or FlatTree): The first tree.
+        B (AnnotatedTree or FlatTree): The second tree.
+
+    Returns:
+        tuple: The trees A and B, A being relabeled if needed.
+    """
+    if A.label_table.covers(B.label_table) or B.label_table.covers(A.label_table):
+        return A, B
+    return A.relabeled(LabelTable(B.label_table)), B
+
+
+def _shrinks_enough(A, B, A2, B2):
+    """
+    Tell whether comparing the reduced trees A2 and B2 is worth it instead of A and B.
+    """
+    return len(A2.nodes) * len(B2.nodes) * _REDUCTION_MIN_SHRINK <= len(A.nodes) * len(B.nodes)
+
+
+def _left_path(tree, i):
+    """
+    Return the post-order ids of the nodes on the left path of node i, bottom-up.
+    """
+    first = tree.lmds[i]
+    return nonzero(tree.lmds_array[first:i + 1] == first)[0] + first
+
+
+def _subtree_distances(A, B, costs, kernels, max_cost, memo=None, strategy=None):
+    """
+    Fill the subtree distance matrix by running the forest-distance kernel on every keyroot pair.
+
+    With `max_cost`, the keyroot pairs ruled out by `_keyroot_band` are skipped and their
+    subtree distances are left above `max_cost`.
+
+    With a `memo`, the subtree distances a large enough keyroot pair writes (those of the
+    nodes on both left paths) are looked up by the hashes of both subtrees instead of running
+    the kernel, and memoized otherwise. They are exact subtree distances, so looking them up
+    never changes the result. They are only memoized when no keyroot pair is skipped: a
+    skipped pair leaves the distances of the pairs that depend on it above their exact values.
+
+    With a `strategy`, the paths are those it chose for the subtrees of one of the trees (see
+    `_strategy_distances`) instead of the left paths of the keyroots of A.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+        costs (CostTables): The costs of the comparison.
+        kernels (tuple): The forest-distance kernels, a value of `KERNELS`.
+        max_cost (float or None): The largest distance of interest.
+        memo (SubtreePairMemo, optional): The memo of the subtree pairs. Defaults to None.
+        strategy (OneSidedPaths, optional): The paths of the subtrees. Defaults to None.
+
+    Returns:
+        numpy.ndarray: The int32 subtree distance matrix.
+    """
+    band = None
+    if max_cost is not None and max_cost < costs.remove_costs.sum() + costs.insert_costs.sum():
+        band = _keyroot_band(A, B, costs, max_cost)
+    if band is None:
+        treedists = zeros((len(A), len(B)), int32)
+        if memo is None and strategy is None:
+            keyroot_tables = kernels[0]
+            keyroots_b = list(B.keyroots)
+            batches = {}
+            for i in A.keyroots:
+                keyroot_tables(A, B, i, keyroots_b, treedists, costs, batches)
+            return treedists
+    else:
+        # Subtree distances that are never computed stay above max_cost, which rules out
+        # the node pairs they stand for, exactly as no mapping within max_cost uses them.
+        treedists = full((len(A), len(B)), floor(max_cost) + 1, int32)
+
+    if strategy is not None:
+        _strategy_distances(A, B, treedists, costs, kernels, band, memo, strategy)
+        return treedists
+    paths_b = {}
+    batches = {}
     for i in A.keyroots:
-        for j in B.keyroots:
-            treedist(i, j)
+        _path_distances(A, B, i, treedists, costs, kernels, band, memo, paths_b, batches)
+    return treedists
+
+
+def _path_distances(A, B, i, treedists, costs, kernels, band, memo, paths_b, batches):
+    """
+    Compute the distances between the subtrees of A rooted on the left path of i and all the subtrees of B.
+
+    The kernel is run on i and every keyroot of B whose distances are not memoized, in order.
+    The subtrees of A hanging off the left path of i must already have their distances to
+    every subtree of B in `treedists`. See `_subtree_distances` for `band` and `memo`.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+        i (int): Post-order id of the top node of the path in A.
+        treedists (numpy.ndarray): The int32 subtree distance matrix.
+        costs (CostTables): The costs of the comparison.
+        kernels (tuple): The forest-distance kernels, a value of `KERNELS`.
+        band (tuple or None): The allowed post-order id differences, see `_keyroot_band`.
+        memo (SubtreePairMemo or None): The memo of the subtree pairs.
+        paths_b (dict): The left paths of the keyroots of B already computed, by keyroot.
+        batches (dict): The keyroot batches of B already built, see `_keyroot_tables_vectorized`.
+    """
+    Al = A.lmds
+    Bl = B.lmds
+    if band is not None:
+        lowest, highest = band
+    if memo is not None:
+        hash_a = A.subtree_hashes[i]
+        hashes_b = B.subtree_hashes
+    path_a = None
+    computed = []
+    memoized = []
+    for j in B.keyroots:
+        # The left paths of i and j pair nodes whose id difference x - y lies in
+        # [Al[i] - j, i - Bl[j]].
+        if band is not None and not (Al[i] - j <= highest and i - Bl[j] >= lowest):
+            continue
+        if memo is None or (i - Al[i] + 1) * (j - Bl[j] + 1) < MIN_TABLE_CELLS:
+            computed.append(j)
+            continue
+
+        if path_a is None:
+            path_a = _left_path(A, i)[:, None]
+        path_b = paths_b.get(j)
+        if path_b is None:
+            path_b = paths_b[j] = _left_path(B, j)
+        block = memo.distances(hash_a, hashes_b[j])
+        if block is not None:
+            # The tables of the other keyroots only read these distances: they can be
+            # written before any of them is filled.
+            treedists[path_a, path_b] = block
+            continue
+        computed.append(j)
+        if band is None:
+            memoized.append(j)
+
+    kernels[0](A, B, i, computed, treedists, costs, batches)
+    for j in memoized:
+        memo.store_distances(hash_a, hashes_b[j], treedists[path_a, paths_b[j]])
+
+
+def _strategy_distances(A, B, treedists, costs, kernels, band, memo, strategy):
+    """
+    Fill the subtree distance matrix along the left and right paths chosen by a `OneSidedPaths`.
+
+    The paths are taken from the top node with the smallest post-order id, so the subtrees
+    hanging off a path are done before it. A left path is computed by `_path_distances` on the
+    trees, and a right path by `_path_distances` on their mirror images, into a second matrix
+    indexed by the mirrored post-order ids. The rows of each path are then copied into the
+    other matrix, so that both always hold every distance computed so far. Every node is on
+    exactly one path, so `treedists` ends up complete, as with Zhang-Shasha, and the edit
+    script is walked back from it in the original orientation.
+
+    Args:
+        A (AnnotatedTree): The first annotated tree.
+        B (AnnotatedTree): The second annotated tree.
+        treedists (numpy.ndarray): The int32 subtree distance matrix, filled in place.
+        costs (CostTables): The costs of the comparison.
+        kernels (tuple): The forest-distance kernels, a value of `KERNELS`.
+        band (tuple or None): The allowed post-order id differences, see `_keyroot_band`. It also
+                              holds for the mirror images, whose post-orders are post-orders too.
+        memo (SubtreePairMemo or None): The memo of the subtree pairs, keyed by the hashes of
+                                        the mirrored subtrees on the mirror images.
+        strategy (OneSidedPaths): The paths of the decomposed tree.
+    """
+    if strategy.swapped:
+        # The paths are those of B: decompose the transposed problem.
+        A, B, costs, treedists = B, A, costs.transposed(), treedists.T
+        if band is not None:
+            band = (-band[1], -band[0])
+    mirror_a = array(mirror_ids(A))
+    mirror_b = array(mirror_ids(B))
+    order_a = argsort(mirror_a)
+    order_b = argsort(mirror_b)
+    A_mirror = A.mirrored()
+    B_mirror = B.mirrored()
+    costs_mirror = costs.reordered(order_a, order_b)
+    mirrored = treedists[order_a[:, None], order_b]
+
+    paths_b = {}
+    paths_b_mirror = {}
+    batches = {}
+    batches_mirror = {}
+    for root, right in strategy.roots:
+        if right:
+            root = mirror_a[root]
+            _path_distances(A_mirror, B_mirror, root, mirrored, costs_mirror, kernels, band, memo,
+                            paths_b_mirror, batches_mirror)
+            rows = _left_path(A_mirror, root)
+            treedists[order_a[rows][:, None], order_b] = mirrored[rows]
+        else:
+            _path_distances(A, B, root, treedists, costs, kernels, band, memo, paths_b, batches)
+            rows = _left_path(A, root)
+            mirrored[mirror_a[rows][:, None], mirror_b] = treedists[rows]
+
+
+def distance(A, B, get_children, return_ops=True, kernel='scalar', cost_model=None, max_cost=None,
+             orientation='left', collapse_identical=False, trim_siblings=False, memo=None):
+    """
+    Compute the Zhang-Shasha tree edit distance between two trees and its edit script.
+
+    The dynamic program only keeps the subtree distance matrix. The list of operations is
+    reconstructed once at the end by walking the tables back along the optimal mapping,
+    rather than copying a list of operations into every cell of every table.
+
+    With `max_cost`, only the distances up to that cost are computed exactly. The comparison
+    stops before the dynamic program when the lower bounds of `lower_bounds` (for the default
+    unit costs) already exceed it, and the keyroot pairs whose left paths only hold node pairs
+    that no mapping of that cost can use (see `_keyroot_band`) are skipped, their subtree
+    distances being left above `max_cost`.
+
+    With `orientation='right'`, both whole trees are mirrored so that all the keyroots follow
+    right paths instead of left paths. The edit distance is the same, but on equal-cost mappings the
+    edit script may differ, and its operations come in the post-order of the mirrored trees.
+    With `orientation='mixed'`, each subtree of one of the trees is decomposed along its left
+    or its right path, whichever the one-sided heuristic `one_sided_paths` estimates cheaper
+    against the other tree's keyroots on that side, and the edit script is the
+    same as with 'left'. `orientation='auto'` picks one of the three with `select_orientation`.
+
+    With `collapse_identical`, the subtrees shared by both trees are first collapsed into
+    single blocks (see `identical_subtrees`) and the dynamic program runs on the collapsed
+    trees; the 'match' operations of matched blocks are synthesized node by node. The
+    collapsed distance is an upper bound, and it is only returned when the lower bounds of
+    `lower_bounds` prove it exact, which requires the default cost model. Otherwise, or when
+    collapsing does not shrink the problem enough, the full trees are compared as usual.
+
+    With `trim_siblings`, the identical leading and trailing children of both roots are
+    matched as they are and only the window between them is compared, descending into it while
+    it is a single pair of containers with the same label (see `sibling_alignment`). The
+    operations of the window are stitched back with their absolute paths. As with
+    `collapse_identical`, the windows are only compared when they are small enough and the
+    result is only used when a lower bound proves it exact, and when the edit script of the
+    windows maps their containers onto each other.
+
+    With a `memo` (see `pair_memo`), the subproblems of the keyroot pairs are shared across
+    comparisons: the subtree distances and edit script fragments of a pair of subtrees are
+    looked up by their hashes before being computed. Memoized subproblems are exact, so the
+    results are the same as without the memo. It is only used with the default cost model,
+    and it is left aside when `max_cost` bounds a comparison that returns its operations,
+    where skipped keyroot pairs may make equal-cost mappings tie differently.
+
+    Flat trees (see `flat_tree`) are compared like annotated trees, but never collapsed,
+    trimmed nor memoized, since all three need the `Node` objects or the hashes of the trees.
+
+    Trees whose labels are interned in unrelated label tables are compared after relabeling the
+    first one into an overlay of the table of the second one (see `LabelTable`).
+
+    Args:
+        A (Node, AnnotatedTree or FlatTree): Root of the first tree, or the first tree already
+                                             annotated or flattened.
+        B (Node, AnnotatedTree or FlatTree): Root of the second tree, or the second tree already
+                                             annotated or flattened.
+        get_children (callable): A function that, given a node, returns a list of its children.
+        return_ops (bool, optional): When False, only the cost matrices are filled and no edit
+                                     operation is ever built. Defaults to True.
+        kernel (str, optional): The forest-distance kernel filling the cost matrices, one of
+                                `KERNELS`: 'scalar' (cell by cell) or 'vectorized' (row by row
+                                with NumPy, batching the tables of many keyroot pairs, about 15x
+                                faster on large trees). Both give identical results. Defaults to
+                                'scalar'.
+        cost_model (CostModel, optional): The weights of the insertions, removals and updates,
+                                          compiled once into arrays for this comparison. Defaults
+                                          to `default_cost_model` (unit costs).
+        max_cost (float, optional): The largest distance of interest. Defaults to None (no limit).
+        orientation (str, optional): The orientation of both whole trees, one of `ORIENTATIONS`:
+                                     'left' (Zhang-Shasha), 'right' (mirrored), 'mixed'
+                                     (per-subtree paths) or 'auto'.
+                                     Defaults to 'left'.
+        collapse_identical (bool, optional): Whether to collapse the shared subtrees first.
+                                             Defaults to False.
+        trim_siblings (bool, optional): Whether to trim the identical leading and trailing
+                                        statements first. Defaults to False.
+        memo (SubtreePairMemo, optional): The memo of the keyroot-pair subproblems shared
+                                          across comparisons. Defaults to None.
+
+    Returns:
+        tuple or float: The edit distance and the list of edit operations. Each operation is a
+                        dict with 'type' ('delete', 'insert', 'update' or 'match'), 'path',
+                        'current', 'new' and 'context' (the " > "-joined path) keys. Only the
+                        edit distance when `return_ops` is False. When the distance is greater
+                        than `max_cost`, it is returned as `math.inf` and the operations as None.
+    """
+    if kernel not in KERNELS:
+        raise ValueError(f"Unknown distance kernel: {kernel!r}. Expected one of {sorted(KERNELS)}.")
+    kernels = KERNELS[kernel]
+    if orientation not in ORIENTATIONS:
+        raise ValueError(f"Unknown orientation: {orientation!r}. Expected one of {list(ORIENTATIONS)}.")
+
+    if not isinstance(A, (AnnotatedTree, FlatTree)):
+        A = AnnotatedTree(A, get_children)
+    if not isinstance(B, (AnnotatedTree, FlatTree)):
+        B = AnnotatedTree(B, get_children, LabelTable(A.label_table))
+    A, B = _with_shared_labels(A, B)
+    strategy = None
+    if orientation == 'auto':
+        orientation, strategy = _select_orientation(A, B)
+    elif orientation == 'mixed':
+        strategy = one_sided_paths(A, B)
+    if orientation == 'right':
+        A = A.mirrored()
+        B = B.mirrored()
+    if cost_model is None:
+        cost_model = default_cost_model
+    if max_cost is not None and cost_model is default_cost_model and \
+            lower_bound(A, B, max_cost + 1) > max_cost:
+        return inf if not return_ops else (inf, None)
+
+    # Collapsing and trimming build new trees over the nodes, which flat trees do not keep.
+    with_nodes = isinstance(A, AnnotatedTree) and isinstance(B, AnnotatedTree)
+    if not with_nodes or cost_model is not default_cost_model or (max_cost is not None and return_ops):
+        memo = None
+    if trim_siblings and with_nodes and cost_model is default_cost_model:
+        alignment = align_siblings(A, B)
+        windowed = alignment.windowed_trees(A, B) if alignment is not None else None
+        if windowed is not None and _shrinks_enough(A, B, *windowed):
+            A2, B2 = windowed
+            # The windowed trees are already oriented like A and B.
+            result = distance(A2, B2, get_children, return_ops, kernel, cost_model, max_cost,
+                              'mixed' if strategy is not None else 'left', collapse_identical, memo=memo)
+            upper = result[0] if return_ops else result
+            if (max_cost is None or upper <= max_cost) and lower_bound(A, B, upper) >= upper:
+                # Matching the trimmed statements is optimal.
+                if not return_ops:
+                    return upper
+                ops = alignment.stitched_ops(A, B, result[1],
+                                             lambda op_type, a_id, b_id: _operation(op_type, A, a_id, B, b_id))
+                if ops is not None:
+                    return upper, ops
+
+    costs = cost_model.compile(A, B)
+
+    if collapse_identical and with_nodes and cost_model is default_cost_model:
+        collapsed = collapse_identical_subtrees(A, B)
+        if collapsed is not None and \
+                _shrinks_enough(A, B, collapsed[0], collapsed[1]):
+            A2, B2, a_ids, b_ids = collapsed
+            collapsed_tables = collapsed_costs(costs, A, B, A2, B2, a_ids, b_ids)
+            collapsed_strategy = one_sided_paths(A2, B2) if strategy is not None else None
+            treedists = _subtree_distances(A2, B2, collapsed_tables, kernels, max_cost, memo,
+                                           collapsed_strategy)
+            upper = int(treedists[-1, -1])
+            if (max_cost is None or upper <= max_cost) and lower_bound(A, B, upper) >= upper:
+                # The collapsed mapping is optimal.
+                if not return_ops:
+                    return float(upper)
+                script = _edit_script(A2, B2, treedists, collapsed_tables, kernels[1], memo)
+                script = expand_edit_script(script, A, B, A2, B2, a_ids, b_ids)
+                return float(upper), [_operation(op_type, A, a_id, B, b_id) for op_type, a_id, b_id in script]
 
-    return treedists[-1][-1], operations[-1][-1]
+    treedists = _subtree_distances(A, B, costs, kernels, max_cost, memo, strategy)
+    dist = float(treedists[-1, -1])
+    if max_cost is not None and dist > max_cost:
+        return inf if not return_ops else (inf, None)
+    if not return_ops:
+        return dist
+    script = _edit_script(A, B, treedists, costs, kernels[1], memo)
+    return dist, [_operation(op_type, A, a_id, B, b_id) for op_type, a_id, b_id in script]
@@ -0,0 +1,108 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Benchmark `ErrorAnnotation.detect_incorrect_statement_positions` on heavily rewritten submissions.
+
+A submission is compared with a correct code holding the same statements, reordered and
+nested differently, so that its edit script deletes and inserts most of them. The hash join
+on (kind, label) is timed against the former nested loop over every deleted and inserted
+node, whose output it must reproduce exactly.
+
+Usage:
+    PYTHONPATH=. python benchmarks/statement_positions.py [--statements 50 100 200 400] [--repeat 5]
+"""
+
+import argparse
+import random
+import time
+
+from ast_error_detection.error_annotation import ErrorAnnotation, OpIndex
+from ast_error_detection.node import Node
+from ast_error_detection.reference_set import build_annotated_tree
+from ast_error_detection.zang_shasha_distance import distance
+
+_STATEMENTS = ["avancer({})", "tourner({})", "print({})", "x = {}", "y = x + {}"]
+
+
+def nested_loop_positions(index):
+    """
+    The former O(D·I) implementation, kept as the reference of the benchmark.
+    """
+    kind_to_code = {
+        "FOR": "INCORRECT_STATEMENT_POSITION_FOR",
+        "WHILE": "INCORRECT_STATEMENT_POSITION_WHILE",
+        "IF": "INCORRECT_STATEMENT_POSITION_IF",
+        "CALL": "INCORRECT_STATEMENT_POSITION_CALL",
+        "ASSIGN": "INCORRECT_STATEMENT_POSITION_ASSIGN",
+        "FUNCTION": "INCORRECT_STATEMENT_POSITION_FUNCTION",
+        "RETURN": "INCORRECT_STATEMENT_POSITION_RETURN",
+    }
+    deleted_nodes = {(kind, (d['current'] or "").upper(), tuple(d['path']))
+                     for d, kind, _, _ in index.by_type['delete']}
+    inserted_nodes = {(kind, (i['new'] or "").upper(), tuple(i['path']), context)
+                      for i, _, kind, context in index.by_type['insert']}
+    results = []
+    for del_kind, del_label, _ in deleted_nodes:
+        for ins_kind, ins_label, _, ins_context in inserted_nodes:
+            if del_kind == ins_kind and del_label == ins_label:
+                code = kind_to_code.get(del_kind)
+                if code:
+                    value = del_label.split(":", 1)[1].strip() if ":" in del_label else None
+                    results.append((code, value, ins_context))
+    return list(set(results))
+
+
+def rewritten_pair(statements, rng):
+    """
+    Build a submission and a correct code with the same statements, laid out differently.
+    """
+    lines = [rng.choice(_STATEMENTS).format(rng.randint(1, 9)) for _ in range(statements)]
+    submission = "\n".join(lines)
+    shuffled = lines[:]
+    rng.shuffle(shuffled)
+    blocks = []
+    for start in range(0, len(shuffled), 5):
+        body = "\n".join("    " + line for line in shuffled[start:start + 5])
+        blocks.append(f"for i in range({rng.randint(2, 5)}):\n{body}")
+    return submission, "\n".join(blocks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--statements", type=int, nargs="+", default=[50, 100, 200, 400])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    annotation = ErrorAnnotation()
+    print(f"{'statements':>10} {'deletes':>8} {'inserts':>8} {'nested loop':>12} {'hash join':>10}")
+    for statements in args.statements:
+        submission, correct = rewritten_pair(statements, rng)
+        _, ops = distance(build_annotated_tree(submission), build_annotated_tree(correct), Node.get_children)
+        index = OpIndex(ops)
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            expected = nested_loop_positions(index)
+        nested = (time.perf_counter() - started) / args.repeat
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            result = annotation.detect_incorrect_statement_positions(index)
+        joined = (time.perf_counter() - started) / args.repeat
+
+        assert sorted(result) == sorted(expected), "The hash join changed the output."
+        print(f"{statements:>10} {len(index.by_type['delete']):>8} {len(index.by_type['insert']):>8} "
+              f"{nested * 1e3:>10.2f}ms {joined * 1e3:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
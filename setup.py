@@ -9,7 +9,7 @@ setup(
     author="Badmavasan KIROUCHENASSAMY",
     author_email="badmavasan.kirouchenassamy@lip6.fr",
     url="https://github.com/Badmavasan/ast-error-detection",
-    packages=find_packages(),
+    packages=find_packages(exclude=["tests", "tests.*"]),
     install_requires=[
         "graphviz",
         "numpy"
@@ -0,0 +1,188 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The context rules of version 0.3, applied one after the other, kept as they were before they
+were compiled into a single filter, to check that the current filter drops the same errors.
+"""
+
+from ast_error_detection.constants import ANNOTATION_TAG_MISSING_CALL_STATEMENT, \
+    ANNOTATION_TAG_UNNECESSARY_CALL_STATEMENT, ANNOTATION_TAG_UNNECESSARY_FOR_LOOP, \
+    ANNOTATION_TAG_UNNECESSARY_WHILE_LOOP, ANNOTATION_TAG_MISSING_FOR_LOOP
+
+### HIGH LEVEL RULES ##
+
+# Rule: If there is an UNNECESSARY CALL statement, suppress ALL other errors
+# that are *inside* that call's context (i.e., deeper in the same path).
+# Keep the UNNECESSARY_CALL_STATEMENT trigger itself.
+def rule_remove_inside_unnecessary_call_context():
+    def rule(errors):
+        # Collect exact contexts where an unnecessary call is flagged
+        # Example context: "Module > Expr > Call: print"
+        trigger_contexts = {
+            (e[-1] or "").strip()
+            for e in errors
+            if e[0] == ANNOTATION_TAG_UNNECESSARY_CALL_STATEMENT
+        }
+
+        if not trigger_contexts:
+            return errors
+        filtered = []
+
+        for e in errors:
+            code = e[0]
+            ctx  = (e[-1] or "").strip()
+            # Always keep the trigger(s) themselves
+            if code == ANNOTATION_TAG_UNNECESSARY_CALL_STATEMENT:
+                filtered.append(e)
+                continue
+            # Drop errors that are strictly *under* a trigger call context:
+            # i.e., context starts with "<trigger> >"
+            if any(ctx.startswith(tc + " > ") for tc in trigger_contexts):
+                continue
+            # Everything else stays
+            filtered.append(e)
+        return filtered
+
+    return rule
+
+# Rule: If there is an UNNECESSARY FOR loop, suppress ALL other errors
+# that are *inside* that FOR's context (i.e., deeper in the same path).
+# Keep the UNNECESSARY_FOR_LOOP trigger itself.
+def rule_remove_inside_unnecessary_loop_context():
+    def rule(errors):
+        # Collect exact contexts where an unnecessary FOR is flagged
+        # Example context: "Module > For[0]"
+        trigger_contexts = {
+            (e[-1] or "").strip()
+            for e in errors
+            if e[0] == ANNOTATION_TAG_UNNECESSARY_FOR_LOOP or e[0] == ANNOTATION_TAG_UNNECESSARY_WHILE_LOOP
+        }
+
+        if not trigger_contexts:
+            return errors
+
+        filtered = []
+        for e in errors:
+            code = e[0]
+            ctx  = (e[-1] or "").strip()
+
+            # Always keep the trigger(s) themselves
+            if code == ANNOTATION_TAG_UNNECESSARY_FOR_LOOP or code == ANNOTATION_TAG_UNNECESSARY_WHILE_LOOP:
+                filtered.append(e)
+                continue
+
+            # Drop errors that are strictly *under* a trigger FOR context:
+            # i.e., context starts with "<trigger> >"
+            if any(ctx.startswith(tc + " > ") for tc in trigger_contexts):
+                continue
+
+            # Everything else stays
+            filtered.append(e)
+
+        return filtered
+
+    return rule
+
+
+# Rule: If there is a MISSING CALL statement, suppress ALL other errors
+# that are *inside* that call's context (i.e., deeper in the same path).
+# Keep the MISSING_CALL_STATEMENT trigger itself.
+def rule_remove_inside_missing_call_context():
+    def rule(errors):
+        # Collect exact contexts where a missing call is flagged
+        # Example context: "Module > Expr > Call: print"
+        trigger_contexts = {
+            (e[-1] or "").strip()
+            for e in errors
+            if e[0] == ANNOTATION_TAG_MISSING_CALL_STATEMENT
+        }
+
+        if not trigger_contexts:
+            return errors
+
+        filtered = []
+        for e in errors:
+            code = e[0]
+            ctx  = (e[-1] or "").strip()
+
+            # Always keep the trigger(s) themselves
+            if code == ANNOTATION_TAG_MISSING_CALL_STATEMENT:
+                filtered.append(e)
+                continue
+
+            # Drop errors that are strictly *under* a trigger call context:
+            # i.e., context starts with "<trigger> >"
+            if any(ctx.startswith(tc + " > ") for tc in trigger_contexts):
+                continue
+
+            # Everything else stays
+            filtered.append(e)
+
+        return filtered
+
+    return rule
+
+def rule_remove_inside_missing_for_loop():
+    def rule(errors):
+        # Collect exact contexts where a missing for-loop is flagged
+        # e.g., "Module > For" or "FunctionDef: foo > For"
+        trigger_contexts = {
+            (e[-1] or "").strip()
+            for e in errors
+            if e[0] == ANNOTATION_TAG_MISSING_FOR_LOOP
+        }
+
+        if not trigger_contexts:
+            return errors
+
+        filtered = []
+        for e in errors:
+            code = e[0]
+            ctx  = (e[-1] or "").strip()
+
+            # Always keep the trigger(s) themselves
+            if code == ANNOTATION_TAG_MISSING_FOR_LOOP:
+                filtered.append(e)
+                continue
+
+            # Drop errors that are strictly *under* a trigger "for" context:
+            # i.e., context starts with "<trigger> >"
+            if any(ctx.startswith(tc + " > ") for tc in trigger_contexts):
+                continue
+
+            # Everything else stays
+            filtered.append(e)
+
+        return filtered
+
+    return rule
+
+
+def high_level_filtering():
+    """
+    Returns a function that applies a pipeline of rules to an error list.
+    Default rules include:
+        - Removing all 'Call: range' errors if a MISSING_CALL_STATEMENT
+          on 'Call: range' is present.
+    """
+    rules = [
+        rule_remove_inside_unnecessary_call_context(),
+        rule_remove_inside_missing_call_context(),
+        rule_remove_inside_unnecessary_loop_context(),
+        rule_remove_inside_missing_for_loop()
+    ]
+
+    def apply_rules(errors):
+        for rule in rules:
+            errors = rule(errors)
+        return errors
+
+    return apply_rules
@@ -0,0 +1,115 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The Zhang-Shasha tree edit distance of version 0.3, kept as the reference of the current one.
+
+It is the former `distance`, which copies a list of operations into every cell of every table,
+with its unit costs replaced by cost functions so that it can also check weighted cost models.
+The ties are broken in the same order (removal, insertion, then update or subtree).
+"""
+
+
+def _annotate(root):
+    """
+    Return the nodes of a tree in post-order, their left-most descendants and the keyroots.
+    """
+    nodes = []
+    lmds = []
+
+    def visit(node):
+        first = len(nodes)
+        for child in node.children:
+            visit(child)
+        lmds.append(lmds[first] if node.children else len(nodes))
+        nodes.append(node)
+
+    visit(root)
+    keyroots = sorted({lmd: node_id for node_id, lmd in enumerate(lmds)}.values())
+    return nodes, lmds, keyroots
+
+
+def _op(op_type, node, current, new):
+    return {'type': op_type, 'path': node.get_path(), 'current': current, 'new': new}
+
+
+def zhang_shasha(root_a, root_b, remove_cost, insert_cost, update_cost):
+    """
+    Compute the tree edit distance between two Node trees and its edit script.
+
+    Args:
+        root_a (Node): The root of the first tree.
+        root_b (Node): The root of the second tree.
+        remove_cost (callable): The cost of removing a node of the first tree.
+        insert_cost (callable): The cost of inserting a node of the second tree.
+        update_cost (callable): The cost of updating a node of the first tree into a node of
+                                the second one.
+
+    Returns:
+        tuple: The edit distance and the list of edit operations, as dicts with 'type', 'path',
+               'current' and 'new' keys.
+    """
+    An, Al, a_keyroots = _annotate(root_a)
+    Bn, Bl, b_keyroots = _annotate(root_b)
+    treedists = [[0] * len(Bn) for _ in An]
+    operations = [[[] for _ in Bn] for _ in An]
+
+    def treedist(i, j):
+        m = i - Al[i] + 2
+        n = j - Bl[j] + 2
+        fd = [[0] * n for _ in range(m)]
+        partial_ops = [[[] for _ in range(n)] for _ in range(m)]
+        ioff = Al[i] - 1
+        joff = Bl[j] - 1
+
+        for x in range(1, m):
+            node = An[x + ioff]
+            fd[x][0] = fd[x - 1][0] + remove_cost(node)
+            partial_ops[x][0] = partial_ops[x - 1][0] + [_op('delete', node, node.label, None)]
+        for y in range(1, n):
+            node = Bn[y + joff]
+            fd[0][y] = fd[0][y - 1] + insert_cost(node)
+            partial_ops[0][y] = partial_ops[0][y - 1] + [_op('insert', node, None, node.label)]
+
+        for x in range(1, m):
+            for y in range(1, n):
+                node1 = An[x + ioff]
+                node2 = Bn[y + joff]
+                cost_remove = fd[x - 1][y] + remove_cost(node1)
+                cost_insert = fd[x][y - 1] + insert_cost(node2)
+                whole_trees = Al[i] == Al[x + ioff] and Bl[j] == Bl[y + joff]
+                if whole_trees:
+                    cost_third = fd[x - 1][y - 1] + update_cost(node1, node2)
+                else:
+                    p = Al[x + ioff] - 1 - ioff
+                    q = Bl[y + joff] - 1 - joff
+                    cost_third = fd[p][q] + treedists[x + ioff][y + joff]
+                costs = [cost_remove, cost_insert, cost_third]
+                fd[x][y] = min(costs)
+                choice = costs.index(fd[x][y])
+
+                if choice == 0:
+                    ops = partial_ops[x - 1][y] + [_op('delete', node1, node1.label, None)]
+                elif choice == 1:
+                    ops = partial_ops[x][y - 1] + [_op('insert', node2, None, node2.label)]
+                elif whole_trees:
+                    op_type = 'match' if fd[x][y] == fd[x - 1][y - 1] else 'update'
+                    ops = partial_ops[x - 1][y - 1] + [_op(op_type, node1, node1.label, node2.label)]
+                else:
+                    ops = partial_ops[p][q] + operations[x + ioff][y + joff]
+                partial_ops[x][y] = ops
+                if whole_trees:
+                    treedists[x + ioff][y + joff] = fd[x][y]
+                    operations[x + ioff][y + joff] = ops
+
+    for i in a_keyroots:
+        for j in b_keyroots:
+            treedist(i, j)
+    return treedists[-1][-1], operations[-1][-1]
@@ -0,0 +1,186 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Programs shared by the tests: a few hand-written exercises and their submissions, and random
+programs built from the statements the exercises use.
+"""
+
+import random
+import re
+
+# A correct code and submissions with the usual mistakes: missing or unnecessary calls and
+# loops, wrong constants, operators and variables, misplaced statements.
+EXERCISE = """
+for i in range(4):
+    avancer(50)
+    tourner(90)
+print("fini")
+"""
+
+SUBMISSIONS = [
+    EXERCISE,
+    """
+for i in range(3):
+    avancer(50)
+    tourner(90)
+print("fini")
+""",
+    """
+for i in range(4):
+    avancer(50)
+print("fini")
+""",
+    """
+avancer(50)
+tourner(90)
+print("fini")
+""",
+    """
+for i in range(4):
+    for j in range(2):
+        avancer(50)
+    tourner(90)
+print("fini")
+print("encore")
+""",
+    """
+for i in range(4):
+    tourner(90)
+    avancer(50)
+""",
+    """
+n = 0
+while n < 4:
+    avancer(50)
+    tourner(-90)
+    n = n + 1
+""",
+    """
+def carre(cote):
+    for i in range(4):
+        avancer(cote)
+        tourner(90)
+    return cote
+
+carre(50)
+""",
+    """
+x = 5
+if x > 3:
+    print(x)
+else:
+    print(-x)
+y = x * 2
+""",
+]
+
+CORRECT_CODES = [
+    EXERCISE,
+    """
+def carre(cote):
+    for i in range(4):
+        avancer(cote)
+        tourner(90)
+
+carre(50)
+print("fini")
+""",
+]
+
+
+def _block(rng, depth, statements):
+    lines = []
+    for _ in range(rng.randint(1, statements)):
+        choice = rng.random()
+        if depth > 0 and choice < 0.2:
+            lines.append(f"for {rng.choice('ijk')} in range({rng.randint(1, 5)}):")
+            lines.extend("    " + line for line in _block(rng, depth - 1, statements))
+        elif depth > 0 and choice < 0.3:
+            lines.append(f"while {rng.choice('xyn')} < {rng.randint(1, 9)}:")
+            lines.extend("    " + line for line in _block(rng, depth - 1, statements))
+        elif depth > 0 and choice < 0.4:
+            lines.append(f"if {rng.choice('xyn')} {rng.choice(['>', '<', '=='])} {rng.randint(0, 9)}:")
+            lines.extend("    " + line for line in _block(rng, depth - 1, statements))
+            if rng.random() < 0.5:
+                lines.append("else:")
+                lines.extend("    " + line for line in _block(rng, depth - 1, statements))
+        elif choice < 0.55:
+            lines.append(f"avancer({rng.randint(1, 9) * 10})")
+        elif choice < 0.7:
+            lines.append(f"tourner({rng.choice([90, -90, 45])})")
+        elif choice < 0.8:
+            lines.append(f"print({rng.choice(['x', 'y', repr('fini'), 'x + 1'])})")
+        else:
+            lines.append(f"{rng.choice('xyn')} = {rng.choice('xyn')} {rng.choice('+-*')} {rng.randint(1, 9)}")
+    return lines
+
+
+def random_program(rng, depth=2, statements=4):
+    """
+    Build a random program of loops, conditions, calls and assignments.
+
+    Args:
+        rng (random.Random): The random generator.
+        depth (int, optional): The deepest nesting of blocks. Defaults to 2.
+        statements (int, optional): The largest number of statements of a block. Defaults to 4.
+
+    Returns:
+        str: The code of the program.
+    """
+    lines = _block(rng, depth, statements)
+    if rng.random() < 0.3:
+        lines = ["def dessin(cote):"] + ["    " + line for line in _block(rng, depth - 1, statements)] + \
+                ["    return cote", ""] + lines + [f"dessin({rng.randint(1, 9)})"]
+    return "\n".join(lines) + "\n"
+
+
+def random_programs(count, seed=0, **kwargs):
+    """
+    Build `count` random programs, the same ones for the same seed.
+    """
+    rng = random.Random(seed)
+    return [random_program(rng, **kwargs) for _ in range(count)]
+
+
+def edited_program(code, rng, edits=2):
+    """
+    Make a few small edits to a program, as a submission close to a correct code would: change
+    a constant, or repeat a simple statement.
+
+    Args:
+        code (str): The code of the program.
+        rng (random.Random): The random generator.
+        edits (int, optional): The number of edits. Defaults to 2.
+
+    Returns:
+        str: The code of the edited program.
+    """
+    lines = code.splitlines()
+    for _ in range(edits):
+        index = rng.randrange(len(lines))
+        line = lines[index]
+        if re.search(r"\d", line) and rng.random() < 0.5:
+            lines[index] = re.sub(r"\d+", str(rng.randint(1, 9)), line, count=1)
+        elif line.strip() and not line.rstrip().endswith(":") and not line.lstrip().startswith("return"):
+            lines.insert(index, line)
+    return "\n".join(lines) + "\n"
+
+
+def edited_pairs(count, seed=0, **kwargs):
+    """
+    Build `count` pairs of a random program edited by `edited_program` and the program itself.
+    """
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        code = random_program(rng, **kwargs)
+        pairs.append((edited_program(code, rng), code))
+    return pairs
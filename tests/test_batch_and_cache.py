@@ -0,0 +1,156 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Batch grading against serial grading, and the results kept in an SQLite result cache.
+"""
+
+import pickle
+
+import pytest
+
+from ast_error_detection import GradingError, ReferenceSet, get_typology_based_code_error, grade_batch
+from ast_error_detection import batch_grading, reference_set
+from ast_error_detection.flat_tree import FlatTree
+from ast_error_detection.result_cache import ResultCache, SQLiteResultStore
+from ast_error_detection.reference_set import build_annotated_tree
+from tests.programs import CORRECT_CODES, SUBMISSIONS, edited_pairs, random_programs
+
+BATCH = SUBMISSIONS + random_programs(12, seed=6) + [code for code, _ in edited_pairs(6, seed=7)] + \
+        ["for i in range(4)\n    avancer(50)\n"]
+
+
+def _serial(submissions, references):
+    results = []
+    for submission in submissions:
+        try:
+            results.append(get_typology_based_code_error(submission, references))
+        except Exception as error:
+            results.append(error)
+    return results
+
+
+def _comparable(results):
+    # Compare the exceptions raised serially with the records of the batch by type name and message.
+    return [(type(result).__name__, str(result)) if isinstance(result, Exception) else
+            (result.type_name, result.message) if isinstance(result, GradingError) else result
+            for result in results]
+
+
+class _UnpicklableError(Exception):
+    # Its constructor takes more arguments than the message it passes on, so it cannot be unpickled.
+    def __init__(self, code, line):
+        super().__init__(f"line {line} of {code!r}")
+
+
+@pytest.mark.parametrize("workers, chunksize", [(1, None), (2, None), (3, 4)])
+def test_grade_batch_matches_serial_grading(workers, chunksize):
+    expected = _serial(BATCH, CORRECT_CODES)
+    assert isinstance(expected[-1], SyntaxError)
+    assert _comparable(grade_batch(BATCH, CORRECT_CODES, workers=workers, chunksize=chunksize)) == \
+           _comparable(expected)
+    assert _comparable(grade_batch(BATCH, ReferenceSet(CORRECT_CODES), workers=workers,
+                                   chunksize=chunksize)) == _comparable(expected)
+
+
+def test_failing_submissions_are_picklable_records(monkeypatch):
+    def grade(submission, references):
+        raise _UnpicklableError(submission, 3)
+
+    with pytest.raises(TypeError):
+        pickle.loads(pickle.dumps(_UnpicklableError("avancer(50)", 3)))
+    monkeypatch.setattr(batch_grading, "get_typology_based_code_error", grade)
+    results = pickle.loads(pickle.dumps(grade_batch(["avancer(50)"], CORRECT_CODES, workers=1)))
+    assert results == [GradingError("_UnpicklableError", "line 3 of 'avancer(50)'", results[0].traceback)]
+    assert "_UnpicklableError" in results[0].traceback
+
+
+def test_grade_batch_rejects_invalid_arguments():
+    with pytest.raises(ValueError):
+        grade_batch(BATCH, CORRECT_CODES, workers=0)
+    with pytest.raises(ValueError):
+        grade_batch(BATCH, CORRECT_CODES, chunksize=0)
+
+
+def test_workers_attach_the_shared_reference_trees(monkeypatch):
+    references = ReferenceSet(CORRECT_CODES)
+    expected = _comparable(grade_batch(BATCH, references, workers=1))
+    blocks = []
+    share = ReferenceSet.to_shared_memory
+
+    def to_shared_memory(self):
+        blocks.extend(share(self))
+        return blocks
+
+    def rebuild(code):
+        raise AssertionError(f"correct code parsed again: {code!r}")
+
+    # Forked workers inherit the patches: one parsing a correct code again breaks the pool.
+    monkeypatch.setattr(ReferenceSet, "to_shared_memory", to_shared_memory)
+    monkeypatch.setattr(reference_set, "build_annotated_tree", rebuild)
+    assert _comparable(grade_batch(BATCH, references, workers=2)) == expected
+    assert len(blocks) == len(CORRECT_CODES)
+    with pytest.raises(FileNotFoundError):
+        FlatTree.attach(blocks[0].name)
+
+    # A worker holds the flat trees of the blocks, whatever the start method of the pool.
+    monkeypatch.setattr(batch_grading, "_worker_references", None)
+    blocks = share(references)
+    try:
+        batch_grading._init_worker(references.codes, [block.name for block in blocks], references.fingerprint)
+        worker_references = batch_grading._worker_references
+        assert [tree._shared_memory.name for tree in worker_references.trees] == [block.name for block in blocks]
+        assert all(isinstance(tree, FlatTree) for tree in worker_references.trees)
+        assert worker_references.fingerprint == references.fingerprint
+        assert _comparable(batch_grading._grade_chunk(BATCH)) == expected
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def test_submission_labels_are_not_kept_by_the_reference_set():
+    references = ReferenceSet(CORRECT_CODES)
+    labels = list(references.label_table.labels)
+    submissions = [f"for i in range({count}):\n    avancer({count * 7})\nprint('essai {count}')\n"
+                   for count in range(40)]
+    results = [get_typology_based_code_error(submission, references) for submission in submissions]
+    assert references.label_table.labels == labels
+    assert results == [get_typology_based_code_error(submission, CORRECT_CODES) for submission in submissions]
+
+
+def test_sqlite_result_cache_round_trip(tmp_path):
+    path = tmp_path / "results.sqlite"
+    references = ReferenceSet(CORRECT_CODES)
+    # Only the submissions that can be graded are cached.
+    submissions = [submission for submission, result in
+                   zip(BATCH, _serial(BATCH, references)) if not isinstance(result, Exception)]
+    expected = [get_typology_based_code_error(submission, references) for submission in submissions]
+
+    cache = ResultCache(SQLiteResultStore(path))
+    assert [get_typology_based_code_error(submission, references, cache) for submission in submissions] == \
+           expected
+    assert cache.hits == 0
+
+    key = ResultCache.key(build_annotated_tree(SUBMISSIONS[1]), references)
+    cache.put(key, [3, {"B", "A"}])
+    assert cache.get(key) == [3, {"A", "B"}]
+    cache.put(key, expected[1])
+    cache.store.close()
+
+    # A new store on the same file answers every submission without grading it again.
+    reopened = ResultCache(SQLiteResultStore(path))
+    assert len(reopened.store) == len({ResultCache.key(build_annotated_tree(submission), references)
+                                       for submission in submissions})
+    assert [get_typology_based_code_error(submission, references, reopened) for submission in submissions] == \
+           expected
+    assert reopened.hits == len(submissions)
+    assert reopened.misses == 0
+    reopened.store.close()
@@ -0,0 +1,71 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The iterative converter, against the recursive converter of version 0.3.
+"""
+
+import ast
+
+import pytest
+
+from ast_error_detection.annotated_tree import AnnotatedTree
+from ast_error_detection.convert_ast_to_custom_node import ast_to_annotated_tree, ast_to_custom_node
+from ast_error_detection.node import Node
+from ast_error_detection.node_functions import anonymize_variable_names
+from tests.legacy import converter as legacy
+from tests.programs import CORRECT_CODES, SUBMISSIONS, random_programs
+
+# Constructs the exercises do not use, but the converter handles.
+CONSTRUCTS = [
+    "from math import sqrt, pi as PI\nimport random\nx = sqrt(PI)\n",
+    "a, b = 1, 2\nb += a\nc = [a, b, -a][1]\nprint(not a, a if b else c)\n",
+    "def f(x, y=2):\n    if x < y <= 3:\n        return x % y\n    elif x != y:\n        return -x\n    return None\n",
+    "while True:\n    avancer(10)\n    if 1 == 1:\n        break\nelse:\n    tourner(90)\n",
+    "for i in range(1, 10, 2):\n    for j in [i, i * 2]:\n        print(i ** j // 3)\n",
+    "x = 3.5\ny = 'texte'\nz = x >= 2 and y or x < 1\n",
+]
+
+PROGRAMS = SUBMISSIONS + CORRECT_CODES + CONSTRUCTS + random_programs(30, seed=3, depth=3)
+
+
+def _tree(nodes):
+    """
+    Return the labels, paths and structure of the post-order nodes of a tree.
+    """
+    return [(node.label, node.get_path(), node.index, len(node.children)) for node in nodes]
+
+
+@pytest.mark.parametrize("code", PROGRAMS)
+def test_custom_nodes_match_recursive_converter(code):
+    expected = legacy.ast_to_custom_node(ast.parse(code))
+    nodes = ast_to_custom_node(ast.parse(code))
+    assert len(nodes) == len(expected)
+    for root, expected_root in zip(nodes, expected):
+        assert _tree(AnnotatedTree(root, Node.get_children).nodes) == \
+               _tree(AnnotatedTree(expected_root, Node.get_children).nodes)
+
+
+@pytest.mark.parametrize("code", PROGRAMS)
+def test_annotated_tree_matches_recursive_converter(code):
+    expected_root = legacy.ast_to_custom_node(ast.parse(code))[0]
+    expected_names = legacy.anonymize_variable_names(expected_root)
+    expected = AnnotatedTree(expected_root, Node.get_children)
+
+    tree = ast_to_annotated_tree(ast.parse(code))
+    assert _tree(tree.nodes) == _tree(expected.nodes)
+    assert list(tree.lmds) == list(expected.lmds)
+    assert list(tree.keyroots) == list(expected.keyroots)
+    assert list(tree.parents) == list(expected.parents)
+    assert [list(path) for path in tree.nodes_path] == [list(path) for path in expected.nodes_path]
+    assert list(tree.label_ids) == list(expected.label_ids)
+
+    root = ast_to_custom_node(ast.parse(code))[0]
+    assert anonymize_variable_names(root) == expected_names
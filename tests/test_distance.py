@@ -0,0 +1,290 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The tree edit distance in every mode, against the reference Zhang-Shasha of version 0.3.
+"""
+
+import functools
+import gc
+import math
+import weakref
+from collections import Counter
+
+import pytest
+
+from ast_error_detection import zang_shasha_distance
+from ast_error_detection.annotated_tree import AnnotatedTree, LabelTable
+from ast_error_detection.cost_model import CostModel, node_kind
+from ast_error_detection.error_annotation import ErrorAnnotation
+from ast_error_detection.error_diagnosis import get_primary_code_errors
+from ast_error_detection.flat_tree import FlatTree
+from ast_error_detection.lower_bounds import histogram_lower_bound
+from ast_error_detection.node import Node
+from ast_error_detection.pair_memo import SubtreePairMemo
+from ast_error_detection.path_sides import mirror_ids, one_sided_paths, orientation_costs
+from ast_error_detection.reference_set import build_annotated_tree
+from ast_error_detection.zang_shasha_distance import KERNELS, ORIENTATIONS, distance, select_orientation
+from tests.legacy.zhang_shasha import zhang_shasha
+from tests.programs import CORRECT_CODES, SUBMISSIONS, edited_pairs, random_programs
+
+_RANDOM = random_programs(24, seed=1)
+PAIRS = [(submission, correct) for submission in SUBMISSIONS for correct in CORRECT_CODES] + \
+        list(zip(_RANDOM[::2], _RANDOM[1::2])) + edited_pairs(8, seed=2, statements=5)
+
+WEIGHTED = CostModel(insert=2, remove=1, update=3,
+                     insert_weights={"For": 4, "Call": 3}, remove_weights={"Const": 2, "While": 5},
+                     update_weights={"Const": 1, ("Var", "Const"): 2})
+
+
+def _costs(model=None):
+    """
+    Return the removal, insertion and update costs of a cost model, by label, as documented.
+    """
+    if model is None:
+        return (lambda label: 1), (lambda label: 1), (lambda label1, label2: 0 if label1 == label2 else 1)
+
+    def remove(label):
+        return model.remove_weights.get(node_kind(label), model.remove)
+
+    def insert(label):
+        return model.insert_weights.get(node_kind(label), model.insert)
+
+    def update(label1, label2):
+        if label1 == label2:
+            return 0
+        kind1, kind2 = node_kind(label1), node_kind(label2)
+        weight = model.update_weights.get((kind1, kind2))
+        return model.update_weights.get(kind1, model.update) if weight is None else weight
+
+    return remove, insert, update
+
+
+@functools.lru_cache(maxsize=None)
+def _reference(code1, code2, cost_model=None):
+    """
+    Return the distance and edit script of the reference Zhang-Shasha, computed once per pair.
+    """
+    remove, insert, update = _costs(cost_model)
+    tree1 = build_annotated_tree(code1)
+    tree2 = build_annotated_tree(code2)
+    return zhang_shasha(tree1.root, tree2.root, lambda node: remove(node.label),
+                        lambda node: insert(node.label), lambda node1, node2: update(node1.label, node2.label))
+
+
+def _plain(ops):
+    return [(op['type'], list(op['path']), op['current'], op['new']) for op in ops]
+
+
+def _check_script(dist, ops, code1, code2, costs):
+    """
+    Check that an edit script, which may differ from the reference on ties, is a valid one of
+    that cost: every node of each tree is used once, and the operations add up to the distance.
+    """
+    remove, insert, update = costs
+    types = Counter(op['type'] for op in ops)
+    assert types['delete'] + types['update'] + types['match'] == len(build_annotated_tree(code1))
+    assert types['insert'] + types['update'] + types['match'] == len(build_annotated_tree(code2))
+    total = 0
+    for op in ops:
+        if op['type'] == 'delete':
+            total += remove(op['current'])
+        elif op['type'] == 'insert':
+            total += insert(op['new'])
+        else:
+            cost = update(op['current'], op['new'])
+            assert (cost == 0) == (op['type'] == 'match')
+            total += cost
+    assert total == dist
+
+
+@pytest.mark.parametrize("kernel", sorted(KERNELS))
+@pytest.mark.parametrize("code1, code2", PAIRS)
+def test_left_orientation_matches_reference(code1, code2, kernel):
+    expected_dist, expected_ops = _reference(code1, code2)
+    dist, ops = distance(build_annotated_tree(code1), build_annotated_tree(code2), Node.get_children,
+                         kernel=kernel)
+    assert dist == expected_dist
+    assert _plain(ops) == _plain(expected_ops)
+    assert distance(build_annotated_tree(code1), build_annotated_tree(code2), Node.get_children,
+                    return_ops=False, kernel=kernel) == expected_dist
+
+
+@pytest.mark.parametrize("kernel", sorted(KERNELS))
+@pytest.mark.parametrize("code1, code2", PAIRS)
+def test_weighted_cost_model_matches_reference(code1, code2, kernel):
+    expected_dist, expected_ops = _reference(code1, code2, WEIGHTED)
+    dist, ops = distance(build_annotated_tree(code1), build_annotated_tree(code2), Node.get_children,
+                         kernel=kernel, cost_model=WEIGHTED)
+    assert dist == expected_dist
+    assert _plain(ops) == _plain(expected_ops)
+    _check_script(dist, ops, code1, code2, _costs(WEIGHTED))
+
+
+@pytest.mark.parametrize("code1, code2", PAIRS[::5])
+def test_single_table_batches_match_reference(code1, code2, monkeypatch):
+    # With a tiny int32 range, each batch of the vectorized kernel holds a single table.
+    monkeypatch.setattr(zang_shasha_distance, '_INT32_MAX', 1)
+    expected_dist, expected_ops = _reference(code1, code2, WEIGHTED)
+    tree1, tree2 = build_annotated_tree(code1), build_annotated_tree(code2)
+    memo = SubtreePairMemo()
+    for orientation in ('left', 'mixed', 'mixed'):
+        dist, ops = distance(tree1, tree2, Node.get_children, kernel='vectorized', cost_model=WEIGHTED,
+                             orientation=orientation, memo=memo)
+        assert dist == expected_dist
+        _check_script(dist, ops, code1, code2, _costs(WEIGHTED))
+    assert _plain(distance(tree1, tree2, Node.get_children, kernel='vectorized', cost_model=WEIGHTED)[1]) == \
+           _plain(expected_ops)
+    assert distance(tree1, tree2, Node.get_children, return_ops=False, kernel='vectorized', cost_model=WEIGHTED,
+                    max_cost=expected_dist) == expected_dist
+
+
+@pytest.mark.parametrize("code1, code2", PAIRS)
+def test_memo_and_flat_trees_match_reference(code1, code2):
+    expected_dist, expected_ops = _reference(code1, code2)
+    tree1, tree2 = build_annotated_tree(code1), build_annotated_tree(code2)
+    memo = SubtreePairMemo()
+    for _ in range(2):
+        # The second comparison is answered from the memo.
+        dist, ops = distance(tree1, tree2, Node.get_children, memo=memo)
+        assert dist == expected_dist
+        assert _plain(ops) == _plain(expected_ops)
+    dist, ops = distance(FlatTree.from_tree(tree1), FlatTree.from_tree(tree2), Node.get_children)
+    assert dist == expected_dist
+    assert _plain(ops) == _plain(expected_ops)
+
+
+@pytest.mark.parametrize("code1, code2", PAIRS)
+def test_primary_errors_use_the_reference_script(code1, code2):
+    # The annotation path must keep the tie-breaking of the reference, not only its cost.
+    expected_dist, expected_ops = _reference(code1, code2)
+    assert get_primary_code_errors(code1, code2) == \
+           (expected_dist, ErrorAnnotation().concatenate_all_errors(expected_ops))
+
+
+@pytest.mark.parametrize("kernel", sorted(KERNELS))
+@pytest.mark.parametrize("cost_model", [None, WEIGHTED], ids=["unit", "weighted"])
+@pytest.mark.parametrize("code1, code2", PAIRS)
+def test_mixed_paths_match_reference(code1, code2, cost_model, kernel):
+    # The per-subtree paths fill the same subtree distances, so the edit script is the one of 'left'.
+    expected_dist, expected_ops = _reference(code1, code2, cost_model)
+    tree1, tree2 = build_annotated_tree(code1), build_annotated_tree(code2)
+    for trees in ((tree1, tree2), (tree2, tree1)):
+        strategy = one_sided_paths(*trees)
+        assert strategy.roots[-1][0] == len(trees[strategy.swapped]) - 1
+    memo = SubtreePairMemo() if cost_model is None else None
+    for _ in range(2):
+        dist, ops = distance(tree1, tree2, Node.get_children, kernel=kernel, cost_model=cost_model,
+                             orientation='mixed', memo=memo)
+        assert dist == expected_dist
+        assert _plain(ops) == _plain(expected_ops)
+    dist, ops = distance(FlatTree.from_tree(tree1), FlatTree.from_tree(tree2), Node.get_children, kernel=kernel,
+                         cost_model=cost_model, orientation='mixed')
+    assert _plain(ops) == _plain(expected_ops)
+    assert distance(tree1, tree2, Node.get_children, return_ops=False, kernel=kernel, cost_model=cost_model,
+                    orientation='mixed', max_cost=expected_dist) == expected_dist
+    if expected_dist > 0:
+        assert distance(tree1, tree2, Node.get_children, return_ops=False, kernel=kernel, cost_model=cost_model,
+                        orientation='mixed', max_cost=expected_dist - 1) == math.inf
+
+
+def test_mixed_paths_follow_the_heavy_side_of_each_subtree():
+    # The nested loops have their large body last, the sums their large operand first.
+    code = "x = " + "(" * 16 + "1" + "".join(f" + {k})" for k in range(16)) + "\n"
+    for depth in range(8):
+        code += "    " * depth + f"for i{depth} in range(3):\n" + "    " * (depth + 1) + f"avancer({depth})\n"
+    tree = build_annotated_tree(code + "    " * 8 + "tourner(90)\n")
+    mirrored_ids = {id(node): node_id for node_id, node in enumerate(tree.mirrored().nodes)}
+    assert mirror_ids(tree) == [mirrored_ids[id(node)] for node in tree.nodes]
+    left, right = orientation_costs(tree)
+    strategy = one_sided_paths(tree, tree)
+    assert strategy.cost * 1.5 <= min(left, right) ** 2
+    assert {right for _, right in strategy.roots} == {False, True}
+    assert select_orientation(tree, tree) == 'mixed'
+
+
+@pytest.mark.parametrize("orientation", ORIENTATIONS)
+@pytest.mark.parametrize("collapse_identical, trim_siblings", [(False, False), (True, False), (False, True),
+                                                                (True, True)])
+@pytest.mark.parametrize("code1, code2", PAIRS)
+def test_reductions_and_orientations_give_valid_scripts(code1, code2, orientation, collapse_identical,
+                                                        trim_siblings):
+    expected_dist, _ = _reference(code1, code2)
+    dist, ops = distance(build_annotated_tree(code1), build_annotated_tree(code2), Node.get_children,
+                         orientation=orientation, collapse_identical=collapse_identical,
+                         trim_siblings=trim_siblings, memo=SubtreePairMemo())
+    assert dist == expected_dist
+    _check_script(dist, ops, code1, code2, _costs())
+
+
+@pytest.mark.parametrize("code1, code2", PAIRS)
+def test_trimmed_script_keeps_the_post_order(code1, code2):
+    tree1, tree2 = build_annotated_tree(code1), build_annotated_tree(code2)
+    _, ops = distance(tree1, tree2, Node.get_children)
+    _, trimmed = distance(tree1, tree2, Node.get_children, trim_siblings=True)
+    # Every node of the first tree has one operation, in post-order, in both scripts.
+    assert [op['path'] for op in trimmed if op['type'] != 'insert'] == \
+           [op['path'] for op in ops if op['type'] != 'insert']
+
+
+@pytest.mark.parametrize("cost_model", [None, WEIGHTED], ids=["unit", "weighted"])
+@pytest.mark.parametrize("code1, code2", PAIRS)
+def test_max_cost(code1, code2, cost_model):
+    costs = _costs(cost_model)
+    expected_dist, _ = _reference(code1, code2, cost_model)
+    tree1, tree2 = build_annotated_tree(code1), build_annotated_tree(code2)
+    for max_cost in (expected_dist, expected_dist + 1):
+        assert distance(tree1, tree2, Node.get_children, return_ops=False, cost_model=cost_model,
+                        max_cost=max_cost) == expected_dist
+        dist, ops = distance(tree1, tree2, Node.get_children, cost_model=cost_model, max_cost=max_cost)
+        assert dist == expected_dist
+        _check_script(dist, ops, code1, code2, costs)
+    if expected_dist > 0:
+        for max_cost in (0, expected_dist - 1):
+            assert distance(tree1, tree2, Node.get_children, return_ops=False, cost_model=cost_model,
+                            max_cost=max_cost) == math.inf
+            assert distance(tree1, tree2, Node.get_children, cost_model=cost_model,
+                            max_cost=max_cost) == (math.inf, None)
+
+
+def test_unknown_kernel_and_orientation():
+    tree = build_annotated_tree(CORRECT_CODES[0])
+    with pytest.raises(ValueError):
+        distance(tree, tree, Node.get_children, kernel='simd')
+    with pytest.raises(ValueError):
+        distance(tree, tree, Node.get_children, orientation='heavy')
+
+
+def test_cost_model_does_not_keep_label_tables_alive():
+    tree = build_annotated_tree(CORRECT_CODES[0])
+    label_table = LabelTable()
+    model = CostModel(insert_weights={"For": 4})
+    costs = model.compile(AnnotatedTree(tree.root, Node.get_children, label_table), tree)
+    assert costs.insert_costs.tolist() == [4 if node_kind(tree.label(node_id)) == "For" else 1
+                                           for node_id in range(len(tree))]
+    table_ref = weakref.ref(label_table)
+    del label_table
+    gc.collect()
+    assert table_ref() is None
+
+
+@pytest.mark.parametrize("code1, code2", PAIRS)
+def test_histogram_lower_bound(code1, code2):
+    tree1, tree2 = build_annotated_tree(code1), build_annotated_tree(code2)
+    labels1 = Counter(tree1.label(node_id) for node_id in range(len(tree1)))
+    labels2 = Counter(tree2.label(node_id) for node_id in range(len(tree2)))
+    expected = max(sum((labels1 - labels2).values()), sum((labels2 - labels1).values()))
+    # The trees are relabeled into a large table, which must not change the bound.
+    label_table = LabelTable()
+    for count in range(5000):
+        label_table.intern(f"Const: {count}")
+    tree2 = tree2.relabeled(label_table)
+    assert histogram_lower_bound(tree1.relabeled(LabelTable(label_table)), tree2) == expected
+    assert expected <= _reference(code1, code2)[0]
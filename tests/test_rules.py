@@ -0,0 +1,119 @@
+# This file is part of ast_error_detection.
+# Copyright (C) 2025 Badmavasan Kirouchenassamy & Eva Chouaki.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or any later version.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+The compiled context filter and tag dispatch, against the rules of version 0.3.
+"""
+
+import pickle
+import random
+
+import pytest
+
+from ast_error_detection import constants
+from ast_error_detection.error_annotation import ErrorAnnotation, OpIndex, high_level_filtering
+from ast_error_detection.error_checks import get_customized_error_tags
+from ast_error_detection.node import Node
+from ast_error_detection.primary_error import PrimaryError
+from ast_error_detection.reference_set import build_annotated_tree
+from ast_error_detection.zang_shasha_distance import distance
+from tests.legacy import context_rules as legacy_rules
+from tests.legacy import error_checks as legacy_checks
+from tests.programs import CORRECT_CODES, SUBMISSIONS, edited_pairs, random_programs
+
+TAGS = sorted({value for name, value in vars(constants).items()
+               if name.startswith("ANNOTATION_TAG_") and isinstance(value, str)})
+
+_RANDOM = random_programs(20, seed=4)
+PAIRS = [(submission, correct) for submission in SUBMISSIONS for correct in CORRECT_CODES] + \
+        list(zip(_RANDOM[::2], _RANDOM[1::2])) + edited_pairs(10, seed=5)
+
+
+def _unfiltered_errors(code1, code2):
+    """
+    Return the errors `ErrorAnnotation.concatenate_all_errors` finds, before the context filter.
+    """
+    _, ops = distance(build_annotated_tree(code1), build_annotated_tree(code2), Node.get_children)
+    annotation = ErrorAnnotation()
+    index = OpIndex(ops)
+    return annotation.detect_specific_missing_constructs(index) + \
+        annotation.detect_unnecessary_deletions(index) + \
+        annotation.detect_incorrect_statement_positions(index) + \
+        annotation.track_all_updates(index) + \
+        annotation.detect_variable_mismatches(index)
+
+
+def _random_errors(rng, count, missing=True):
+    """
+    Return random errors, with the contexts and values of the nodes of random programs, and
+    some missing values and contexts when `missing` is True.
+    """
+    trees = [build_annotated_tree(code) for code in random_programs(4, seed=rng.randrange(1000))]
+    contexts = [context for tree in trees for context in tree.nodes_context]
+    values = [label.split(":", 1)[-1].strip() for tree in trees
+              for label in tree.label_table.labels] + ["4", "3", "1"]
+    errors = []
+    for _ in range(count):
+        # A trigger context is often the context of another error, or one of its ancestors.
+        context = rng.choice(contexts)
+        if errors and rng.random() < 0.3:
+            context = rng.choice(errors)[-1] or context
+            context = context.rsplit(" > ", rng.randint(0, 2))[0]
+        if missing and rng.random() < 0.05:
+            context = rng.choice([None, "", " " + context + " "])
+        details = [rng.choice(values + [None] if missing else values) for _ in range(rng.randint(1, 2))]
+        errors.append(PrimaryError(rng.choice(TAGS), *details, context))
+    return errors
+
+
+def _tags(get_tags, errors):
+    """
+    Return the typology tags of errors, or the type of the exception raised for them: both
+    versions fail the same way on an error without a value where a rule reads it.
+    """
+    try:
+        return set(get_tags(errors))
+    except Exception as error:
+        return type(error)
+
+
+@pytest.mark.parametrize("code1, code2", PAIRS)
+def test_annotations_match_sequential_rules(code1, code2):
+    errors = _unfiltered_errors(code1, code2)
+    filtered = high_level_filtering()(errors)
+    assert filtered == legacy_rules.high_level_filtering()(errors)
+    assert _tags(get_customized_error_tags, filtered) == _tags(legacy_checks.get_customized_error_tags, filtered)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_errors_match_sequential_rules(seed):
+    rng = random.Random(seed)
+    errors = _random_errors(rng, rng.randint(1, 60))
+    assert high_level_filtering()(errors) == legacy_rules.high_level_filtering()(errors)
+
+    errors = _random_errors(rng, rng.randint(1, 60), missing=False)
+    assert _tags(get_customized_error_tags, errors) == _tags(legacy_checks.get_customized_error_tags, errors)
+    for error in errors:
+        assert _tags(get_customized_error_tags, [error]) == _tags(legacy_checks.get_customized_error_tags, [error])
+
+
+@pytest.mark.parametrize("code1, code2", PAIRS[:12])
+def test_primary_errors_are_named_tuples(code1, code2):
+    errors = _unfiltered_errors(code1, code2)
+    assert all(isinstance(error, PrimaryError) for error in errors)
+    for error in errors:
+        plain = tuple(error)
+        assert error == plain and hash(error) == hash(plain)
+        assert pickle.loads(pickle.dumps(error)) == error
+        assert (error.tag, error.value, error.context) == (plain[0], plain[1], plain[-1])
+        assert error.is_update == (len(plain) == 4)
+        assert error.new_value == (plain[2] if error.is_update else None)
+        assert PrimaryError.of(list(plain)) == error
+    assert PrimaryError.of([constants.ANNOTATION_TAG_MISSING, "Module"]) is None